@@ -0,0 +1,150 @@
+"""
+Benchmark of movement search against the number of movements: ::
+
+    $ python benchmarks/search.py [--sizes 1000 10000 100000] [--url sqlite://]
+
+Names and short descriptions are made of words drawn from a vocabulary with
+a Zipf distribution, so some words occur in most movements and most words in
+few. It compares the index of :mod:`gridt_server.search` with a ``LIKE``
+scan of the movements table, which is what a search costs without it, for
+queries of a rare word, a common word, a prefix and two words.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from sqlalchemy import (  # noqa: E402
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    and_,
+    create_engine,
+    insert,
+    or_,
+    select,
+)
+
+from gridt_server.search import MovementSearch  # noqa: E402
+from gridt_server.store import MemoryStore  # noqa: E402
+from gridt_server.tables import movements  # noqa: E402
+
+VOCABULARY = 20000
+QUERIES = 200
+
+metadata = MetaData()
+Table(
+    "movements",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String(50)),
+    Column("interval", String(20)),
+    Column("short_description", String(100)),
+    Column("description", String(1000)),
+)
+
+
+def vocabulary(rand):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < VOCABULARY:
+        words.add("".join(rand.choice(letters) for _ in range(rand.randint(3, 10))))
+    return sorted(words)
+
+
+def seed(engine, size, words, rand):
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+
+    def text(count):
+        return " ".join(rand.choices(words, weights, k=count))
+
+    with engine.begin() as connection:
+        connection.execute(
+            insert(movements),
+            [
+                {
+                    "id": movement_id,
+                    "name": f"{text(rand.randint(1, 3))} {movement_id}",
+                    "interval": "daily",
+                    "short_description": text(rand.randint(5, 12)),
+                }
+                for movement_id in range(1, size + 1)
+            ],
+        )
+
+
+def like_search(engine, query, limit=20):
+    """Search by scanning the movements, with every word in either column."""
+    conditions = [
+        or_(
+            movements.c.name.like(f"%{word}%"),
+            movements.c.short_description.like(f"%{word}%"),
+        )
+        for word in query.split()
+    ]
+    with engine.connect() as connection:
+        return connection.execute(
+            select(movements.c.id).where(and_(*conditions)).limit(limit)
+        ).all()
+
+
+def queries(words, rand):
+    return {
+        "rare": [rand.choice(words[len(words) // 2 :]) for _ in range(QUERIES)],
+        "common": [rand.choice(words[:10]) for _ in range(QUERIES)],
+        "prefix": [rand.choice(words[:1000])[:3] for _ in range(QUERIES)],
+        "two words": [
+            f"{rand.choice(words[:100])} {rand.choice(words[:2000])}"
+            for _ in range(QUERIES)
+        ],
+    }
+
+
+def measure(search, queries):
+    durations = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    return statistics.median(durations), durations[int(len(durations) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--url", default="sqlite://")
+    args = parser.parse_args()
+
+    rand = random.Random(0)
+    words = vocabulary(rand)
+    engine = create_engine(args.url)
+    print(f"{'movements':>10}{'query':>12}{'method':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for size in args.sizes:
+        seed(engine, size, words, rand)
+        index = MovementSearch(engine, MemoryStore())
+        start = time.perf_counter()
+        index.search("load")
+        print(f"{size:>10} loaded the index in {time.perf_counter() - start:.2f}s")
+        for kind, sample in queries(words, rand).items():
+            for name, search in (
+                ("like", lambda query: like_search(engine, query)),
+                ("index", index.search),
+            ):
+                p50, p99 = measure(search, sample)
+                print(
+                    f"{size:>10}{kind:>12}{name:>8}"
+                    f"{p50 * 1000:>10.2f}{p99 * 1000:>10.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
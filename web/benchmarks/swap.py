@@ -0,0 +1,194 @@
+"""
+Benchmark of leader swaps against the size of the movement: ::
+
+    $ python benchmarks/swap.py [--sizes 100 1000 10000 100000] [--url sqlite://]
+
+Every member of the movement follows 4 leaders. It compares the swaps of the
+candidate pools with a search of the movement for an eligible leader, which
+is what a swap costs without them. The tables are created with the columns
+the server uses and the indexes of the migrations, ``--url`` can point to an
+empty MySQL database instead of an in-memory SQLite database.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from sqlalchemy import (  # noqa: E402
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    MetaData,
+    Table,
+    and_,
+    create_engine,
+    func,
+    insert,
+    select,
+)
+
+from gridt_server.candidates import CandidatePools  # noqa: E402
+from gridt_server.tables import followers, subscriptions, utcnow  # noqa: E402
+
+LEADERS = 4
+SWAPS = 500
+
+metadata = MetaData()
+Table(
+    "subscriptions",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer),
+    Column("movement_id", Integer),
+    Column("time_added", DateTime),
+    Column("time_removed", DateTime),
+    Index("ix_subscriptions_user_movement", "user_id", "movement_id", "time_removed"),
+)
+Table(
+    "movement_user_association",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("movement_id", Integer),
+    Column("follower_id", Integer),
+    Column("leader_id", Integer),
+    Column("created", DateTime),
+    Column("destroyed", DateTime),
+    Index(
+        "ix_mua_follower_movement_leader",
+        "follower_id",
+        "movement_id",
+        "leader_id",
+        "destroyed",
+    ),
+    Index("ix_mua_movement_leader", "movement_id", "leader_id"),
+)
+
+
+def seed(engine, size):
+    """Create a movement of ``size`` members that each follow LEADERS others."""
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(subscriptions),
+            [{"user_id": user, "movement_id": 1} for user in range(size)],
+        )
+        connection.execute(
+            insert(followers),
+            [
+                {
+                    "movement_id": 1,
+                    "follower_id": user,
+                    "leader_id": (user + offset) % size,
+                }
+                for user in range(size)
+                for offset in range(1, LEADERS + 1)
+            ],
+        )
+
+
+def search_swap(engine, follower_id, movement_id, leader_id):
+    """Swap by searching the movement for an eligible leader."""
+    now = utcnow()
+    leaders = select(followers.c.leader_id).where(
+        and_(
+            followers.c.follower_id == follower_id,
+            followers.c.movement_id == movement_id,
+            followers.c.destroyed.is_(None),
+        )
+    )
+    with engine.begin() as connection:
+        candidate = connection.execute(
+            select(subscriptions.c.user_id)
+            .where(
+                and_(
+                    subscriptions.c.movement_id == movement_id,
+                    subscriptions.c.time_removed.is_(None),
+                    subscriptions.c.user_id != follower_id,
+                    subscriptions.c.user_id.not_in(leaders),
+                )
+            )
+            .order_by(func.random())
+            .limit(1)
+        ).scalar()
+        if candidate is None:
+            return None
+        connection.execute(
+            followers.update()
+            .where(
+                and_(
+                    followers.c.follower_id == follower_id,
+                    followers.c.movement_id == movement_id,
+                    followers.c.leader_id == leader_id,
+                    followers.c.destroyed.is_(None),
+                )
+            )
+            .values(destroyed=now)
+        )
+        connection.execute(
+            insert(followers).values(
+                movement_id=movement_id,
+                follower_id=follower_id,
+                leader_id=candidate,
+                created=now,
+            )
+        )
+    return candidate
+
+
+def current_leader(engine, follower_id):
+    with engine.connect() as connection:
+        return connection.execute(
+            select(followers.c.leader_id)
+            .where(
+                and_(
+                    followers.c.follower_id == follower_id,
+                    followers.c.destroyed.is_(None),
+                )
+            )
+            .limit(1)
+        ).scalar()
+
+
+def measure(engine, size, swap):
+    rand = random.Random(0)
+    durations = []
+    for _ in range(SWAPS):
+        follower = rand.randrange(size)
+        leader = current_leader(engine, follower)
+        start = time.perf_counter()
+        swap(follower, 1, leader)
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    return statistics.median(durations), durations[int(len(durations) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000]
+    )
+    parser.add_argument("--url", default="sqlite://")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    print(f"{'members':>10}{'method':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for size in args.sizes:
+        seed(engine, size)
+        pools = CandidatePools(engine)
+        pools.pool(1)
+        for name, swap in (
+            ("search", lambda *key: search_swap(engine, *key)),
+            ("pools", pools.swap),
+        ):
+            p50, p99 = measure(engine, size, swap)
+            print(f"{size:>10}{name:>10}{p50 * 1000:>10.2f}{p99 * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark of the timing wheel of the reminder scheduler with 1M reminders: ::
+
+    $ python benchmarks/timingwheel.py [--entries 1000000]
+
+It schedules the reminders spread over a week, moves 10% of them like
+signals do, and then advances the wheel second by second through the first
+day, which is what the scheduler does.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from gridt_server.timingwheel import TimingWheel  # noqa: E402
+
+WEEK = 7 * 24 * 60 * 60
+DAY = 24 * 60 * 60
+
+
+def timed(name, fn, count):
+    start = time.perf_counter()
+    result = fn()
+    duration = time.perf_counter() - start
+    print(f"{name:<30}{duration:8.2f} s{duration / count * 1e6:10.2f} us/op")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=1000000)
+    args = parser.parse_args()
+
+    rand = random.Random(0)
+    now = time.time()
+    keys = [
+        (user, movement) for user in range(args.entries // 10) for movement in range(10)
+    ]
+    dues = [now + rand.uniform(0, WEEK) for _ in keys]
+    wheel = TimingWheel(now)
+
+    def schedule():
+        for key, due in zip(keys, dues):
+            wheel.schedule(key, due)
+
+    def reschedule():
+        for key in rand.sample(keys, len(keys) // 10):
+            wheel.schedule(key, now + rand.uniform(0, WEEK))
+
+    def advance():
+        expired = 0
+        for second in range(1, DAY + 1):
+            expired += len(wheel.advance(now + second))
+        return expired
+
+    timed("schedule", schedule, len(keys))
+    timed("reschedule 10%", reschedule, len(keys) // 10)
+    expired = timed("advance one day", advance, DAY)
+    print(f"{expired} reminders due in the first day, {len(wheel)} left")
+
+
+if __name__ == "__main__":
+    main()
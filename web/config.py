@@ -1,9 +1,18 @@
-from prometheus_flask_exporter.multiprocess import GunicornPrometheusMetrics
+import os
+
+# Sets PROMETHEUS_MULTIPROC_DIR before the workers import the Prometheus client.
+from gridt_server.multiprocess import (
+    metrics_dir,
+    reset_metrics_dir,
+    compact_dead_worker,
+    start_metrics_server,
+)
 
 
 def when_ready(server):
-    GunicornPrometheusMetrics.start_http_server_when_ready(8080)
+    reset_metrics_dir(metrics_dir())
+    start_metrics_server(int(os.getenv("METRICS_PORT", 8080)), metrics_dir())
 
 
 def child_exit(server, worker):
-    GunicornPrometheusMetrics.mark_process_dead_on_child_exit(worker.pid)
+    compact_dead_worker(metrics_dir(), worker.pid)
@@ -0,0 +1,253 @@
+"""
+Adjacency index
+***************
+
+Every leader request checks that the user follows the leader, which is a
+query on the follower table. With ``ADJACENCY_INDEX=True`` every worker keeps
+the follower graph of the movements it has seen in memory, as arrays of
+leaders per follower and of followers per leader, and answers these checks
+without a query.
+
+A movement is loaded with a single query the first time it is needed. The
+workers keep each other up to date through the store (see
+:mod:`gridt_server.store`, which should be shared): every change of an edge
+is appended to the change log of the movement, which the other workers
+apply. A swap changes two edges, subscribing and unsubscribing the edges the
+``"subscribe"`` and ``"unsubscribe"`` events carry (see
+:mod:`gridt_server.edges`). Only a change log that grows beyond
+``ADJACENCY_LOG_LIMIT`` (default 1000) entries, or a swap by the gridt
+library, which does not tell the new leader, bumps the epoch of the movement,
+after which the workers load it again.
+
+A worker checks the epoch and the change log of a movement at most once per
+``ADJACENCY_CHECK_INTERVAL`` seconds (default 1) and loads movements again
+after ``ADJACENCY_TTL`` seconds (default 300) regardless, so the index can be
+behind for a moment. The worker that changes an edge applies it at once and
+the others within that interval, which is good enough for an edge that was
+just destroyed: an edge in the index is trusted, so leader checks and the
+leaders in the movement listings are memory reads. An edge that is not in
+the index may be one another worker just created, so the database is asked
+then. It needs the redis store when gunicorn runs more than one worker.
+
+The memory used by the index is reported per movement in
+``adjacency_index_bytes`` and in total in ``/readyz``.
+"""
+import sys
+import threading
+import time
+from array import array
+
+from flask import current_app
+from prometheus_client import Gauge
+from sqlalchemy import and_, select
+
+from gridt_server.events import listen
+from gridt_server.health import register_readiness_check
+from gridt_server.store import require_shared_store
+from gridt_server.tables import followers
+
+ADJACENCY_BYTES = Gauge(
+    "adjacency_index_bytes",
+    "Memory used by the follower graph of a movement in the adjacency index.",
+    ["movement"],
+    multiprocess_mode="livesum",
+)
+
+
+class MovementGraph:
+    """The leaders of every follower and the followers of every leader."""
+
+    def __init__(self, edges=()):
+        self.leaders = {}
+        self.followers = {}
+        for follower_id, leader_id in edges:
+            self.add(follower_id, leader_id)
+
+    def add(self, follower_id, leader_id):
+        leaders = self.leaders.setdefault(follower_id, array("l"))
+        if leader_id not in leaders:
+            leaders.append(leader_id)
+            self.followers.setdefault(leader_id, array("l")).append(follower_id)
+
+    def remove(self, follower_id, leader_id):
+        leaders = self.leaders.get(follower_id)
+        if leaders is None or leader_id not in leaders:
+            return
+        leaders.remove(leader_id)
+        if not leaders:
+            del self.leaders[follower_id]
+        followers = self.followers[leader_id]
+        followers.remove(follower_id)
+        if not followers:
+            del self.followers[leader_id]
+
+    def apply(self, change):
+        follower_id, leader_id = map(int, change[1:].split(":"))
+        if change[0] == "+":
+            self.add(follower_id, leader_id)
+        else:
+            self.remove(follower_id, leader_id)
+
+    def nbytes(self):
+        return (
+            sys.getsizeof(self.leaders)
+            + sys.getsizeof(self.followers)
+            + sum(sys.getsizeof(leaders) for leaders in self.leaders.values())
+            + sum(sys.getsizeof(followers) for followers in self.followers.values())
+        )
+
+
+class LoadedGraph:
+    def __init__(self, graph, epoch, offset):
+        self.graph = graph
+        self.epoch = epoch
+        self.offset = offset
+        self.loaded = self.checked = time.monotonic()
+
+
+class AdjacencyIndex:
+    def __init__(self, engine, store, check_interval=1, ttl=300, log_limit=1000):
+        self.engine = engine
+        self.store = store
+        self.check_interval = check_interval
+        self.ttl = ttl
+        self.log_limit = log_limit
+        self.graphs = {}
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def epoch_key(movement_id):
+        return f"adjacency:{movement_id}:epoch"
+
+    @staticmethod
+    def log_key(movement_id, epoch):
+        return f"adjacency:{movement_id}:log:{epoch}"
+
+    def load(self, movement_id, epoch):
+        # Read the position in the change log before the edges, changes that
+        # are in both are applied twice, which does no harm.
+        offset = len(self.store.range(self.log_key(movement_id, epoch), 0))
+        with self.engine.connect() as connection:
+            edges = connection.execute(
+                select(followers.c.follower_id, followers.c.leader_id).where(
+                    and_(
+                        followers.c.movement_id == movement_id,
+                        followers.c.destroyed.is_(None),
+                    )
+                )
+            ).all()
+        loaded = LoadedGraph(MovementGraph(edges), epoch, offset)
+        ADJACENCY_BYTES.labels(movement_id).set(loaded.graph.nbytes())
+        return loaded
+
+    def graph(self, movement_id):
+        """Return the follower graph of a movement, brought up to date."""
+        with self.lock:
+            loaded = self.graphs.get(movement_id)
+            now = time.monotonic()
+            if loaded is not None and now - loaded.checked < self.check_interval:
+                return loaded.graph
+
+            epoch = int(self.store.get(self.epoch_key(movement_id)) or 0)
+            if (
+                loaded is None
+                or loaded.epoch != epoch
+                or now - loaded.loaded > self.ttl
+            ):
+                loaded = self.graphs[movement_id] = self.load(movement_id, epoch)
+            else:
+                changes = self.store.range(
+                    self.log_key(movement_id, epoch), loaded.offset
+                )
+                for change in changes:
+                    loaded.graph.apply(
+                        change.decode() if isinstance(change, bytes) else change
+                    )
+                loaded.offset += len(changes)
+                if changes:
+                    ADJACENCY_BYTES.labels(movement_id).set(loaded.graph.nbytes())
+            loaded.checked = now
+            return loaded.graph
+
+    def follows(self, follower_id, movement_id, leader_id):
+        return leader_id in self.graph(movement_id).leaders.get(follower_id, ())
+
+    def leaders(self, follower_id, movement_id):
+        return list(self.graph(movement_id).leaders.get(follower_id, ()))
+
+    def followers(self, leader_id, movement_id):
+        return list(self.graph(movement_id).followers.get(leader_id, ()))
+
+    def invalidate(self, movement_id):
+        """Make all workers load the movement again."""
+        epoch = self.store.incr(self.epoch_key(movement_id))
+        self.store.delete(self.log_key(movement_id, epoch - 1))
+        with self.lock:
+            self.graphs.pop(movement_id, None)
+
+    def changed(self, user_id, movement_id, edges=None):
+        if edges is None:
+            self.invalidate(movement_id)
+            return
+        removed = [f"-{follower}:{leader}" for follower, leader in edges.destroyed]
+        added = [f"+{follower}:{leader}" for follower, leader in edges.created]
+        self.log(movement_id, removed + added)
+
+    def swapped(self, follower_id, movement_id, old_leader_id, new_leader_id):
+        if new_leader_id is None:
+            self.invalidate(movement_id)
+            return
+        self.log(
+            movement_id,
+            [f"-{follower_id}:{old_leader_id}", f"+{follower_id}:{new_leader_id}"],
+        )
+
+    def log(self, movement_id, changes):
+        """Apply ``changes`` here and append them to the change log of the movement."""
+        if not changes:
+            return
+        with self.lock:
+            loaded = self.graphs.get(movement_id)
+            epoch = (
+                loaded.epoch
+                if loaded
+                else int(self.store.get(self.epoch_key(movement_id)) or 0)
+            )
+            if loaded is not None:
+                for change in changes:
+                    loaded.graph.apply(change)
+        if self.store.push(self.log_key(movement_id, epoch), *changes) > self.log_limit:
+            self.invalidate(movement_id)
+
+    def stats(self):
+        with self.lock:
+            graphs = list(self.graphs.values())
+        return {
+            "movements": len(graphs),
+            "bytes": sum(loaded.graph.nbytes() for loaded in graphs),
+        }
+
+
+def get_adjacency_index():
+    """Return the adjacency index of the current app, or None if it has none."""
+    return current_app.extensions.get("adjacency_index")
+
+
+def install_adjacency_index(app, engine):
+    if not app.config.get("ADJACENCY_INDEX"):
+        return None
+    require_shared_store(app, "ADJACENCY_INDEX")
+
+    index = AdjacencyIndex(
+        engine,
+        app.extensions["store"],
+        check_interval=app.config.get("ADJACENCY_CHECK_INTERVAL", 1),
+        ttl=app.config.get("ADJACENCY_TTL", 300),
+        log_limit=app.config.get("ADJACENCY_LOG_LIMIT", 1000),
+    )
+    app.extensions["adjacency_index"] = index
+    listen(app, "subscribe", index.changed)
+    listen(app, "unsubscribe", index.changed)
+    listen(app, "swap", index.swapped)
+    register_readiness_check(app, "adjacency_index", index.stats)
+    return index
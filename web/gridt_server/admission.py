@@ -0,0 +1,133 @@
+"""
+Admission control
+*****************
+
+With a few sync workers a burst of traffic waits in the kernel backlog until
+nginx gives up, and every request becomes slow. The admission controller
+rejects requests with a 503 and a ``Retry-After`` header as soon as it is clear
+that they have waited too long, so that the workers spend their time on
+requests that can still be answered in time.
+
+The wait is estimated from the ``X-Request-Start`` header that nginx adds
+(``t=<seconds since the epoch>``). Every endpoint has a priority class, set in
+``ADMISSION_PRIORITIES`` (default ``"normal"``), and every class has its own
+limits, so bulk reads are shed before logins and signals: ::
+
+    ADMISSION_CONTROL = True
+    ADMISSION_PRIORITIES = {
+        "loginresource": "critical",
+        "newsignalresource": "critical",
+        "networkresource": "bulk",
+    }
+    ADMISSION_MAX_QUEUE_WAIT = {"bulk": 0.5, "normal": 2, "critical": 5}
+    ADMISSION_MAX_IN_FLIGHT = {"bulk": 2, "normal": 8, "critical": 16}
+
+``ADMISSION_MAX_IN_FLIGHT`` limits the requests handled at the same time by
+one worker, which matters for threaded workers. Shed requests are counted in
+``requests_shed_total``.
+"""
+import math
+import threading
+import time
+
+from flask import g, jsonify, request
+from prometheus_client import Counter
+
+from gridt_server.health import register_readiness_check
+
+REQUESTS_SHED = Counter(
+    "requests_shed_total",
+    "Requests rejected by the admission controller.",
+    ["endpoint", "priority", "reason"],
+)
+
+PRIORITIES = ("bulk", "normal", "critical")
+
+
+def queue_wait(header, now):
+    """
+    Return the seconds since the proxy received the request according to an
+    ``X-Request-Start`` header, or 0 when it is missing or malformed.
+    """
+    if not header:
+        return 0
+    try:
+        start = float(header[2:] if header.startswith("t=") else header)
+    except ValueError:
+        return 0
+    # Some proxies send milli- or microseconds instead of seconds.
+    while start > now * 100:
+        start /= 1000
+    return max(now - start, 0)
+
+
+class AdmissionController:
+    def __init__(self, priorities, max_queue_wait, max_in_flight):
+        self.priorities = priorities
+        self.max_queue_wait = max_queue_wait
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def priority(self, endpoint):
+        return self.priorities.get(endpoint, "normal")
+
+    def admit(self, priority, wait):
+        """
+        Return None and count the request as in flight when it is admitted,
+        otherwise return the reason it is shed.
+        """
+        if wait > self.max_queue_wait.get(priority, math.inf):
+            return "queue_wait"
+        with self._lock:
+            if self.in_flight >= self.max_in_flight.get(priority, math.inf):
+                return "in_flight"
+            self.in_flight += 1
+        return None
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+def install_admission_control(app):
+    """
+    Install the admission controller if ``ADMISSION_CONTROL`` is set. It
+    should be installed before the other request hooks, so that shed
+    requests cost as little as possible.
+    """
+    if not app.config.get("ADMISSION_CONTROL"):
+        return
+
+    controller = AdmissionController(
+        app.config.get("ADMISSION_PRIORITIES", {}),
+        app.config.get("ADMISSION_MAX_QUEUE_WAIT", {}),
+        app.config.get("ADMISSION_MAX_IN_FLIGHT", {}),
+    )
+    app.extensions["admission_controller"] = controller
+    register_readiness_check(
+        app, "admission", lambda: {"in_flight": controller.in_flight}
+    )
+
+    def admit_request():
+        priority = controller.priority(request.endpoint)
+        wait = queue_wait(request.headers.get("X-Request-Start"), time.time())
+        reason = controller.admit(priority, wait)
+        if reason is None:
+            g.admitted = True
+            return None
+
+        REQUESTS_SHED.labels(
+            endpoint=request.endpoint or "none", priority=priority, reason=reason
+        ).inc()
+        response = jsonify(message="Server is too busy, try again later.")
+        response.status_code = 503
+        response.headers["Retry-After"] = str(max(1, math.ceil(wait)))
+        return response
+
+    def release_request(exception=None):
+        if g.pop("admitted", False):
+            controller.release()
+
+    app.before_request(admit_request)
+    app.teardown_request(release_request)
@@ -10,8 +10,9 @@ a test environment.
 
 import os
 
-os.environ["PROMETHEUS_MULTIPROC_DIR"] = "/tmp"
-os.environ["prometheus_multiproc_dir"] = '/path/to/metrics/directory'
+from gridt_server.multiprocess import metrics_dir
+
+metrics_dir()
 
 import sys
 
@@ -24,7 +25,7 @@ from flask import Flask
 from flask_jwt_extended import JWTManager
 from flask_restful import Api
 
-from gridt.db import Session, Base
+from gridt.db import Session
 
 from gridt_server.resources.register import IdentityResource, RegisterResource
 from gridt_server.resources.user import (
@@ -38,6 +39,10 @@ from gridt_server.resources.user import (
 
 from gridt_server.resources.announcement import AnnouncementsResource, SingleAnnouncementResource
 from gridt_server.resources.network import NetworkResource
+from gridt_server.resources.stats import MovementStatsResource
+from gridt_server.resources.history import SignalHistoryResource
+from gridt_server.resources.search import MovementSearchResource
+from gridt_server.resources.feed import FeedResource
 from gridt_server.resources.leader import LeaderResource
 from gridt_server.resources.movements import (
     MovementsResource,
@@ -47,8 +52,28 @@ from gridt_server.resources.movements import (
     NewSignalResource,
 )
 from gridt_server.resources.login import LoginResource
+from gridt_server.migrations import schema_is_current, upgrade
+from gridt_server.instrumentation import install_instrumentation, install_phase_timing
+from gridt_server.profiling import install_profiling
+from gridt_server.slowlog import install_slow_request_log
+from gridt_server.metrics import install_request_metrics
+from gridt_server.health import install_health_checks
+from gridt_server.admission import install_admission_control
+from gridt_server.deadlines import install_deadlines
+from gridt_server.store import install_store
+from gridt_server.ratelimit import install_proxy_fix
+from gridt_server.throttle import install_signal_throttle
+from gridt_server.candidates import install_candidate_pools
+from gridt_server.adjacency import install_adjacency_index
+from gridt_server.membership import install_subscription_index
+from gridt_server.reminders import install_reminder_events
+from gridt_server.rollups import install_activity_stats
+from gridt_server.archive import install_signal_archive
+from gridt_server.search import install_movement_search
+from gridt_server.feed import install_feed
+from gridt_server.edges import install_edge_tracker
+from gridt_server.movements import install_movement_reader
 
-from prometheus_flask_exporter.multiprocess import GunicornPrometheusMetrics
 
 
 def load_config(app, overwrite_conf):
@@ -125,6 +150,14 @@ def register_api_endpoints(api):
     api.add_resource(AnnouncementsResource, "/movements/<movement_id>/announcements")
     api.add_resource(SingleAnnouncementResource, "/movements/<movement_id>/announcements/<announcement_id>")
     api.add_resource(NetworkResource, "/movements/<movement_id>/data")
+    api.add_resource(MovementStatsResource, "/movements/<movement_id>/stats")
+    api.add_resource(
+        SignalHistoryResource, "/movements/<movement_id>/leader/<leader_id>/signals"
+    )
+    # Werkzeug matches static parts before variables, so this does not end up
+    # in SingleMovementResource.
+    api.add_resource(MovementSearchResource, "/movements/search")
+    api.add_resource(FeedResource, "/feed")
 
 
 def create_app(overwrite_conf=None):
@@ -144,19 +177,14 @@ def create_app(overwrite_conf=None):
     """
     app = Flask(__name__)
 
-    metrics = GunicornPrometheusMetrics(app)
-
     load_config(app, overwrite_conf)
     construct_database_url(app)
-
-    try:
-        if not database_exists(app.config["SQLALCHEMY_DATABASE_URI"]):
-            create_database(app.config["SQLALCHEMY_DATABASE_URI"])
-    except OperationalError:
-        app.logger.critical("Could not connect to database.")
-        sys.exit(1)
+    install_proxy_fix(app)
+    install_admission_control(app)
+    install_request_metrics(app)
 
     api = Api(app)
+    install_phase_timing(api)
     register_api_endpoints(api)
 
     jwt = JWTManager(app)
@@ -164,15 +192,56 @@ def create_app(overwrite_conf=None):
     # For backwards compatibility with flask-jwt
     app.config["JWT_HEADER_TYPE"] = "JWT"
 
+    install_store(app)
+    install_reminder_events(app)
+
+    engine = create_engine(app.config["SQLALCHEMY_DATABASE_URI"])
+    app.extensions["engine"] = engine
+    Session.configure(bind=engine)
+    prepare_schema(app, engine)
+    install_edge_tracker(app, engine)
+    install_signal_throttle(app, engine)
+    install_candidate_pools(app, engine)
+    install_adjacency_index(app, engine)
+    install_subscription_index(app, engine)
+    install_movement_reader(app, engine)
+    install_activity_stats(app, engine)
+    install_signal_archive(app, engine)
+    install_movement_search(app, engine)
+    install_feed(app, engine)
+    install_deadlines(app, engine)
+    install_instrumentation(app, engine)
+    install_slow_request_log(app)
+    install_profiling(app)
+    install_health_checks(app, engine)
+
+    return app
+
+
+def prepare_schema(app, engine):
+    """
+    Make sure the database schema is usable before serving requests.
+
+    The schema is managed with migrations (see :mod:`gridt_server.migrations`)
+    so normally this only reads the schema version. When ``AUTO_CREATE_SCHEMA``
+    is set the database is created and migrated on the spot, which is
+    convenient for development but should not be used in deployment.
+    """
+    url = app.config["SQLALCHEMY_DATABASE_URI"]
     try:
-        engine = create_engine(app.config["SQLALCHEMY_DATABASE_URI"])
-        Session.configure(bind=engine)
-        Base.metadata.create_all(engine)
-    except ConnectionRefusedError:
-        app.logger.critical("Connection was refused, exiting.")
+        if app.config.get("AUTO_CREATE_SCHEMA"):
+            if not database_exists(url):
+                create_database(url)
+            upgrade(engine)
+        elif not schema_is_current(engine):
+            app.logger.critical(
+                "Database schema is not up to date, "
+                "run `python -m gridt_server.cli db upgrade`, exiting."
+            )
+            sys.exit(1)
+    except (OperationalError, ConnectionRefusedError):
+        app.logger.critical("Could not connect to database.")
         sys.exit(1)
     except pymysql.err.ProgrammingError:
         app.logger.critical("Programming error, exiting.")
         sys.exit(1)
-
-    return app
@@ -0,0 +1,194 @@
+"""
+Signal archive
+**************
+
+The signals table only grows, and every query that looks for the last signal
+of a leader or draws the network of a movement pays for its size. Signals
+older than ``SIGNAL_RETENTION_DAYS`` (default 365) are therefore moved to
+``signals_archive`` by the command line application, which can run from cron:
+::
+
+    $ python -m gridt_server.cli archive
+
+Signals are moved in batches of ``ARCHIVE_BATCH_SIZE`` (default 1000) rows,
+each in its own short transaction that only touches rows by primary key, with
+a pause of ``ARCHIVE_PAUSE`` seconds between batches, so the web workers
+never wait long for a lock.
+
+The newest ``ARCHIVE_KEEP_PER_LEADER`` (default 3) signals of every leader in
+a movement always stay in the signals table. The gridt library only reads
+that table, so the last signal and the message history of a leader are not
+affected by the archive, and neither are the counters of
+:mod:`gridt_server.counters`, since deleting signals does not change them.
+
+``GET /movements/<id>/leader/<id>/signals`` returns the full history of a
+leader. It reads the signals table first and only reads the archive when
+that returned fewer signals than requested and the requested range reaches
+back beyond the retention window. Archived signals are moved, not counted again,
+so the rollups of :mod:`gridt_server.rollups` still include them.
+"""
+import time
+from datetime import timedelta, timezone
+
+from flask import current_app
+from prometheus_client import Counter
+from sqlalchemy import and_, delete, insert, select
+
+from gridt_server.tables import signals, signals_archive, utcnow
+
+SIGNALS_ARCHIVED = Counter(
+    "signals_archived_total",
+    "Signals moved from the signals table to the archive.",
+)
+
+COLUMNS = ["id", "leader_id", "movement_id", "time_stamp", "message"]
+
+
+def same_leader():
+    """The signals of the leader of a signal in its movement, newest first."""
+    newer = signals.alias("newer")
+    return (
+        select(newer.c.time_stamp)
+        .where(
+            and_(
+                newer.c.movement_id == signals.c.movement_id,
+                newer.c.leader_id == signals.c.leader_id,
+            )
+        )
+        .order_by(newer.c.time_stamp.desc())
+    )
+
+
+class SignalArchiver:
+    def __init__(self, engine, retention_days=365, keep=3, batch_size=1000, pause=0.1):
+        self.engine = engine
+        self.retention = timedelta(days=retention_days)
+        self.keep = keep
+        self.batch_size = batch_size
+        self.pause = pause
+
+    def cutoff(self, now=None):
+        return (now or utcnow()) - self.retention
+
+    def archivable(self, connection, after_id, cutoff):
+        """
+        Look at the next ``batch_size`` signals after ``after_id`` and return
+        the ids among them that can be archived, the last id looked at, and
+        whether the signals reached the cutoff.
+        """
+        # The oldest of the signals that are kept, answered from the end of
+        # the (movement_id, leader_id, time_stamp) index. NULL when the
+        # leader has no more than ``keep`` signals.
+        oldest_kept = same_leader().offset(self.keep - 1).limit(1).scalar_subquery()
+        rows = connection.execute(
+            select(
+                signals.c.id,
+                signals.c.time_stamp < cutoff,
+                signals.c.time_stamp < oldest_kept,
+            )
+            .where(signals.c.id > after_id)
+            .order_by(signals.c.id)
+            .limit(self.batch_size)
+        ).all()
+
+        ids = []
+        for signal_id, old, replaced in rows:
+            if not old:
+                # Signals are written in order, everything after this one
+                # is within the retention window too.
+                return ids, signal_id, True
+            if replaced:
+                ids.append(signal_id)
+        last_id = rows[-1][0] if rows else after_id
+        return ids, last_id, len(rows) < self.batch_size
+
+    def move(self, connection, ids):
+        connection.execute(
+            insert(signals_archive).from_select(
+                COLUMNS,
+                select(*[signals.c[name] for name in COLUMNS]).where(
+                    signals.c.id.in_(ids)
+                ),
+            )
+        )
+        connection.execute(delete(signals).where(signals.c.id.in_(ids)))
+
+    def run(self, now=None, stop=None):
+        """Archive everything older than the retention window and return the count."""
+        cutoff = self.cutoff(now)
+        after_id = 0
+        archived = 0
+        done = False
+        while not done and not (stop and stop.is_set()):
+            with self.engine.begin() as connection:
+                ids, after_id, done = self.archivable(connection, after_id, cutoff)
+                if ids:
+                    self.move(connection, ids)
+            archived += len(ids)
+            SIGNALS_ARCHIVED.inc(len(ids))
+            if ids and not done and self.pause:
+                time.sleep(self.pause)
+        return archived
+
+    def history(self, movement_id, leader_id, start=None, end=None, limit=50):
+        """
+        Return the signals of a leader from ``start`` up to ``end``, newest
+        first. The archive is only read when the signals table has fewer
+        than ``limit`` of them and ``start`` is before the retention window.
+        """
+
+        def query(table, limit):
+            conditions = [
+                table.c.movement_id == movement_id,
+                table.c.leader_id == leader_id,
+            ]
+            if start:
+                conditions.append(table.c.time_stamp >= start)
+            if end:
+                conditions.append(table.c.time_stamp < end)
+            return (
+                select(table.c.time_stamp, table.c.message)
+                .where(*conditions)
+                .order_by(table.c.time_stamp.desc())
+                .limit(limit)
+            )
+
+        with self.engine.connect() as connection:
+            rows = connection.execute(query(signals, limit)).all()
+            if len(rows) < limit and (start is None or start < self.cutoff()):
+                # The newest signals of a leader are never archived, so the
+                # archived ones are all older than those in the signals table.
+                rows += connection.execute(
+                    query(signals_archive, limit - len(rows))
+                ).all()
+        return [
+            {
+                "time_stamp": time_stamp.replace(tzinfo=timezone.utc).isoformat(),
+                "message": message,
+            }
+            for time_stamp, message in rows
+        ]
+
+
+def create_archiver(app, engine):
+    keep = app.config.get("ARCHIVE_KEEP_PER_LEADER", 3)
+    if keep < 1:
+        # The last signal of every leader has to stay in the signals table.
+        raise ValueError("ARCHIVE_KEEP_PER_LEADER has to be at least 1.")
+    return SignalArchiver(
+        engine,
+        retention_days=app.config.get("SIGNAL_RETENTION_DAYS", 365),
+        keep=keep,
+        batch_size=app.config.get("ARCHIVE_BATCH_SIZE", 1000),
+        pause=app.config.get("ARCHIVE_PAUSE", 0.1),
+    )
+
+
+def get_signal_archiver():
+    return current_app.extensions["signal_archiver"]
+
+
+def install_signal_archive(app, engine):
+    archiver = create_archiver(app, engine)
+    app.extensions["signal_archiver"] = archiver
+    return archiver
@@ -0,0 +1,98 @@
+"""
+Bitmap
+******
+
+A compressed bitmap of integers in the style of Roaring bitmaps. The integers
+are grouped by their upper 16 bits into containers, and every container keeps
+the lower 16 bits either in a sorted array of two bytes per integer, as long
+as it holds at most 4096 of them, or in a bitmap of 8 kB. A user is only
+subscribed to a handful of movements, so in practice a bitmap of movement
+ids is a single array of a few bytes.
+"""
+import sys
+from array import array
+from bisect import bisect_left
+
+ARRAY_MAX = 4096
+BITMAP_BYTES = (1 << 16) // 8
+
+
+def popcount(data):
+    return bin(int.from_bytes(data, "little")).count("1")
+
+
+class RoaringBitmap:
+    def __init__(self, values=()):
+        self.containers = {}
+        for value in values:
+            self.add(value)
+
+    def add(self, value):
+        high, low = value >> 16, value & 0xFFFF
+        container = self.containers.get(high)
+        if container is None:
+            self.containers[high] = array("H", [low])
+        elif isinstance(container, array):
+            index = bisect_left(container, low)
+            if index < len(container) and container[index] == low:
+                return
+            container.insert(index, low)
+            if len(container) > ARRAY_MAX:
+                bitmap = bytearray(BITMAP_BYTES)
+                for item in container:
+                    bitmap[item >> 3] |= 1 << (item & 7)
+                self.containers[high] = bitmap
+        else:
+            container[low >> 3] |= 1 << (low & 7)
+
+    def discard(self, value):
+        high, low = value >> 16, value & 0xFFFF
+        container = self.containers.get(high)
+        if container is None:
+            return
+        if isinstance(container, array):
+            index = bisect_left(container, low)
+            if index < len(container) and container[index] == low:
+                del container[index]
+            if not container:
+                del self.containers[high]
+        else:
+            container[low >> 3] &= ~(1 << (low & 7)) & 0xFF
+            if popcount(container) <= ARRAY_MAX:
+                self.containers[high] = array("H", self._bits(container))
+
+    def __contains__(self, value):
+        high, low = value >> 16, value & 0xFFFF
+        container = self.containers.get(high)
+        if container is None:
+            return False
+        if isinstance(container, array):
+            index = bisect_left(container, low)
+            return index < len(container) and container[index] == low
+        return bool(container[low >> 3] & (1 << (low & 7)))
+
+    @staticmethod
+    def _bits(bitmap):
+        for index, byte in enumerate(bitmap):
+            while byte:
+                bit = byte & -byte
+                yield index * 8 + bit.bit_length() - 1
+                byte ^= bit
+
+    def __iter__(self):
+        for high in sorted(self.containers):
+            container = self.containers[high]
+            lows = container if isinstance(container, array) else self._bits(container)
+            for low in lows:
+                yield high << 16 | low
+
+    def __len__(self):
+        return sum(
+            len(container) if isinstance(container, array) else popcount(container)
+            for container in self.containers.values()
+        )
+
+    def nbytes(self):
+        return sys.getsizeof(self.containers) + sum(
+            sys.getsizeof(container) for container in self.containers.values()
+        )
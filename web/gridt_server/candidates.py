@@ -0,0 +1,290 @@
+"""
+Leader candidates
+*****************
+
+When a follower swaps a leader, ``swap_leader`` of the gridt library searches
+the whole movement for a new leader: a subscriber that is not the follower
+and is not followed by them yet. With ``CANDIDATE_POOLS=True`` every worker
+keeps the subscribers of the movements it has seen in a candidate pool
+instead, which picks an eligible leader in constant time, and the server
+swaps the leader itself.
+
+A pool is built with a single query the first time it is needed and is kept
+up to date by the subscriptions and unsubscriptions of the worker. The other
+workers change the subscriptions too, so pools are rebuilt after
+``CANDIDATE_POOL_TTL`` seconds (default 60).
+
+Swaps are optimistic: the leaders of the follower are read without locks and
+the write is a short transaction that only removes the old leader when it is
+still active and only adds the new leader when they are still subscribed and
+not followed yet, which the unique index on active edges of migration 0007
+backs up. When a concurrent request got in between, or the pool was
+stale, or the database reports a deadlock, the swap is tried again after a
+short random backoff, at most ``SWAP_ATTEMPTS`` times, after which
+:class:`SwapConflict` is raised and the request is answered with a 503 and a
+``Retry-After`` header. So concurrent swaps never hold locks while a
+candidate is picked and never result in a wrong swap.
+
+Swaps are counted in ``leader_swaps_total`` by result, and the retries in
+``leader_swap_retries_total`` by reason (``conflict``, ``stale_candidate`` or
+``deadlock``).
+"""
+import random
+import threading
+import time
+
+from flask import current_app
+from prometheus_client import Counter
+from sqlalchemy import and_, exists, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from gridt_server.events import listen
+from gridt_server.tables import followers, subscriptions, utcnow
+
+LEADER_SWAPS = Counter(
+    "leader_swaps_total",
+    "Leader swaps done with the candidate pools.",
+    ["result"],
+)
+SWAP_RETRIES = Counter(
+    "leader_swap_retries_total",
+    "Leader swaps that were tried again because of a concurrent change.",
+    ["reason"],
+)
+
+# Random picks before falling back to going through the whole pool, which
+# only happens when most of the movement is excluded, so when it is small.
+PICK_ATTEMPTS = 8
+SWAP_ATTEMPTS = 5
+# Seconds, doubled for every attempt and randomized.
+SWAP_BACKOFF = 0.005
+
+# Returned by a swap attempt that ran into a concurrent change.
+RETRY = object()
+
+# MySQL: "Deadlock found when trying to get lock" and "Lock wait timeout
+# exceeded".
+MYSQL_LOCK_ERRORS = (1213, 1205)
+
+
+class SwapConflict(Exception):
+    """Raised when a swap kept running into concurrent changes."""
+
+
+def is_lock_conflict(error):
+    """Whether a database error means that the transaction can be tried again."""
+    if error is None or not error.args:
+        return False
+    return error.args[0] in MYSQL_LOCK_ERRORS or "database is locked" in str(error)
+
+
+class CandidatePool:
+    """The subscribers of a movement, in a list for picking at random."""
+
+    def __init__(self, members):
+        self.members = list(members)
+        self.positions = {member: index for index, member in enumerate(self.members)}
+        self.built = time.monotonic()
+
+    def __len__(self):
+        return len(self.members)
+
+    def __contains__(self, member):
+        return member in self.positions
+
+    def add(self, member):
+        if member not in self.positions:
+            self.positions[member] = len(self.members)
+            self.members.append(member)
+
+    def remove(self, member):
+        index = self.positions.pop(member, None)
+        if index is None:
+            return
+        last = self.members.pop()
+        if index < len(self.members):
+            self.members[index] = last
+            self.positions[last] = index
+
+    def pick(self, excluded, rand=random):
+        """Return a random member that is not ``excluded``, or None."""
+        for _ in range(PICK_ATTEMPTS):
+            if not self.members:
+                return None
+            member = self.members[rand.randrange(len(self.members))]
+            if member not in excluded:
+                return member
+        eligible = [member for member in self.members if member not in excluded]
+        return rand.choice(eligible) if eligible else None
+
+
+class CandidatePools:
+    def __init__(self, engine, ttl=60):
+        self.engine = engine
+        self.ttl = ttl
+        self.pools = {}
+        self.lock = threading.Lock()
+
+    def pool(self, movement_id):
+        pool = self.pools.get(movement_id)
+        if pool is None or time.monotonic() - pool.built > self.ttl:
+            with self.engine.connect() as connection:
+                members = connection.execute(
+                    select(subscriptions.c.user_id).where(
+                        and_(
+                            subscriptions.c.movement_id == movement_id,
+                            subscriptions.c.time_removed.is_(None),
+                        )
+                    )
+                ).scalars()
+                pool = CandidatePool(members)
+            self.pools[movement_id] = pool
+        return pool
+
+    def subscribed(self, user_id, movement_id, edges=None):
+        pool = self.pools.get(movement_id)
+        if pool is not None:
+            with self.lock:
+                pool.add(user_id)
+
+    def unsubscribed(self, user_id, movement_id, edges=None):
+        pool = self.pools.get(movement_id)
+        if pool is not None:
+            with self.lock:
+                pool.remove(user_id)
+
+    def swap(self, follower_id, movement_id, leader_id):
+        """
+        Replace ``leader_id`` of ``follower_id`` with a random eligible
+        subscriber of the movement. Return the new leader, or None when there
+        is no eligible subscriber or the follower does not follow the leader.
+        Raise SwapConflict when every attempt ran into a concurrent change.
+        """
+        pool = self.pool(movement_id)
+        for attempt in range(SWAP_ATTEMPTS):
+            if attempt:
+                time.sleep(random.uniform(0, SWAP_BACKOFF * 2**attempt))
+            try:
+                result = self.try_swap(pool, follower_id, movement_id, leader_id)
+            except OperationalError as err:
+                if not is_lock_conflict(err.orig):
+                    raise
+                SWAP_RETRIES.labels("deadlock").inc()
+                continue
+            if result is not RETRY:
+                return result
+        LEADER_SWAPS.labels("gave_up").inc()
+        raise SwapConflict(
+            f"Gave up swapping leader {leader_id} of {follower_id} after "
+            f"{SWAP_ATTEMPTS} attempts."
+        )
+
+    def try_swap(self, pool, follower_id, movement_id, leader_id):
+        """
+        Swap in two short steps. The leaders of the follower are read without
+        locks, then the old leader is removed only if it is still active,
+        which is the version check, and the new one is added only if it is
+        still eligible. Return RETRY when another request got in between.
+        """
+        with self.engine.connect() as connection:
+            edges = dict(
+                connection.execute(
+                    select(followers.c.leader_id, followers.c.id).where(
+                        and_(
+                            followers.c.follower_id == follower_id,
+                            followers.c.movement_id == movement_id,
+                            followers.c.destroyed.is_(None),
+                        )
+                    )
+                ).all()
+            )
+            connection.commit()
+
+            if leader_id not in edges:
+                LEADER_SWAPS.labels("not_following").inc()
+                return None
+            with self.lock:
+                candidate = pool.pick(set(edges) | {follower_id})
+            if candidate is None:
+                LEADER_SWAPS.labels("no_candidate").inc()
+                return None
+
+            now = utcnow()
+            removed = connection.execute(
+                update(followers)
+                .where(
+                    and_(
+                        followers.c.id == edges[leader_id],
+                        followers.c.destroyed.is_(None),
+                    )
+                )
+                .values(destroyed=now)
+            )
+            if not removed.rowcount:
+                connection.rollback()
+                SWAP_RETRIES.labels("conflict").inc()
+                return RETRY
+
+            try:
+                added = connection.execute(
+                    self.add_leader(follower_id, movement_id, candidate, now)
+                )
+            except IntegrityError:
+                # A concurrent swap added the same leader after the NOT EXISTS
+                # check, which is not atomic on MySQL. The unique index on
+                # active edges of migration 0007 rejected the second one.
+                connection.rollback()
+                SWAP_RETRIES.labels("stale_candidate").inc()
+                return RETRY
+            if not added.rowcount:
+                # Keep the old leader rather than leaving the follower with fewer.
+                connection.rollback()
+                with self.lock:
+                    pool.remove(candidate)
+                SWAP_RETRIES.labels("stale_candidate").inc()
+                return RETRY
+
+            connection.commit()
+        LEADER_SWAPS.labels("swapped").inc()
+        return candidate
+
+    @staticmethod
+    def add_leader(follower_id, movement_id, leader_id, now):
+        """Follow ``leader_id`` if they are subscribed and not followed yet."""
+        subscribed = exists().where(
+            and_(
+                subscriptions.c.user_id == leader_id,
+                subscriptions.c.movement_id == movement_id,
+                subscriptions.c.time_removed.is_(None),
+            )
+        )
+        following = exists().where(
+            and_(
+                followers.c.follower_id == follower_id,
+                followers.c.movement_id == movement_id,
+                followers.c.leader_id == leader_id,
+                followers.c.destroyed.is_(None),
+            )
+        )
+        row = select(
+            literal(movement_id), literal(follower_id), literal(leader_id), literal(now)
+        ).where(and_(subscribed, ~following))
+        return insert(followers).from_select(
+            ["movement_id", "follower_id", "leader_id", "created"], row
+        )
+
+
+def get_candidate_pools():
+    """Return the candidate pools of the current app, or None if it has none."""
+    return current_app.extensions.get("candidate_pools")
+
+
+def install_candidate_pools(app, engine):
+    if not app.config.get("CANDIDATE_POOLS"):
+        return None
+
+    pools = CandidatePools(engine, app.config.get("CANDIDATE_POOL_TTL", 60))
+    app.extensions["candidate_pools"] = pools
+    listen(app, "subscribe", pools.subscribed)
+    listen(app, "unsubscribe", pools.unsubscribed)
+    return pools
@@ -0,0 +1,193 @@
+"""
+Command line application
+************************
+
+Maintenance commands that have to run outside of the web workers, most
+importantly the database migrations. The commands read the same conf file as
+the app (``FLASK_CONFIGURATION`` or ``--conf``): ::
+
+    $ python -m gridt_server.cli db upgrade
+    $ python -m gridt_server.cli db current
+    $ python -m gridt_server.cli db revision -m "Add an index" --autogenerate
+    $ python -m gridt_server.cli scheduler
+    $ python -m gridt_server.cli stats check
+    $ python -m gridt_server.cli archive
+"""
+import signal
+import threading
+
+import click
+from alembic import command
+from flask import Flask
+from sqlalchemy import create_engine
+
+from gridt_server.app import load_config, construct_database_url
+from gridt_server.archive import create_archiver
+from gridt_server import counters, rollups
+from gridt_server.migrations import alembic_config
+from gridt_server.profiling import PROFILE_HEADER, profile_token
+from gridt_server.reminders import (
+    ReminderScheduler,
+    check_reminder_config,
+    email_sender,
+)
+from gridt_server.store import create_store
+
+
+@click.group()
+@click.option(
+    "--conf", default=None, help="Conf file to use instead of FLASK_CONFIGURATION."
+)
+@click.pass_context
+def cli(ctx, conf):
+    """Gridt server maintenance commands."""
+    app = Flask("gridt_server")
+    load_config(app, conf)
+    construct_database_url(app)
+    ctx.obj = app
+
+
+@cli.group()
+@click.pass_context
+def db(ctx):
+    """Manage the database schema."""
+    ctx.obj = alembic_config(ctx.obj.config["SQLALCHEMY_DATABASE_URI"])
+
+
+@db.command()
+@click.argument("revision", default="head")
+@click.option("--sql", is_flag=True, help="Print the SQL instead of running it.")
+@click.pass_obj
+def upgrade(config, revision, sql):
+    """Upgrade the database to REVISION (default: head)."""
+    command.upgrade(config, revision, sql=sql)
+
+
+@db.command()
+@click.argument("revision")
+@click.option("--sql", is_flag=True, help="Print the SQL instead of running it.")
+@click.pass_obj
+def downgrade(config, revision, sql):
+    """Downgrade the database to REVISION."""
+    command.downgrade(config, revision, sql=sql)
+
+
+@db.command()
+@click.argument("revision")
+@click.pass_obj
+def stamp(config, revision):
+    """Mark the database as being at REVISION without running migrations."""
+    command.stamp(config, revision)
+
+
+@db.command()
+@click.pass_obj
+def current(config):
+    """Show the revision the database is at."""
+    command.current(config, verbose=True)
+
+
+@db.command()
+@click.pass_obj
+def history(config):
+    """List all revisions."""
+    command.history(config)
+
+
+@db.command()
+@click.option("-m", "--message", required=True, help="Description of the revision.")
+@click.option(
+    "--autogenerate", is_flag=True, help="Compare the models with the database."
+)
+@click.pass_obj
+def revision(config, message, autogenerate):
+    """Create a new revision file."""
+    command.revision(config, message=message, autogenerate=autogenerate)
+
+
+@cli.command("profile-token")
+@click.option("--ttl", default=300, help="Seconds the token stays valid.")
+@click.pass_obj
+def profile_token_command(app, ttl):
+    """Print a header that makes the server profile a request."""
+    key = app.config.get("PROFILE_KEY")
+    if not key:
+        raise click.ClickException("PROFILE_KEY is not set in the conf file.")
+    click.echo(f"{PROFILE_HEADER}: {profile_token(key, ttl)}")
+
+
+@cli.command()
+@click.pass_obj
+def scheduler(app):
+    """Send reminders to leaders whose interval is about to elapse."""
+    if not app.config.get("REMINDERS"):
+        raise click.ClickException("REMINDERS is not set in the conf file.")
+    try:
+        check_reminder_config(app)
+    except RuntimeError as err:
+        raise click.ClickException(str(err))
+    engine = create_engine(app.config["SQLALCHEMY_DATABASE_URI"])
+    reminders = ReminderScheduler(
+        engine,
+        create_store(app),
+        email_sender(engine),
+        lead=app.config.get("REMINDER_LEAD", 0.1),
+        batch_size=app.config.get("REMINDER_BATCH_SIZE", 500),
+    )
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    with app.app_context():
+        reminders.run(
+            stop,
+            resync_interval=app.config.get("REMINDER_RESYNC_INTERVAL", 24 * 60 * 60),
+        )
+
+
+@cli.group()
+@click.pass_context
+def stats(ctx):
+    """Check and repair the movement counters and signal rollups."""
+    ctx.obj = create_engine(ctx.obj.config["SQLALCHEMY_DATABASE_URI"])
+
+
+def echo_drift(found):
+    for item in found:
+        click.echo(f"{item.table} {item.key}: {item.stored} != {item.expected}")
+
+
+@stats.command()
+@click.pass_obj
+def check(engine):
+    """List counters that differ from the source tables, exits 1 if any do."""
+    with engine.connect() as connection:
+        found = counters.drift(connection) + rollups.drift(connection)
+    echo_drift(found)
+    if found:
+        raise click.exceptions.Exit(1)
+    click.echo("The counters are up to date.")
+
+
+@stats.command("repair")
+@click.pass_obj
+def repair_command(engine):
+    """Recompute the counters that differ from the source tables."""
+    with engine.begin() as connection:
+        found = counters.repair(connection) + rollups.repair(connection)
+    echo_drift(found)
+    click.echo(f"Repaired {len(found)} counters.")
+
+
+@cli.command()
+@click.pass_obj
+def archive(app):
+    """Move signals older than the retention window to the archive."""
+    engine = create_engine(app.config["SQLALCHEMY_DATABASE_URI"])
+    archiver = create_archiver(app, engine)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    archived = archiver.run(stop=stop)
+    click.echo(f"Archived {archived} signals older than {archiver.cutoff()}.")
+
+
+if __name__ == "__main__":
+    cli()
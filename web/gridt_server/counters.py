@@ -0,0 +1,216 @@
+"""
+Movement counters
+*****************
+
+Aggregates that would otherwise be computed from the signals, subscriptions
+and announcements tables on every read are kept in two tables of their own:
+
+- ``movement_stats``: the number of subscribers of a movement, the time of
+  the last signal sent in it and the time of its newest announcement.
+- ``leader_signals``: the time of the last signal of every leader in a
+  movement.
+
+The tables are maintained by database triggers that migration 0003 installs
+on ``signals``, ``subscriptions`` and ``announcements``, so they are updated
+in the same transaction as the writes of the gridt library, whichever process
+makes them. Deleting signals does not touch them.
+
+A movement without a row in ``movement_stats`` has no subscribers, signals
+or announcements. ``AUTO_CREATE_SCHEMA`` runs the migrations as well, so the
+triggers are always there. The movement listings read the tables, see
+:mod:`gridt_server.movements`.
+
+Triggers can be lost, for example when a table is recreated by hand, and the
+command line application checks the tables against the source tables and
+repairs them: ::
+
+    $ python -m gridt_server.cli stats check
+    $ python -m gridt_server.cli stats repair
+"""
+from collections import namedtuple
+
+from sqlalchemy import and_, delete, func, insert, select, update
+
+from gridt_server.tables import (
+    announcements,
+    leader_signals,
+    movement_stats,
+    movements,
+    signals,
+    subscriptions,
+)
+
+Drift = namedtuple("Drift", ["table", "key", "stored", "expected"])
+
+EMPTY_MOVEMENT = (0, None, None)
+
+
+def expected_movement_stats(connection):
+    """Compute the movement stats from the source tables."""
+    subscribers = (
+        select(func.count())
+        .where(
+            and_(
+                subscriptions.c.movement_id == movements.c.id,
+                subscriptions.c.time_removed.is_(None),
+            )
+        )
+        .scalar_subquery()
+    )
+    last_signal = (
+        select(func.max(signals.c.time_stamp))
+        .where(signals.c.movement_id == movements.c.id)
+        .scalar_subquery()
+    )
+    last_announcement = (
+        select(func.max(announcements.c.created_time))
+        .where(
+            and_(
+                announcements.c.movement_id == movements.c.id,
+                announcements.c.removed_time.is_(None),
+            )
+        )
+        .scalar_subquery()
+    )
+    rows = connection.execute(
+        select(movements.c.id, subscribers, last_signal, last_announcement)
+    )
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+
+def expected_leader_signals(connection):
+    """Compute the last signal of every leader from the signals table."""
+    rows = connection.execute(
+        select(
+            signals.c.movement_id,
+            signals.c.leader_id,
+            func.max(signals.c.time_stamp),
+        ).group_by(signals.c.movement_id, signals.c.leader_id)
+    )
+    return {(movement_id, leader_id): last for movement_id, leader_id, last in rows}
+
+
+def stored_movement_stats(connection, movement_ids=None):
+    query = select(
+        movement_stats.c.movement_id,
+        movement_stats.c.subscribers,
+        movement_stats.c.last_signal_sent,
+        movement_stats.c.last_announcement,
+    )
+    if movement_ids is not None:
+        query = query.where(movement_stats.c.movement_id.in_(movement_ids))
+    return {row[0]: tuple(row[1:]) for row in connection.execute(query)}
+
+
+def stored_leader_signals(connection, movement_id=None):
+    query = select(
+        leader_signals.c.movement_id,
+        leader_signals.c.leader_id,
+        leader_signals.c.last_signal,
+    )
+    if movement_id is not None:
+        query = query.where(leader_signals.c.movement_id == movement_id)
+    rows = connection.execute(query)
+    return {(movement_id, leader_id): last for movement_id, leader_id, last in rows}
+
+
+def get_movement_stats(connection, movement_ids):
+    """
+    Return the subscriber count, last signal and last announcement of the
+    movements as a dict per movement id.
+    """
+    stored = stored_movement_stats(connection, movement_ids)
+    result = {}
+    for movement_id in movement_ids:
+        subscribers, last_signal, last_announcement = stored.get(
+            movement_id, EMPTY_MOVEMENT
+        )
+        result[movement_id] = {
+            "subscribers": subscribers,
+            "last_signal_sent": last_signal,
+            "last_announcement": last_announcement,
+        }
+    return result
+
+
+def get_last_signals(connection, movement_id):
+    """Return the time of the last signal of every leader of a movement."""
+    return {
+        leader_id: last
+        for (_, leader_id), last in stored_leader_signals(
+            connection, movement_id
+        ).items()
+    }
+
+
+def drift(connection):
+    """List the rows of the counter tables that differ from the source tables."""
+    found = []
+
+    stored = stored_movement_stats(connection)
+    expected = expected_movement_stats(connection)
+    for movement_id in sorted(stored.keys() | expected.keys()):
+        values = stored.get(movement_id, EMPTY_MOVEMENT)
+        correct = expected.get(movement_id, EMPTY_MOVEMENT)
+        if values != correct:
+            found.append(Drift("movement_stats", movement_id, values, correct))
+
+    stored = stored_leader_signals(connection)
+    expected = expected_leader_signals(connection)
+    for key in sorted(stored.keys() | expected.keys()):
+        if stored.get(key) != expected.get(key):
+            found.append(
+                Drift("leader_signals", key, stored.get(key), expected.get(key))
+            )
+
+    return found
+
+
+def repair(connection):
+    """
+    Overwrite the rows that drifted with the values from the source tables and
+    return what was repaired. Run it in a transaction.
+    """
+    found = drift(connection)
+    stats_ids = set(stored_movement_stats(connection))
+    for item in found:
+        if item.table == "movement_stats":
+            subscribers, last_signal, last_announcement = item.expected
+            values = dict(
+                subscribers=subscribers,
+                last_signal_sent=last_signal,
+                last_announcement=last_announcement,
+            )
+            if item.key in stats_ids:
+                connection.execute(
+                    update(movement_stats)
+                    .where(movement_stats.c.movement_id == item.key)
+                    .values(**values)
+                )
+            else:
+                connection.execute(
+                    insert(movement_stats).values(movement_id=item.key, **values)
+                )
+        else:
+            movement_id, leader_id = item.key
+            where = and_(
+                leader_signals.c.movement_id == movement_id,
+                leader_signals.c.leader_id == leader_id,
+            )
+            if item.stored is None:
+                connection.execute(
+                    insert(leader_signals).values(
+                        movement_id=movement_id,
+                        leader_id=leader_id,
+                        last_signal=item.expected,
+                    )
+                )
+            elif item.expected is None:
+                connection.execute(delete(leader_signals).where(where))
+            else:
+                connection.execute(
+                    update(leader_signals)
+                    .where(where)
+                    .values(last_signal=item.expected)
+                )
+    return found
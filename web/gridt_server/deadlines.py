@@ -0,0 +1,124 @@
+"""
+Deadlines
+*********
+
+A request gets a deadline of ``ENDPOINT_DEADLINES[endpoint]`` seconds, or
+``REQUEST_DEADLINE`` for endpoints without one of their own, counted from the
+moment nginx received it. The deadline is pushed down to the database so a
+pathological query cannot hold a worker for longer than that:
+
+- before every statement the remaining time is checked, and a statement that
+  would start after the deadline is not sent at all;
+- on MySQL every ``SELECT`` gets a ``MAX_EXECUTION_TIME`` hint with the
+  remaining time, so the server aborts it;
+- on SQLite a progress handler interrupts the statement.
+
+When the deadline passes the request fails fast with a 503 and
+``deadline_exceeded_total`` is incremented for the endpoint.
+"""
+import re
+import time
+
+from flask import g, has_request_context, request
+from prometheus_client import Counter
+from sqlalchemy import event
+from werkzeug.exceptions import ServiceUnavailable
+
+from gridt_server.admission import queue_wait
+
+DEADLINE_EXCEEDED = Counter(
+    "deadline_exceeded_total",
+    "Requests that failed because their deadline passed.",
+    ["endpoint", "stage"],
+)
+
+# MySQL: "Query execution was interrupted, maximum statement execution time
+# exceeded".
+MYSQL_STATEMENT_TIMEOUT = 3024
+
+SELECT = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+
+
+class DeadlineExceeded(ServiceUnavailable):
+    description = "Request took too long, try again later."
+
+
+def remaining_time():
+    """Seconds left before the deadline of the current request, or None."""
+    if not has_request_context() or "deadline" not in g:
+        return None
+    return g.deadline - time.monotonic()
+
+
+def deadline_exceeded(stage):
+    DEADLINE_EXCEEDED.labels(endpoint=request.endpoint or "none", stage=stage).inc()
+    return DeadlineExceeded()
+
+
+def is_statement_timeout(dialect, error):
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if dialect == "mysql":
+        return bool(error.args) and error.args[0] == MYSQL_STATEMENT_TIMEOUT
+    return "interrupted" in str(error)
+
+
+def install_statement_deadlines(engine):
+    dialect = engine.dialect.name
+
+    @event.listens_for(engine, "before_cursor_execute", retval=True)
+    def enforce_deadline(conn, cursor, statement, parameters, context, executemany):
+        remaining = remaining_time()
+        if remaining is None:
+            return statement, parameters
+        if remaining <= 0:
+            raise deadline_exceeded("statement")
+
+        milliseconds = max(int(remaining * 1000), 1)
+        if dialect == "mysql" and SELECT.match(statement):
+            statement = SELECT.sub(
+                f"SELECT /*+ MAX_EXECUTION_TIME({milliseconds}) */", statement, count=1
+            )
+        elif dialect == "sqlite":
+            deadline = g.deadline
+            conn.connection.driver_connection.set_progress_handler(
+                lambda: time.monotonic() > deadline, 1000
+            )
+        return statement, parameters
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def clear_progress_handler(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        if dialect == "sqlite" and remaining_time() is not None:
+            conn.connection.driver_connection.set_progress_handler(None, 0)
+
+    @event.listens_for(engine, "handle_error")
+    def translate_timeout(exception_context):
+        if dialect == "sqlite" and exception_context.connection is not None:
+            connection = exception_context.connection.connection
+            connection.driver_connection.set_progress_handler(None, 0)
+        error = exception_context.original_exception
+        if remaining_time() is not None and is_statement_timeout(dialect, error):
+            return deadline_exceeded("database")
+        return None
+
+
+def install_deadlines(app, engine):
+    """Enforce the ``REQUEST_DEADLINE`` and ``ENDPOINT_DEADLINES``, if set."""
+    default = app.config.get("REQUEST_DEADLINE")
+    deadlines = app.config.get("ENDPOINT_DEADLINES", {})
+    if default is None and not deadlines:
+        return
+
+    def start_deadline():
+        budget = deadlines.get(request.endpoint, default)
+        if budget is None:
+            return
+        waited = queue_wait(request.headers.get("X-Request-Start"), time.time())
+        g.deadline = time.monotonic() + budget - waited
+        if waited >= budget:
+            raise deadline_exceeded("queue")
+
+    app.before_request(start_deadline)
+    install_statement_deadlines(engine)
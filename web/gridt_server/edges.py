@@ -0,0 +1,111 @@
+"""
+Edges
+*****
+
+Subscribing and unsubscribing make the gridt library create and destroy
+follower edges without telling the server: a new member gets leaders and may
+become the leader of members that have too few, and the followers of a member
+that leaves get other leaders. :func:`edge_changes` reads the edges around the
+user before and after such a change, so that the ``"subscribe"`` and
+``"unsubscribe"`` events can tell the listeners exactly which edges changed
+(see :mod:`gridt_server.events`): ::
+
+    with edge_changes(user_id, movement_id) as edges:
+        new_subscription(user_id, movement_id)
+    emit("subscribe", user_id, movement_id, edges)
+
+Both reads are a single query on the follower table. Apps from ``create_app``
+always have the tracker, see :func:`install_edge_tracker`.
+"""
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+
+from flask import current_app
+from sqlalchemy import and_, or_, select
+
+from gridt_server.tables import followers
+
+# Lists of (follower id, leader id).
+Edges = namedtuple("Edges", ["created", "destroyed"])
+
+
+def active_edges(connection, movement_id, condition):
+    return set(
+        connection.execute(
+            select(followers.c.follower_id, followers.c.leader_id).where(
+                and_(
+                    followers.c.movement_id == movement_id,
+                    followers.c.destroyed.is_(None),
+                    condition,
+                )
+            )
+        ).all()
+    )
+
+
+class EdgeTracker:
+    def __init__(self, engine):
+        self.engine = engine
+
+    @contextmanager
+    def changes(self, user_id, movement_id):
+        """
+        Yield an :class:`Edges` that is filled in with the edges of the
+        movement that were created and destroyed in the block. Only edges of
+        the user and of the followers the user had before are looked at, which
+        are all the edges the library changes when the user subscribes or
+        unsubscribes.
+        """
+        edges = Edges([], [])
+        followers_of_user = select(followers.c.follower_id).where(
+            and_(
+                followers.c.movement_id == movement_id,
+                followers.c.leader_id == user_id,
+                followers.c.destroyed.is_(None),
+            )
+        )
+        with self.engine.connect() as connection:
+            before = active_edges(
+                connection,
+                movement_id,
+                or_(
+                    followers.c.follower_id == user_id,
+                    followers.c.leader_id == user_id,
+                    followers.c.follower_id.in_(followers_of_user),
+                ),
+            )
+        # Read the same followers afterwards, the user may have none by then.
+        follower_ids = {user_id} | {
+            follower_id for follower_id, leader_id in before if leader_id == user_id
+        }
+
+        yield edges
+
+        with self.engine.connect() as connection:
+            after = active_edges(
+                connection,
+                movement_id,
+                or_(
+                    followers.c.follower_id.in_(follower_ids),
+                    followers.c.leader_id == user_id,
+                ),
+            )
+        edges.created.extend(sorted(after - before))
+        edges.destroyed.extend(sorted(before - after))
+
+
+def edge_changes(user_id, movement_id):
+    """
+    Track the edges that change in the block with the tracker of the current
+    app. Without one, the yielded :class:`Edges` stay empty.
+    """
+    tracker = current_app.extensions.get("edge_tracker")
+    if tracker is None:
+        return nullcontext(Edges([], []))
+    return tracker.changes(user_id, movement_id)
+
+
+def install_edge_tracker(app, engine):
+    tracker = EdgeTracker(engine)
+    app.extensions["edge_tracker"] = tracker
+    return tracker
@@ -0,0 +1,37 @@
+"""
+Events
+******
+
+Subscriptions, signals and leader swaps are written by the gridt library,
+which does not tell the server about them. The resources emit an event after
+the library made such a change, and the parts of the server that keep state
+derived from the tables, like the reminder scheduler and the candidate pools,
+listen to them: ::
+
+    listen(app, "subscribe", pools.subscribed)
+    ...
+    emit("subscribe", user_id, movement_id, edges)
+
+The events are ``"subscribe"`` and ``"unsubscribe"``, which are emitted with
+the user id, the movement id and the follower edges the library created and
+destroyed (see :mod:`gridt_server.edges`), ``"signal"``, which is emitted with
+the user id and the movement id, and ``"swap"``, which is emitted with the
+follower id, the movement id, the id of the old leader and the id of the new
+leader, or None when it is not known. ``"create_movement"``
+is emitted with the id of the user that created the movement and
+``"announcement"``, after an announcement was posted, changed or removed,
+with the user id and the movement id. Listeners are called in the request,
+in the order in which they were registered.
+"""
+from flask import current_app
+
+
+def listen(app, event, listener):
+    """Call ``listener`` whenever ``event`` is emitted in ``app``."""
+    listeners = app.extensions.setdefault("event_listeners", {})
+    listeners.setdefault(event, []).append(listener)
+
+
+def emit(event, *args):
+    for listener in current_app.extensions.get("event_listeners", {}).get(event, ()):
+        listener(*args)
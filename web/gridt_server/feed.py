@@ -0,0 +1,362 @@
+"""
+Feed
+****
+
+The home screen shows every movement a user is subscribed to with the
+leaders of the user, their last signals and the newest announcement. Put
+together from the gridt library that is a few queries per movement.
+``GET /feed`` returns it from the store instead (see
+:mod:`gridt_server.store`, which should be shared), which takes two lookups:
+
+- A document per user with the movements of the user and their leaders.
+- The last signal of every one of those leaders in a movement and the newest
+  announcement of every movement, each under a key of its own, read together.
+
+A missing document is built with two queries, whatever the number of
+movements, and missing signals and announcements with one query each. All of
+them are kept for ``FEED_TTL`` seconds (default 3600). The last signals come
+from the counter tables of :mod:`gridt_server.counters`, so the feed needs a
+migrated database. The events of :mod:`gridt_server.events` keep the store up
+to date:
+
+- A signal replaces the last signal of the leader, an announcement the
+  newest announcement of the movement. Neither touches the documents, so
+  their cost does not depend on the number of followers or subscribers.
+- Subscribing or unsubscribing adds or removes the movement in the document
+  of the user, and changes the leaders in the documents of the followers
+  whose edges the library created or destroyed, which the event carries (see
+  :mod:`gridt_server.edges`).
+- A swap changes the leaders of the movement in the document of the follower.
+
+Documents are updated atomically by the store, so events for the same user
+at the same moment do not lose each other's changes, and documents that are
+not in the store are left alone, they are built on the next read. Changes
+the library makes without an event show up when the document expires.
+"""
+import json
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import and_, func, select
+
+from gridt_server.edges import Edges
+from gridt_server.events import listen
+from gridt_server.movements import last_signal_entries, leaders_of
+from gridt_server.rollups import isoformat
+from gridt_server.tables import (
+    announcements,
+    movements,
+    subscriptions,
+    users,
+)
+
+
+def announcement_entry(row):
+    if row is None:
+        return None
+    return {
+        "id": row.id,
+        "message": row.message,
+        "created_time": isoformat(row.created_time),
+    }
+
+
+class Feed:
+    def __init__(self, engine, store, ttl=3600):
+        self.engine = engine
+        self.store = store
+        self.ttl = ttl
+
+    @staticmethod
+    def key(user_id):
+        return f"feed:{user_id}"
+
+    @staticmethod
+    def signal_key(movement_id, leader_id):
+        return f"feed:signal:{movement_id}:{leader_id}"
+
+    @staticmethod
+    def announcement_key(movement_id):
+        return f"feed:announcement:{movement_id}"
+
+    def newest_announcements(self, connection, movement_ids):
+        newest = (
+            select(
+                announcements.c.movement_id,
+                func.max(announcements.c.created_time).label("created_time"),
+            )
+            .where(
+                and_(
+                    announcements.c.movement_id.in_(movement_ids),
+                    announcements.c.removed_time.is_(None),
+                )
+            )
+            .group_by(announcements.c.movement_id)
+            .subquery()
+        )
+        rows = connection.execute(
+            select(
+                announcements.c.id,
+                announcements.c.movement_id,
+                announcements.c.message,
+                announcements.c.created_time,
+            )
+            .select_from(
+                announcements.join(
+                    newest,
+                    and_(
+                        announcements.c.movement_id == newest.c.movement_id,
+                        announcements.c.created_time == newest.c.created_time,
+                    ),
+                )
+            )
+            .where(announcements.c.removed_time.is_(None))
+        )
+        return {row.movement_id: announcement_entry(row) for row in rows}
+
+    def entries(self, connection, user_id, movement_ids=None):
+        """
+        Build the feed entries of the movements of a user, all of them or
+        those in ``movement_ids``, without signals and announcements.
+        """
+        query = (
+            select(
+                movements.c.id,
+                movements.c.name,
+                movements.c.short_description,
+                movements.c.interval,
+            )
+            .select_from(
+                subscriptions.join(
+                    movements, movements.c.id == subscriptions.c.movement_id
+                )
+            )
+            .where(
+                and_(
+                    subscriptions.c.user_id == user_id,
+                    subscriptions.c.time_removed.is_(None),
+                )
+            )
+        )
+        if movement_ids is not None:
+            query = query.where(movements.c.id.in_(movement_ids))
+        entries = {
+            row.id: {
+                "id": row.id,
+                "name": row.name,
+                "short_description": row.short_description,
+                "interval": row.interval,
+                "leaders": [],
+            }
+            for row in connection.execute(query)
+        }
+        if entries:
+            for movement_id, leaders in leaders_of(
+                connection, user_id, list(entries)
+            ).items():
+                entries[movement_id]["leaders"] = leaders
+        return entries
+
+    def build(self, user_id):
+        with self.engine.connect() as connection:
+            entries = self.entries(connection, user_id)
+        document = {
+            "movements": {
+                str(movement_id): entry for movement_id, entry in entries.items()
+            }
+        }
+        self.store.set(self.key(user_id), json.dumps(document), ttl=self.ttl)
+        return entries
+
+    def fill(self, entries):
+        """Add the last signals and the newest announcements to ``entries``."""
+        pairs = [
+            (movement_id, leader["id"])
+            for movement_id, entry in entries.items()
+            for leader in entry["leaders"]
+        ]
+        keys = [self.signal_key(*pair) for pair in pairs]
+        keys += [self.announcement_key(movement_id) for movement_id in entries]
+        values = self.store.get_many(keys)
+        last_signals = dict(zip(pairs, values))
+        newest = dict(zip(entries, values[len(pairs) :]))
+
+        missing_pairs = [pair for pair, value in last_signals.items() if value is None]
+        missing_movements = [
+            movement_id for movement_id, value in newest.items() if value is None
+        ]
+        if missing_pairs or missing_movements:
+            with self.engine.connect() as connection:
+                if missing_pairs:
+                    for pair, entry in last_signal_entries(
+                        connection, missing_pairs
+                    ).items():
+                        last_signals[pair] = json.dumps(entry)
+                        self.store.set(
+                            self.signal_key(*pair), last_signals[pair], ttl=self.ttl
+                        )
+                if missing_movements:
+                    found = self.newest_announcements(connection, missing_movements)
+                    for movement_id in missing_movements:
+                        newest[movement_id] = json.dumps(found.get(movement_id))
+                        self.store.set(
+                            self.announcement_key(movement_id),
+                            newest[movement_id],
+                            ttl=self.ttl,
+                        )
+
+        for movement_id, entry in entries.items():
+            for leader in entry["leaders"]:
+                leader["last_signal"] = json.loads(
+                    last_signals[(movement_id, leader["id"])]
+                )
+            entry["last_announcement"] = json.loads(newest[movement_id])
+
+    def get(self, user_id):
+        """Return the feed of a user, ordered by movement id."""
+        document = self.store.get(self.key(user_id))
+        if document is None:
+            entries = self.build(user_id)
+        else:
+            entries = {
+                int(movement_id): entry
+                for movement_id, entry in json.loads(document)["movements"].items()
+            }
+        self.fill(entries)
+        return [entries[movement_id] for movement_id in sorted(entries)]
+
+    def update(self, user_id, change):
+        """Apply ``change`` to the movements of a user, if the user has a document."""
+
+        def apply(document):
+            document = json.loads(document)
+            change(document["movements"])
+            return json.dumps(document)
+
+        self.store.update(self.key(user_id), apply)
+
+    def signalled(self, leader_id, movement_id):
+        with self.engine.connect() as connection:
+            entry = last_signal_entries(connection, [(movement_id, leader_id)])
+        self.store.set(
+            self.signal_key(movement_id, leader_id),
+            json.dumps(entry[(movement_id, leader_id)]),
+            ttl=self.ttl,
+        )
+
+    def announced(self, user_id, movement_id):
+        with self.engine.connect() as connection:
+            announcement = self.newest_announcements(connection, [movement_id]).get(
+                movement_id
+            )
+        self.store.set(
+            self.announcement_key(movement_id), json.dumps(announcement), ttl=self.ttl
+        )
+
+    def subscribed(self, user_id, movement_id, edges=None):
+        if self.store.get(self.key(user_id)) is not None:
+            with self.engine.connect() as connection:
+                entries = self.entries(connection, user_id, [movement_id])
+
+            def change(document):
+                for added_id, entry in entries.items():
+                    document[str(added_id)] = entry
+
+            self.update(user_id, change)
+        if edges is not None:
+            self.edges_changed(movement_id, edges, user_id)
+
+    def unsubscribed(self, user_id, movement_id, edges=None):
+        def change(document):
+            document.pop(str(movement_id), None)
+
+        self.update(user_id, change)
+        if edges is not None:
+            self.edges_changed(movement_id, edges, user_id)
+
+    def swapped(self, follower_id, movement_id, old_leader_id, new_leader_id):
+        if new_leader_id is not None:
+            edges = Edges(
+                created=[(follower_id, new_leader_id)],
+                destroyed=[(follower_id, old_leader_id)],
+            )
+            self.edges_changed(movement_id, edges)
+            return
+
+        # The library does not tell who the new leader is.
+        if self.store.get(self.key(follower_id)) is None:
+            return
+        with self.engine.connect() as connection:
+            leaders = leaders_of(connection, follower_id, [movement_id])
+
+        def change(document):
+            entry = document.get(str(movement_id))
+            if entry is not None:
+                entry["leaders"] = leaders.get(movement_id, [])
+
+        self.update(follower_id, change)
+
+    def edges_changed(self, movement_id, edges, skip=None):
+        """
+        Change the leaders of the movement in the documents of the followers
+        of ``edges``, except ``skip``, whose entry for the movement is added
+        or removed as a whole.
+        """
+        created = defaultdict(set)
+        destroyed = defaultdict(set)
+        for follower_id, leader_id in edges.created:
+            created[follower_id].add(leader_id)
+        for follower_id, leader_id in edges.destroyed:
+            destroyed[follower_id].add(leader_id)
+        follower_ids = (set(created) | set(destroyed)) - {skip}
+        if not follower_ids:
+            return
+
+        new_leaders = set().union(
+            *(created[follower_id] for follower_id in follower_ids)
+        )
+        usernames = {}
+        if new_leaders:
+            with self.engine.connect() as connection:
+                usernames = dict(
+                    connection.execute(
+                        select(users.c.id, users.c.username).where(
+                            users.c.id.in_(new_leaders)
+                        )
+                    ).all()
+                )
+
+        for follower_id in follower_ids:
+
+            def change(document, follower_id=follower_id):
+                entry = document.get(str(movement_id))
+                if entry is None:
+                    return
+                leaders = {
+                    leader["id"]: leader
+                    for leader in entry["leaders"]
+                    if leader["id"] not in destroyed[follower_id]
+                }
+                for leader_id in created[follower_id]:
+                    leaders[leader_id] = {
+                        "id": leader_id,
+                        "username": usernames.get(leader_id),
+                    }
+                entry["leaders"] = [leaders[leader_id] for leader_id in sorted(leaders)]
+
+            self.update(follower_id, change)
+
+
+def get_feed():
+    return current_app.extensions["feed"]
+
+
+def install_feed(app, engine):
+    feed = Feed(engine, app.extensions["store"], app.config.get("FEED_TTL", 3600))
+    app.extensions["feed"] = feed
+    listen(app, "signal", feed.signalled)
+    listen(app, "announcement", feed.announced)
+    listen(app, "subscribe", feed.subscribed)
+    listen(app, "unsubscribe", feed.unsubscribed)
+    listen(app, "swap", feed.swapped)
+    return feed
@@ -0,0 +1,100 @@
+"""
+Health checks
+*************
+
+``/healthz`` tells whether the worker is alive: it answers immediately and
+never touches the database, the metrics or the Flask request hooks.
+``/readyz`` tells whether the worker can serve traffic: it checks out a
+database connection with a timeout of ``READINESS_TIMEOUT`` seconds (default
+1), runs the other registered readiness checks, such as the cache backend,
+and reports the depth of the queues it knows about.
+
+Both are answered by a WSGI middleware in front of Flask, so health checks do
+not show up in the request metrics and do not need a JWT.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from sqlalchemy import text
+
+LIVENESS_PATH = "/healthz"
+READINESS_PATH = "/readyz"
+
+
+def register_readiness_check(app, name, check):
+    """
+    Add ``check`` to the checks of ``/readyz``. It is called without
+    arguments, should return a dict with details (like queue depths) and
+    raise an exception when the dependency is not available.
+    """
+    app.extensions.setdefault("readiness_checks", {})[name] = check
+
+
+def database_check(engine):
+    def check():
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        pool = engine.pool
+        details = {}
+        # Only QueuePool, the pool used for MySQL, keeps these statistics.
+        for stat in ("size", "checkedout", "overflow", "checkedin"):
+            if callable(getattr(pool, stat, None)):
+                details[f"pool_{stat}"] = getattr(pool, stat)()
+        return details
+
+    return check
+
+
+class HealthCheckMiddleware:
+    def __init__(self, app, wsgi_app, timeout):
+        self.app = app
+        self.wsgi_app = wsgi_app
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="readyz")
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO")
+        if path == LIVENESS_PATH:
+            return self.respond(start_response, 200, {"status": "ok"})
+        if path == READINESS_PATH:
+            return self.respond(start_response, *self.readiness())
+        return self.wsgi_app(environ, start_response)
+
+    def readiness(self):
+        checks = self.app.extensions.get("readiness_checks", {})
+        futures = {name: self.executor.submit(check) for name, check in checks.items()}
+
+        ready = True
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = {"status": "ok", **future.result(timeout=self.timeout)}
+            except TimeoutError:
+                ready = False
+                results[name] = {"status": "timeout"}
+            except Exception as err:
+                ready = False
+                results[name] = {"status": "error", "error": str(err)}
+
+        status = "ok" if ready else "unavailable"
+        return (200 if ready else 503), {"status": status, "checks": results}
+
+    def respond(self, start_response, code, body):
+        payload = json.dumps(body).encode()
+        reason = "OK" if code == 200 else "Service Unavailable"
+        start_response(
+            f"{code} {reason}",
+            [
+                ("Content-Type", "application/json"),
+                ("Content-Length", str(len(payload))),
+                ("Cache-Control", "no-store"),
+            ],
+        )
+        return [payload]
+
+
+def install_health_checks(app, engine):
+    register_readiness_check(app, "database", database_check(engine))
+    app.wsgi_app = HealthCheckMiddleware(
+        app, app.wsgi_app, app.config.get("READINESS_TIMEOUT", 1)
+    )
@@ -0,0 +1,230 @@
+"""
+Instrumentation
+***************
+
+Every request gets a :class:`RequestTrace` in ``flask.g`` that collects the SQL
+statements issued on its behalf. When the request is torn down the number of
+statements and the time spent in the database are exported per endpoint as
+the ``queries_per_request`` and ``db_time_seconds`` histograms.
+
+Statements that take longer than ``SLOW_QUERY_THRESHOLD`` seconds (unset by
+default) are logged. Their parameters are redacted, because they can contain
+e-mail addresses and password hashes.
+
+The trace also times the phases of the resource pipeline: JWT verification,
+schema validation, the gridt controller and serialization of the response,
+plus the database time. They are exported as the ``request_phase_seconds``
+histogram and, when ``SERVER_TIMING_HEADER`` is set, in a ``Server-Timing``
+response header. The database time overlaps with the validation and
+controller phases, since both query the database.
+"""
+import re
+import time
+from collections import namedtuple, Counter, defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, has_request_context, request
+from flask_restful.representations.json import output_json
+from sqlalchemy import event
+
+from gridt_server.metrics import (
+    QUERIES_PER_REQUEST,
+    DB_TIME_SECONDS,
+    REQUEST_PHASE_SECONDS,
+)
+
+Query = namedtuple("Query", ["statement", "duration"])
+
+
+class RequestTrace:
+    """Measurements of the request that is being handled."""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint or "none"
+        self.started = time.perf_counter()
+        self.queries = []
+        self.phases = defaultdict(float)
+
+    def add_query(self, statement, duration):
+        self.queries.append(Query(statement, duration))
+
+    def add_phase(self, name, duration):
+        self.phases[name] += duration
+
+    @property
+    def db_time(self):
+        return sum(query.duration for query in self.queries)
+
+    def phase_timings(self):
+        """
+        Return the duration of every phase in seconds. The controller phase is
+        whatever the resource spent outside of the other timed phases.
+        """
+        timings = {
+            name: self.phases[name]
+            for name in ("jwt", "validation")
+            if name in self.phases
+        }
+        if "view" in self.phases:
+            timings["controller"] = max(
+                self.phases["view"]
+                - sum(
+                    self.phases.get(name, 0)
+                    for name in ("jwt", "validation", "serialization")
+                ),
+                0,
+            )
+        if "serialization" in self.phases:
+            timings["serialization"] = self.phases["serialization"]
+        timings["db"] = self.db_time
+        timings["total"] = time.perf_counter() - self.started
+        return timings
+
+
+def statement_shape(statement):
+    """
+    Reduce a statement to its shape, so that the same query with different
+    literals or a different number of ``IN`` values compares equal.
+    """
+    shape = re.sub(r"'(?:[^']|'')*'", "?", statement)
+    shape = re.sub(r"\b\d+(?:\.\d+)?\b", "?", shape)
+    shape = re.sub(
+        r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)",
+        "(...)",
+        shape,
+    )
+    return " ".join(shape.split())
+
+
+def repeated_shapes(queries):
+    """Return (shape, count) for every statement shape issued more than once."""
+    counts = Counter(statement_shape(query.statement) for query in queries)
+    return [(shape, count) for shape, count in counts.most_common() if count > 1]
+
+
+def current_trace():
+    """Return the trace of the current request, or None outside of one."""
+    if has_request_context():
+        return g.get("trace")
+    return None
+
+
+@contextmanager
+def timed_phase(name):
+    """Add the time spent in the block to phase ``name`` of the request."""
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_phase(name, time.perf_counter() - start)
+
+
+def timed_view(view):
+    """Decorator for the views of the api, it times the whole resource."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with timed_phase("view"):
+            return view(*args, **kwargs)
+
+    return wrapper
+
+
+def timed_output_json(data, code, headers=None):
+    with timed_phase("serialization"):
+        return output_json(data, code, headers)
+
+
+def server_timing(timings):
+    return ", ".join(
+        f"{name};dur={duration * 1000:.2f}" for name, duration in timings.items()
+    )
+
+
+def redact(parameters):
+    """Replace the values of statement parameters with placeholders."""
+    if isinstance(parameters, dict):
+        return {key: "?" for key in parameters}
+    if isinstance(parameters, (list, tuple)):
+        return [
+            redact(value) if isinstance(value, (dict, list, tuple)) else "?"
+            for value in parameters
+        ]
+    return "?"
+
+
+def start_trace():
+    g.trace = RequestTrace(request.endpoint)
+
+
+def add_server_timing(response):
+    trace = current_trace()
+    if trace is not None:
+        response.headers["Server-Timing"] = server_timing(trace.phase_timings())
+    return response
+
+
+def finish_trace(exception=None):
+    trace = g.pop("trace", None)
+    if trace is None:
+        return
+    QUERIES_PER_REQUEST.labels(endpoint=trace.endpoint).observe(len(trace.queries))
+    DB_TIME_SECONDS.labels(endpoint=trace.endpoint).observe(trace.db_time)
+    for phase, duration in trace.phase_timings().items():
+        REQUEST_PHASE_SECONDS.labels(endpoint=trace.endpoint, phase=phase).observe(
+            duration
+        )
+
+
+def install_instrumentation(app, engine):
+    """
+    Attribute the statements executed on ``engine`` to the requests of ``app``.
+    """
+    threshold = app.config.get("SLOW_QUERY_THRESHOLD")
+
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_start_time"].pop()
+        trace = current_trace()
+        if trace is not None:
+            trace.add_query(statement, duration)
+        if threshold is not None and duration > threshold:
+            app.logger.warning(
+                "Slow query (%.3fs) on %s: %s parameters: %s",
+                duration,
+                trace.endpoint if trace else "no request",
+                statement,
+                redact(parameters),
+            )
+
+    def handle_error(exception_context):
+        # after_cursor_execute is skipped for failed statements.
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_start_time"):
+            connection.info["query_start_time"].pop()
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+    app.before_request(start_trace)
+    if app.config.get("SERVER_TIMING_HEADER"):
+        app.after_request(add_server_timing)
+    app.teardown_request(finish_trace)
+
+
+def install_phase_timing(api):
+    """
+    Time the resources of ``api`` and the serialization of their responses.
+    Must be called before the resources are added.
+    """
+    api.decorators = [*api.decorators, timed_view]
+    api.representation("application/json")(timed_output_json)
@@ -0,0 +1,165 @@
+"""
+Membership
+**********
+
+Whether a user is subscribed to a movement is checked by the signal and
+leader schemas and by subscribing and unsubscribing, every time with a query.
+With ``SUBSCRIPTION_INDEX=True`` every worker keeps the movements of the users
+it has seen in a compressed bitmap (see :mod:`gridt_server.bitmap`) and
+answers these checks from memory.
+
+The bitmap of a user is loaded with a single query on first access, kept
+decoded in the worker and updated when the user subscribes or unsubscribes.
+Every change also bumps the version of the user in the store (see
+:mod:`gridt_server.store`, which should be shared). A worker reads that
+version at most once per ``SUBSCRIPTION_INDEX_CHECK_INTERVAL`` seconds
+(default 1) per user, so checks in between are memory reads, and loads the
+bitmap again only when the version changed: a change made by another worker
+costs one query on the next check after the interval. That needs the redis
+store when gunicorn runs more than one worker.
+
+In the meantime a subscription made by another worker may be missing, so
+:func:`gridt_server.schemas.subscribed` trusts the movements in the bitmap
+and asks the database about the others. Subscriptions the library changes
+without the server are picked up because bitmaps are loaded again after
+``SUBSCRIPTION_INDEX_TTL`` seconds (default 300). At most
+``SUBSCRIPTION_INDEX_MAX_USERS`` (default 100000) users are kept, the ones
+that were used least recently are dropped first.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import and_, select
+
+from gridt_server.bitmap import RoaringBitmap
+from gridt_server.events import listen
+from gridt_server.store import require_shared_store
+from gridt_server.tables import subscriptions
+
+
+class LoadedUser:
+    def __init__(self, version, bitmap):
+        self.version = version
+        self.bitmap = bitmap
+        self.loaded = self.checked = time.monotonic()
+
+
+class SubscriptionIndex:
+    def __init__(self, engine, store, max_users=100000, ttl=300, check_interval=1):
+        self.engine = engine
+        self.store = store
+        self.max_users = max_users
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.users = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def version_key(user_id):
+        return f"subscriptions:{user_id}"
+
+    def version(self, user_id):
+        return int(self.store.get(self.version_key(user_id)) or 0)
+
+    def load(self, user_id):
+        with self.engine.connect() as connection:
+            movement_ids = connection.execute(
+                select(subscriptions.c.movement_id).where(
+                    and_(
+                        subscriptions.c.user_id == user_id,
+                        subscriptions.c.time_removed.is_(None),
+                    )
+                )
+            ).scalars()
+            return RoaringBitmap(movement_ids)
+
+    def cached(self, user_id, version=None):
+        """
+        Return the bitmap of a user from memory, if it is still fresh, and
+        with ``version`` if it is the current one, otherwise None.
+        """
+        now = time.monotonic()
+        with self.lock:
+            loaded = self.users.get(user_id)
+            if loaded is None or now - loaded.loaded > self.ttl:
+                return None
+            if version is None:
+                if now - loaded.checked >= self.check_interval:
+                    return None
+            elif loaded.version != version:
+                return None
+            else:
+                loaded.checked = now
+            self.users.move_to_end(user_id)
+            return loaded.bitmap
+
+    def movements(self, user_id):
+        """Return the bitmap of the movements of a user."""
+        bitmap = self.cached(user_id)
+        if bitmap is not None:
+            return bitmap
+
+        # Read the version before the subscriptions, so that a change in
+        # between makes the next check load them again.
+        version = self.version(user_id)
+        bitmap = self.cached(user_id, version)
+        if bitmap is not None:
+            return bitmap
+
+        bitmap = self.load(user_id)
+        with self.lock:
+            self.users[user_id] = LoadedUser(version, bitmap)
+            self.users.move_to_end(user_id)
+            while len(self.users) > self.max_users:
+                self.users.popitem(last=False)
+        return bitmap
+
+    def contains(self, user_id, movement_id):
+        return movement_id in self.movements(user_id)
+
+    def changed(self, user_id, movement_id, subscribed):
+        version = self.store.incr(self.version_key(user_id))
+        with self.lock:
+            loaded = self.users.get(user_id)
+            if loaded is None:
+                return
+            if loaded.version != version - 1:
+                # Another worker changed the user as well, load them again.
+                del self.users[user_id]
+                return
+            if subscribed:
+                loaded.bitmap.add(movement_id)
+            else:
+                loaded.bitmap.discard(movement_id)
+            loaded.version = version
+
+    def subscribed(self, user_id, movement_id, edges=None):
+        self.changed(user_id, movement_id, subscribed=True)
+
+    def unsubscribed(self, user_id, movement_id, edges=None):
+        self.changed(user_id, movement_id, subscribed=False)
+
+
+def get_subscription_index():
+    """Return the subscription index of the current app, or None if it has none."""
+    return current_app.extensions.get("subscription_index")
+
+
+def install_subscription_index(app, engine):
+    if not app.config.get("SUBSCRIPTION_INDEX"):
+        return None
+    require_shared_store(app, "SUBSCRIPTION_INDEX")
+
+    index = SubscriptionIndex(
+        engine,
+        app.extensions["store"],
+        app.config.get("SUBSCRIPTION_INDEX_MAX_USERS", 100000),
+        app.config.get("SUBSCRIPTION_INDEX_TTL", 300),
+        app.config.get("SUBSCRIPTION_INDEX_CHECK_INTERVAL", 1),
+    )
+    app.extensions["subscription_index"] = index
+    listen(app, "subscribe", index.subscribed)
+    listen(app, "unsubscribe", index.unsubscribed)
+    return index
@@ -0,0 +1,142 @@
+"""
+Metrics
+*******
+
+Prometheus metrics of the app. The request latency, count and exception
+metrics come from ``GunicornPrometheusMetrics``, grouped by url rule so that
+``/movements/<movement_id>`` is one series instead of one per movement. Their
+buckets are set with ``LATENCY_BUCKETS``. Endpoints whose latency lives in a
+different range, like the password hashing of ``/auth``, can get a histogram
+of their own with ``ENDPOINT_LATENCY_BUCKETS``: ::
+
+    ENDPOINT_LATENCY_BUCKETS = {
+        "loginresource": [0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 2],
+    }
+
+which is exported as ``loginresource_request_duration_seconds``. The number of
+requests in flight is exported per resource class as
+``http_requests_in_flight``.
+
+The other metrics are defined once per process, the multiprocess collector of
+the gunicorn master aggregates them over the workers.
+"""
+import time
+
+# Imported first, it points the Prometheus client to the metrics directory.
+from gridt_server.multiprocess import metrics_dir
+
+from flask import current_app, g, request
+from prometheus_client import Gauge, Histogram
+from prometheus_flask_exporter.multiprocess import GunicornPrometheusMetrics
+
+QUERIES_PER_REQUEST = Histogram(
+    "queries_per_request",
+    "Number of SQL statements issued while handling a request.",
+    ["endpoint"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, float("inf")),
+)
+
+DB_TIME_SECONDS = Histogram(
+    "db_time_seconds",
+    "Time spent executing SQL statements while handling a request.",
+    ["endpoint"],
+    buckets=(
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1,
+        2.5,
+        float("inf"),
+    ),
+)
+
+REQUEST_PHASE_SECONDS = Histogram(
+    "request_phase_seconds",
+    "Time spent in each phase of handling a request.",
+    ["endpoint", "phase"],
+    buckets=(
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1,
+        2.5,
+        float("inf"),
+    ),
+)
+
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Number of requests being handled, per resource class.",
+    ["resource"],
+    multiprocess_mode="livesum",
+)
+
+_endpoint_histograms = {}
+
+
+def endpoint_histogram(endpoint, buckets):
+    """Return the latency histogram of ``endpoint``, defining it only once."""
+    if endpoint not in _endpoint_histograms:
+        _endpoint_histograms[endpoint] = Histogram(
+            f"{endpoint}_request_duration_seconds",
+            f"Duration of the requests to {endpoint} in seconds.",
+            ["method", "url_rule", "status"],
+            buckets=buckets,
+        )
+    return _endpoint_histograms[endpoint]
+
+
+def resource_name():
+    view = current_app.view_functions.get(request.endpoint)
+    view_class = getattr(view, "view_class", None)
+    return view_class.__name__ if view_class else str(request.endpoint)
+
+
+def install_request_metrics(app):
+    """Export the request metrics configured in the conf file."""
+    metrics_dir()
+    metrics = GunicornPrometheusMetrics(
+        app, group_by="url_rule", buckets=app.config.get("LATENCY_BUCKETS")
+    )
+    histograms = {
+        endpoint: endpoint_histogram(endpoint, buckets)
+        for endpoint, buckets in app.config.get("ENDPOINT_LATENCY_BUCKETS", {}).items()
+    }
+
+    def start_request():
+        g.metrics_resource = resource_name()
+        g.metrics_started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.labels(resource=g.metrics_resource).inc()
+
+    def observe_latency(response):
+        histogram = histograms.get(request.endpoint)
+        if histogram is not None and "metrics_started" in g:
+            histogram.labels(
+                method=request.method,
+                url_rule=str(request.url_rule),
+                status=response.status_code,
+            ).observe(time.perf_counter() - g.metrics_started)
+        return response
+
+    def finish_request(exception=None):
+        resource = g.pop("metrics_resource", None)
+        if resource is not None:
+            REQUESTS_IN_FLIGHT.labels(resource=resource).dec()
+
+    app.before_request(start_request)
+    app.after_request(observe_latency)
+    app.teardown_request(finish_request)
+    return metrics
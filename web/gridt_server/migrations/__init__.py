@@ -0,0 +1,68 @@
+"""
+Migrations
+**********
+
+This package contains the Alembic environment and the revisions that make up
+the schema of the gridt database. Revisions are applied with the command line
+application in :mod:`gridt_server.cli`: ::
+
+    $ python -m gridt_server.cli db upgrade
+
+``create_app()`` does not create or alter tables by default, it only checks
+that the database has been migrated to the newest revision with
+:func:`schema_is_current`. With ``AUTO_CREATE_SCHEMA=True`` in the conf file,
+as in the development and test conf files, it runs the migrations itself with
+:func:`upgrade` instead, so those databases get the same tables, triggers and
+constraints as a deployment.
+"""
+import os
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def alembic_config(database_url):
+    """
+    Build an Alembic configuration for ``database_url`` without an alembic.ini.
+    """
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    # Alembic feeds this value through ConfigParser, so escape interpolation.
+    config.set_main_option("sqlalchemy.url", database_url.replace("%", "%%"))
+    return config
+
+
+def head_revision():
+    """Return the newest revision known to this version of the server."""
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    return ScriptDirectory.from_config(config).get_current_head()
+
+
+def current_revision(engine):
+    """Return the revision stored in the database, or None if unmigrated."""
+    with engine.connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
+
+def schema_is_current(engine):
+    """
+    Check the single ``alembic_version`` row against the newest revision.
+    """
+    return current_revision(engine) == head_revision()
+
+
+def upgrade(engine, revision="head"):
+    """
+    Migrate the database of ``engine`` to ``revision``. The migrations run on
+    a connection of ``engine`` itself, so this also works for an in-memory
+    SQLite database.
+    """
+    config = alembic_config(engine.url.render_as_string(hide_password=False))
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, revision)
@@ -0,0 +1,105 @@
+"""Baseline: the tables of the gridt library
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+The tables as gridt-library 0.1.1 (the version in Pipfile.lock) creates them,
+written out here so that this revision does not change with the library.
+Databases that were created by the old ``create_all`` call at startup already
+contain these tables, tables that exist are skipped so that this revision is a
+no-op for them and they can simply be upgraded.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def membership_columns():
+    return [
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id")),
+        sa.Column("movement_id", sa.Integer, sa.ForeignKey("movements.id")),
+        sa.Column("time_added", sa.DateTime),
+        sa.Column("time_removed", sa.DateTime),
+    ]
+
+
+def tables():
+    """Return (name, columns) of every table, parents before children."""
+    return [
+        (
+            "users",
+            [
+                sa.Column("id", sa.Integer, primary_key=True),
+                sa.Column("username", sa.String(32)),
+                sa.Column("is_admin", sa.Boolean),
+                sa.Column("email", sa.String(40)),
+                sa.Column("password_hash", sa.String(128)),
+                sa.Column("bio", sa.String(1000)),
+            ],
+        ),
+        (
+            "movements",
+            [
+                sa.Column("id", sa.Integer, primary_key=True),
+                sa.Column("name", sa.String(50), nullable=False),
+                sa.Column("interval", sa.String(20), nullable=False),
+                sa.Column("short_description", sa.String(100)),
+                sa.Column("description", sa.String(1000)),
+            ],
+        ),
+        (
+            "movement_user_association",
+            [
+                sa.Column("id", sa.Integer, primary_key=True),
+                sa.Column("movement_id", sa.Integer, sa.ForeignKey("movements.id")),
+                sa.Column("follower_id", sa.Integer, sa.ForeignKey("users.id")),
+                sa.Column("leader_id", sa.Integer, sa.ForeignKey("users.id")),
+                sa.Column("created", sa.DateTime),
+                sa.Column("destroyed", sa.DateTime),
+            ],
+        ),
+        ("subscriptions", membership_columns()),
+        ("creations", membership_columns()),
+        (
+            "signals",
+            [
+                sa.Column("id", sa.Integer, primary_key=True),
+                sa.Column("leader_id", sa.Integer, sa.ForeignKey("users.id")),
+                sa.Column("movement_id", sa.Integer, sa.ForeignKey("movements.id")),
+                sa.Column("time_stamp", sa.DateTime),
+                sa.Column("message", sa.String(140)),
+            ],
+        ),
+        (
+            "announcements",
+            [
+                sa.Column("id", sa.Integer, primary_key=True),
+                sa.Column("movement_id", sa.Integer, sa.ForeignKey("movements.id")),
+                sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id")),
+                sa.Column("message", sa.String(140)),
+                sa.Column("created_time", sa.DateTime),
+                sa.Column("updated_time", sa.DateTime),
+                sa.Column("removed_time", sa.DateTime),
+            ],
+        ),
+    ]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, columns in tables():
+        if not inspector.has_table(name):
+            op.create_table(name, *columns)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, _ in reversed(tables()):
+        if inspector.has_table(name):
+            op.drop_table(name)
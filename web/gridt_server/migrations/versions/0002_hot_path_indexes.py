@@ -0,0 +1,76 @@
+"""Composite indexes for the lookups that run on nearly every request
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+- ``is_subscribed``: subscriptions by (user_id, movement_id, time_removed).
+- ``follows_leader`` and ``get_leader``: followers by (follower_id,
+  movement_id, leader_id, destroyed), and followers of a leader by
+  (movement_id, leader_id).
+- ``movement_name_exists``: movements by name.
+- The last signal per leader in ``get_movement`` and ``get_all_movements``:
+  signals by (movement_id, leader_id, time_stamp), which lets the database
+  answer ``MAX(time_stamp)`` from the end of the index.
+
+An index is skipped when the table already has one that starts with the same
+columns, for example the unique index that backs a unique name.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    (
+        "ix_subscriptions_user_movement",
+        "subscriptions",
+        ["user_id", "movement_id", "time_removed"],
+    ),
+    (
+        "ix_mua_follower_movement_leader",
+        "movement_user_association",
+        ["follower_id", "movement_id", "leader_id", "destroyed"],
+    ),
+    (
+        "ix_mua_movement_leader",
+        "movement_user_association",
+        ["movement_id", "leader_id"],
+    ),
+    ("ix_movements_name", "movements", ["name"]),
+    (
+        "ix_signals_movement_leader_time",
+        "signals",
+        ["movement_id", "leader_id", "time_stamp"],
+    ),
+]
+
+
+def existing_indexes(table_name):
+    inspector = sa.inspect(op.get_bind())
+    indexes = inspector.get_indexes(table_name)
+    indexes += inspector.get_unique_constraints(table_name)
+    return indexes
+
+
+def is_covered(table_name, columns):
+    for index in existing_indexes(table_name):
+        if index["column_names"][: len(columns)] == columns:
+            return True
+    return False
+
+
+def upgrade():
+    for name, table_name, columns in INDEXES:
+        if not is_covered(table_name, columns):
+            op.create_index(name, table_name, columns)
+
+
+def downgrade():
+    for name, table_name, _ in reversed(INDEXES):
+        names = [index["name"] for index in existing_indexes(table_name)]
+        if name in names:
+            op.drop_index(name, table_name=table_name)
@@ -0,0 +1,227 @@
+"""Counter tables maintained by triggers
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+Adds ``movement_stats`` and ``leader_signals`` (see
+:mod:`gridt_server.counters`), the triggers that keep them up to date on
+writes to ``signals``, ``subscriptions`` and ``announcements``, and an index
+for finding the newest announcement of a movement. The tables are filled
+from the existing rows with the queries below, which are kept as they were at
+this revision rather than shared with :mod:`gridt_server.counters`.
+
+On MySQL with binary logging enabled, creating triggers requires the SUPER
+privilege or ``log_bin_trust_function_creators=1``.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# The dialects differ in how they upsert, how they refer to the value that
+# was to be inserted and in the name of the two argument maximum.
+DIALECTS = {
+    "sqlite": {
+        "upsert": "ON CONFLICT ({key}) DO UPDATE SET",
+        "new": "excluded.{column}",
+        "greatest": "MAX",
+    },
+    "mysql": {
+        "upsert": "ON DUPLICATE KEY UPDATE",
+        "new": "VALUES({column})",
+        "greatest": "GREATEST",
+    },
+}
+
+MOVEMENT_KEY = "movement_id"
+LEADER_KEY = "movement_id, leader_id"
+
+SUBSCRIBER_DELTA = (
+    "(CASE WHEN NEW.time_removed IS NULL THEN 1 ELSE 0 END)"
+    " - (CASE WHEN OLD.time_removed IS NULL THEN 1 ELSE 0 END)"
+)
+LAST_ANNOUNCEMENT = (
+    "(SELECT MAX(created_time) FROM announcements"
+    " WHERE movement_id = {row}.movement_id AND removed_time IS NULL)"
+)
+LATEST = "{greatest}(COALESCE({column}, {new}), {new})"
+
+# (name, event, table, statements). Every statement is an upsert into
+# movement_stats or leader_signals: (table, key, values, updates).
+TRIGGERS = [
+    (
+        "signals_counters",
+        "INSERT",
+        "signals",
+        [
+            (
+                "movement_stats",
+                MOVEMENT_KEY,
+                {
+                    "movement_id": "NEW.movement_id",
+                    "subscribers": "0",
+                    "last_signal_sent": "NEW.time_stamp",
+                },
+                {"last_signal_sent": LATEST},
+            ),
+            (
+                "leader_signals",
+                LEADER_KEY,
+                {
+                    "movement_id": "NEW.movement_id",
+                    "leader_id": "NEW.leader_id",
+                    "last_signal": "NEW.time_stamp",
+                },
+                {"last_signal": LATEST},
+            ),
+        ],
+    ),
+    (
+        "subscriptions_insert_counters",
+        "INSERT",
+        "subscriptions",
+        [
+            (
+                "movement_stats",
+                MOVEMENT_KEY,
+                {
+                    "movement_id": "NEW.movement_id",
+                    "subscribers": (
+                        "CASE WHEN NEW.time_removed IS NULL THEN 1 ELSE 0 END"
+                    ),
+                },
+                {"subscribers": "subscribers + {new}"},
+            ),
+        ],
+    ),
+    (
+        "subscriptions_update_counters",
+        "UPDATE",
+        "subscriptions",
+        [
+            (
+                "movement_stats",
+                MOVEMENT_KEY,
+                {"movement_id": "NEW.movement_id", "subscribers": SUBSCRIBER_DELTA},
+                {"subscribers": "subscribers + {new}"},
+            ),
+        ],
+    ),
+    (
+        "subscriptions_delete_counters",
+        "DELETE",
+        "subscriptions",
+        [
+            (
+                "movement_stats",
+                MOVEMENT_KEY,
+                {
+                    "movement_id": "OLD.movement_id",
+                    "subscribers": (
+                        "0 - (CASE WHEN OLD.time_removed IS NULL THEN 1 ELSE 0 END)"
+                    ),
+                },
+                {"subscribers": "subscribers + {new}"},
+            ),
+        ],
+    ),
+] + [
+    (
+        f"announcements_{event.lower()}_counters",
+        event,
+        "announcements",
+        [
+            (
+                "movement_stats",
+                MOVEMENT_KEY,
+                {
+                    "movement_id": f"{row}.movement_id",
+                    "subscribers": "0",
+                    "last_announcement": LAST_ANNOUNCEMENT.format(row=row),
+                },
+                {"last_announcement": "{new}"},
+            ),
+        ],
+    )
+    for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD"))
+]
+
+
+BACKFILL = [
+    "INSERT INTO movement_stats"
+    " (movement_id, subscribers, last_signal_sent, last_announcement)"
+    " SELECT id, (SELECT COUNT(*) FROM subscriptions"
+    " WHERE movement_id = movements.id AND time_removed IS NULL),"
+    " (SELECT MAX(time_stamp) FROM signals WHERE movement_id = movements.id),"
+    " (SELECT MAX(created_time) FROM announcements"
+    " WHERE movement_id = movements.id AND removed_time IS NULL)"
+    " FROM movements",
+    "INSERT INTO leader_signals (movement_id, leader_id, last_signal)"
+    " SELECT movement_id, leader_id, MAX(time_stamp) FROM signals"
+    " GROUP BY movement_id, leader_id",
+]
+
+
+def upsert_sql(dialect, table_name, key, values, updates):
+    syntax = DIALECTS[dialect]
+    assignments = ", ".join(
+        f"{column} = "
+        + expression.format(
+            column=column,
+            new=syntax["new"].format(column=column),
+            greatest=syntax["greatest"],
+        )
+        for column, expression in updates.items()
+    )
+    return (
+        f"INSERT INTO {table_name} ({', '.join(values)}) "
+        f"VALUES ({', '.join(values.values())}) "
+        f"{syntax['upsert'].format(key=key)} {assignments}"
+    )
+
+
+def trigger_sql(dialect, name, event, table_name, statements):
+    body = "; ".join(upsert_sql(dialect, *statement) for statement in statements)
+    return (
+        f"CREATE TRIGGER {name} AFTER {event} ON {table_name} "
+        f"FOR EACH ROW BEGIN {body}; END"
+    )
+
+
+def upgrade():
+    op.create_table(
+        "movement_stats",
+        sa.Column("movement_id", sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column("subscribers", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("last_signal_sent", sa.DateTime),
+        sa.Column("last_announcement", sa.DateTime),
+    )
+    op.create_table(
+        "leader_signals",
+        sa.Column("movement_id", sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column("leader_id", sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column("last_signal", sa.DateTime),
+    )
+    op.create_index(
+        "ix_announcements_movement_created",
+        "announcements",
+        ["movement_id", "created_time"],
+    )
+
+    bind = op.get_bind()
+    for trigger in TRIGGERS:
+        op.execute(trigger_sql(bind.dialect.name, *trigger))
+    for statement in BACKFILL:
+        op.execute(statement)
+
+
+def downgrade():
+    for name, *_ in reversed(TRIGGERS):
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.drop_index("ix_announcements_movement_created", table_name="announcements")
+    op.drop_table("leader_signals")
+    op.drop_table("movement_stats")
@@ -0,0 +1,117 @@
+"""Hourly and daily signal rollups
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+Adds ``signal_rollups`` (see :mod:`gridt_server.rollups`) and the trigger
+that counts every new signal in its hour and its day bucket, and fills the
+table from the existing signals with a query per granularity, which is kept
+as it was at this revision rather than shared with :mod:`gridt_server.rollups`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+TRIGGER = "signals_rollups"
+
+# The start and the end of the bucket of a signal at {time}, per dialect and
+# granularity. SQLite stores times as text, the format has to be the one of
+# SQLAlchemy so that the buckets written by the trigger and by the backfill
+# are the same.
+BUCKETS = {
+    "sqlite": {
+        "hour": (
+            "strftime('%Y-%m-%d %H:00:00.000000', {time})",
+            "strftime('%Y-%m-%d %H:00:00.000000', {time}, '+1 hour')",
+        ),
+        "day": (
+            "strftime('%Y-%m-%d 00:00:00.000000', {time})",
+            "strftime('%Y-%m-%d 00:00:00.000000', {time}, '+1 day')",
+        ),
+    },
+    "mysql": {
+        "hour": (
+            "CAST(DATE_FORMAT({time}, '%Y-%m-%d %H:00:00') AS DATETIME)",
+            "CAST(DATE_FORMAT({time}, '%Y-%m-%d %H:00:00') AS DATETIME)"
+            " + INTERVAL 1 HOUR",
+        ),
+        "day": (
+            "CAST(DATE({time}) AS DATETIME)",
+            "CAST(DATE({time}) AS DATETIME) + INTERVAL 1 DAY",
+        ),
+    },
+}
+
+UPSERT = {
+    "sqlite": (
+        "ON CONFLICT (movement_id, granularity, bucket) DO UPDATE SET "
+        "signals = signals + 1, leaders = leaders + excluded.leaders"
+    ),
+    "mysql": (
+        "ON DUPLICATE KEY UPDATE "
+        "signals = signals + 1, leaders = leaders + VALUES(leaders)"
+    ),
+}
+
+# 1 when this is the first signal of the leader in the bucket.
+NEW_LEADER = (
+    "CASE WHEN EXISTS (SELECT 1 FROM signals WHERE movement_id = NEW.movement_id"
+    " AND leader_id = NEW.leader_id AND time_stamp >= {start}"
+    " AND time_stamp < {end} AND id <> NEW.id) THEN 0 ELSE 1 END"
+)
+
+
+BACKFILL = (
+    "INSERT INTO signal_rollups (movement_id, granularity, bucket, signals, leaders)"
+    " SELECT movement_id, '{granularity}', {bucket},"
+    " COUNT(*), COUNT(DISTINCT leader_id)"
+    " FROM signals GROUP BY movement_id, {bucket}"
+)
+
+
+def bucket_sql(dialect, granularity, time):
+    start, end = BUCKETS[dialect][granularity]
+    return start.format(time=time), end.format(time=time)
+
+
+def trigger_sql(dialect):
+    statements = []
+    for granularity in BUCKETS[dialect]:
+        start, end = bucket_sql(dialect, granularity, "NEW.time_stamp")
+        statements.append(
+            "INSERT INTO signal_rollups"
+            " (movement_id, granularity, bucket, signals, leaders)"
+            f" VALUES (NEW.movement_id, '{granularity}', {start}, 1, "
+            f"{NEW_LEADER.format(start=start, end=end)}) {UPSERT[dialect]}"
+        )
+    return (
+        f"CREATE TRIGGER {TRIGGER} AFTER INSERT ON signals "
+        f"FOR EACH ROW BEGIN {'; '.join(statements)}; END"
+    )
+
+
+def upgrade():
+    op.create_table(
+        "signal_rollups",
+        sa.Column("movement_id", sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column("granularity", sa.String(8), primary_key=True),
+        sa.Column("bucket", sa.DateTime, primary_key=True),
+        sa.Column("signals", sa.Integer, nullable=False),
+        sa.Column("leaders", sa.Integer, nullable=False),
+    )
+
+    dialect = op.get_bind().dialect.name
+    op.execute(trigger_sql(dialect))
+    for granularity in BUCKETS[dialect]:
+        bucket, _ = bucket_sql(dialect, granularity, "time_stamp")
+        op.execute(BACKFILL.format(granularity=granularity, bucket=bucket))
+
+
+def downgrade():
+    op.execute(f"DROP TRIGGER IF EXISTS {TRIGGER}")
+    op.drop_table("signal_rollups")
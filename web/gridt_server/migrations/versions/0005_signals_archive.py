@@ -0,0 +1,48 @@
+"""Archive table for old signals
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+
+Adds ``signals_archive`` (see :mod:`gridt_server.archive`) with the columns
+of ``signals``. The column types are copied from the signals table of the
+database, so archived rows always fit. The ids are the ids of the signals, so
+they are not generated.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    (
+        "ix_signals_archive_movement_leader_time",
+        ["movement_id", "leader_id", "time_stamp"],
+    ),
+]
+
+
+def upgrade():
+    signals = sa.Table("signals", sa.MetaData(), autoload_with=op.get_bind())
+    op.create_table(
+        "signals_archive",
+        *[
+            sa.Column(
+                column.name,
+                column.type,
+                primary_key=column.primary_key,
+                autoincrement=False,
+                nullable=column.nullable,
+            )
+            for column in signals.columns
+        ],
+    )
+    for name, columns in INDEXES:
+        op.create_index(name, "signals_archive", columns)
+
+
+def downgrade():
+    op.drop_table("signals_archive")
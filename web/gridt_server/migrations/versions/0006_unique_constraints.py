@@ -0,0 +1,140 @@
+"""Unique constraints behind subscribing, creating movements and registering
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+
+The resources insert without checking first and rely on these constraints
+to reject duplicates:
+
+- A user has at most one active subscription to a movement. Removed
+  subscriptions stay in the table, so only rows without ``time_removed`` are
+  unique: with a partial index on SQLite, and on MySQL, which has no partial
+  indexes, with a generated column that is NULL for removed subscriptions.
+  Duplicate active subscriptions that already exist are ended, except for the
+  newest one.
+- Movement names are unique.
+- E-mail addresses are unique. Existing duplicate names or addresses have to
+  be resolved by hand, the migration lists them and stops.
+
+Constraints that the tables already have are not created again.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from gridt_server.tables import utcnow
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+ACTIVE_SUBSCRIPTION = "uq_subscriptions_active"
+UNIQUE_COLUMNS = [
+    ("uq_movements_name", "movements", "name"),
+    ("uq_users_email", "users", "email"),
+]
+
+
+def has_unique(table_name, column_name):
+    inspector = sa.inspect(op.get_bind())
+    uniques = inspector.get_unique_constraints(table_name)
+    uniques += [index for index in inspector.get_indexes(table_name) if index["unique"]]
+    return any(unique["column_names"] == [column_name] for unique in uniques)
+
+
+def end_duplicate_subscriptions(bind):
+    subscriptions = sa.table(
+        "subscriptions",
+        sa.column("id"),
+        sa.column("user_id"),
+        sa.column("movement_id"),
+        sa.column("time_removed"),
+    )
+    active = subscriptions.c.time_removed.is_(None)
+    newest = (
+        sa.select(
+            subscriptions.c.user_id,
+            subscriptions.c.movement_id,
+            sa.func.max(subscriptions.c.id),
+        )
+        .where(active)
+        .group_by(subscriptions.c.user_id, subscriptions.c.movement_id)
+        .having(sa.func.count() > 1)
+    )
+    for user_id, movement_id, keep_id in bind.execute(newest).all():
+        bind.execute(
+            sa.update(subscriptions)
+            .where(
+                subscriptions.c.user_id == user_id,
+                subscriptions.c.movement_id == movement_id,
+                subscriptions.c.id != keep_id,
+                active,
+            )
+            .values(time_removed=utcnow())
+        )
+
+
+def check_duplicates(bind, table_name, column_name):
+    column = sa.column(column_name)
+    duplicates = (
+        bind.execute(
+            sa.select(column)
+            .select_from(sa.table(table_name, column))
+            .group_by(column)
+            .having(sa.func.count() > 1)
+        )
+        .scalars()
+        .all()
+    )
+    if duplicates:
+        raise RuntimeError(
+            f"Cannot make {table_name}.{column_name} unique, "
+            f"these values occur more than once: {', '.join(map(str, duplicates))}"
+        )
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    end_duplicate_subscriptions(bind)
+    if bind.dialect.name == "mysql":
+        op.add_column(
+            "subscriptions",
+            sa.Column(
+                "active",
+                sa.Boolean,
+                sa.Computed("IF(time_removed IS NULL, 1, NULL)"),
+            ),
+        )
+        op.create_index(
+            ACTIVE_SUBSCRIPTION,
+            "subscriptions",
+            ["user_id", "movement_id", "active"],
+            unique=True,
+        )
+    else:
+        op.create_index(
+            ACTIVE_SUBSCRIPTION,
+            "subscriptions",
+            ["user_id", "movement_id"],
+            unique=True,
+            sqlite_where=sa.text("time_removed IS NULL"),
+            postgresql_where=sa.text("time_removed IS NULL"),
+        )
+
+    for name, table_name, column_name in UNIQUE_COLUMNS:
+        if not has_unique(table_name, column_name):
+            check_duplicates(bind, table_name, column_name)
+            op.create_index(name, table_name, [column_name], unique=True)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table_name, _ in reversed(UNIQUE_COLUMNS):
+        if name in [index["name"] for index in inspector.get_indexes(table_name)]:
+            op.drop_index(name, table_name=table_name)
+
+    op.drop_index(ACTIVE_SUBSCRIPTION, table_name="subscriptions")
+    if op.get_bind().dialect.name == "mysql":
+        op.drop_column("subscriptions", "active")
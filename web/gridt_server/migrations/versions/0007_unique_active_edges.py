@@ -0,0 +1,97 @@
+"""Unique active follower edges
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+
+A follower follows a leader in a movement at most once. Leader swaps of the
+candidate pools (see :mod:`gridt_server.candidates`) add the new leader with
+an ``INSERT ... SELECT ... WHERE NOT EXISTS``, which two concurrent swaps can
+both pass on MySQL, so the database enforces it. Destroyed edges stay in the
+table, so only rows without ``destroyed`` are unique: with a partial index on
+SQLite, and on MySQL with a generated column that is NULL for destroyed
+edges, like the active subscriptions of 0006. Duplicate active edges that
+already exist are destroyed, except for the newest one.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from gridt_server.tables import utcnow
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+ACTIVE_EDGE = "uq_movement_user_association_active"
+
+
+def destroy_duplicate_edges(bind):
+    edges = sa.table(
+        "movement_user_association",
+        sa.column("id"),
+        sa.column("movement_id"),
+        sa.column("follower_id"),
+        sa.column("leader_id"),
+        sa.column("destroyed"),
+    )
+    active = edges.c.destroyed.is_(None)
+    newest = (
+        sa.select(
+            edges.c.movement_id,
+            edges.c.follower_id,
+            edges.c.leader_id,
+            sa.func.max(edges.c.id),
+        )
+        .where(active)
+        .group_by(edges.c.movement_id, edges.c.follower_id, edges.c.leader_id)
+        .having(sa.func.count() > 1)
+    )
+    for movement_id, follower_id, leader_id, keep_id in bind.execute(newest).all():
+        bind.execute(
+            sa.update(edges)
+            .where(
+                edges.c.movement_id == movement_id,
+                edges.c.follower_id == follower_id,
+                edges.c.leader_id == leader_id,
+                edges.c.id != keep_id,
+                active,
+            )
+            .values(destroyed=utcnow())
+        )
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    destroy_duplicate_edges(bind)
+    if bind.dialect.name == "mysql":
+        op.add_column(
+            "movement_user_association",
+            sa.Column(
+                "active",
+                sa.Boolean,
+                sa.Computed("IF(destroyed IS NULL, 1, NULL)"),
+            ),
+        )
+        op.create_index(
+            ACTIVE_EDGE,
+            "movement_user_association",
+            ["movement_id", "follower_id", "leader_id", "active"],
+            unique=True,
+        )
+    else:
+        op.create_index(
+            ACTIVE_EDGE,
+            "movement_user_association",
+            ["movement_id", "follower_id", "leader_id"],
+            unique=True,
+            sqlite_where=sa.text("destroyed IS NULL"),
+            postgresql_where=sa.text("destroyed IS NULL"),
+        )
+
+
+def downgrade():
+    op.drop_index(ACTIVE_EDGE, table_name="movement_user_association")
+    if op.get_bind().dialect.name == "mysql":
+        op.drop_column("movement_user_association", "active")
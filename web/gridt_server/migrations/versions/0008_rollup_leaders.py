@@ -0,0 +1,145 @@
+"""Count the leaders of a rollup bucket with a row per leader
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+
+The trigger of 0004 decided whether a signal was the first of its leader in
+a bucket by looking for other signals of the leader in the bucket. Two
+signals of the same leader in concurrent transactions do not see each other,
+so both counted the leader. This adds ``signal_rollup_leaders`` with a row
+per leader per bucket, filled from the existing signals and archived
+signals, and replaces the trigger by one that inserts that row, ignoring
+duplicates, and adds the number of inserted rows to ``leaders``. The unique
+key makes the second transaction wait for the first, so a leader is counted
+once.
+
+The buckets are built as in 0004, they are kept here as they were at this
+revision.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+TRIGGER = "signals_rollups"
+
+BUCKETS = {
+    "sqlite": {
+        "hour": "strftime('%Y-%m-%d %H:00:00.000000', {time})",
+        "day": "strftime('%Y-%m-%d 00:00:00.000000', {time})",
+    },
+    "mysql": {
+        "hour": "CAST(DATE_FORMAT({time}, '%Y-%m-%d %H:00:00') AS DATETIME)",
+        "day": "CAST(DATE({time}) AS DATETIME)",
+    },
+}
+
+INSERT_IGNORE = {
+    "sqlite": "INSERT OR IGNORE",
+    "mysql": "INSERT IGNORE",
+}
+
+# The number of rows the previous statement inserted.
+ROW_COUNT = {
+    "sqlite": "changes()",
+    "mysql": "ROW_COUNT()",
+}
+
+UPSERT = {
+    "sqlite": (
+        "ON CONFLICT (movement_id, granularity, bucket) DO UPDATE SET "
+        "signals = signals + 1, leaders = leaders + excluded.leaders"
+    ),
+    "mysql": (
+        "ON DUPLICATE KEY UPDATE "
+        "signals = signals + 1, leaders = leaders + VALUES(leaders)"
+    ),
+}
+
+BACKFILL = (
+    "INSERT INTO signal_rollup_leaders (movement_id, granularity, bucket, leader_id)"
+    " SELECT DISTINCT movement_id, '{granularity}', {bucket}, leader_id FROM ("
+    " SELECT movement_id, leader_id, time_stamp FROM signals UNION ALL"
+    " SELECT movement_id, leader_id, time_stamp FROM signals_archive) AS source"
+)
+
+# The trigger of 0004, for the downgrade.
+NEW_LEADER = (
+    "CASE WHEN EXISTS (SELECT 1 FROM signals WHERE movement_id = NEW.movement_id"
+    " AND leader_id = NEW.leader_id AND time_stamp >= {start}"
+    " AND time_stamp < {end} AND id <> NEW.id) THEN 0 ELSE 1 END"
+)
+BUCKET_ENDS = {
+    "sqlite": {
+        "hour": "strftime('%Y-%m-%d %H:00:00.000000', {time}, '+1 hour')",
+        "day": "strftime('%Y-%m-%d 00:00:00.000000', {time}, '+1 day')",
+    },
+    "mysql": {
+        "hour": "CAST(DATE_FORMAT({time}, '%Y-%m-%d %H:00:00') AS DATETIME)"
+        " + INTERVAL 1 HOUR",
+        "day": "CAST(DATE({time}) AS DATETIME) + INTERVAL 1 DAY",
+    },
+}
+
+
+def create_trigger(statements):
+    op.execute(
+        f"CREATE TRIGGER {TRIGGER} AFTER INSERT ON signals "
+        f"FOR EACH ROW BEGIN {'; '.join(statements)}; END"
+    )
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    op.create_table(
+        "signal_rollup_leaders",
+        sa.Column("movement_id", sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column("granularity", sa.String(8), primary_key=True),
+        sa.Column("bucket", sa.DateTime, primary_key=True),
+        sa.Column("leader_id", sa.Integer, primary_key=True, autoincrement=False),
+    )
+
+    op.execute(f"DROP TRIGGER IF EXISTS {TRIGGER}")
+    statements = []
+    for granularity, bucket in BUCKETS[dialect].items():
+        start = bucket.format(time="NEW.time_stamp")
+        statements.append(
+            f"{INSERT_IGNORE[dialect]} INTO signal_rollup_leaders"
+            " (movement_id, granularity, bucket, leader_id)"
+            f" VALUES (NEW.movement_id, '{granularity}', {start}, NEW.leader_id)"
+        )
+        statements.append(
+            "INSERT INTO signal_rollups"
+            " (movement_id, granularity, bucket, signals, leaders)"
+            f" VALUES (NEW.movement_id, '{granularity}', {start}, 1,"
+            f" {ROW_COUNT[dialect]}) {UPSERT[dialect]}"
+        )
+    create_trigger(statements)
+
+    for granularity, bucket in BUCKETS[dialect].items():
+        op.execute(
+            BACKFILL.format(
+                granularity=granularity, bucket=bucket.format(time="time_stamp")
+            )
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    op.execute(f"DROP TRIGGER IF EXISTS {TRIGGER}")
+    statements = []
+    for granularity, bucket in BUCKETS[dialect].items():
+        start = bucket.format(time="NEW.time_stamp")
+        end = BUCKET_ENDS[dialect][granularity].format(time="NEW.time_stamp")
+        statements.append(
+            "INSERT INTO signal_rollups"
+            " (movement_id, granularity, bucket, signals, leaders)"
+            f" VALUES (NEW.movement_id, '{granularity}', {start}, 1, "
+            f"{NEW_LEADER.format(start=start, end=end)}) {UPSERT[dialect]}"
+        )
+    create_trigger(statements)
+    op.drop_table("signal_rollup_leaders")
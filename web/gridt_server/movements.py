@@ -0,0 +1,217 @@
+"""
+Movements
+*********
+
+``GET /movements`` and ``GET /movements/<id>`` show every movement with its
+number of subscribers and whether the user is subscribed to it, and for the
+movements of the user their last signal and their leaders with the last
+signals of the leaders. The gridt library computes the counts and last
+signals from the subscriptions and signals tables for every movement, the
+:class:`MovementReader` reads them from the counter tables of
+:mod:`gridt_server.counters` instead. A listing takes four queries whatever
+the number of movements:
+
+- The movements with their row in ``movement_stats``.
+- The movements the user is subscribed to.
+- The leaders of the user in those movements, or only their usernames when
+  the adjacency index of :mod:`gridt_server.adjacency` has the leaders.
+- The last signals of the user and of those leaders, from
+  ``leader_signals``.
+
+Apps from ``create_app`` always have the reader, see
+:func:`install_movement_reader`, so the database has to be migrated.
+"""
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import and_, select
+
+from gridt_server.rollups import isoformat
+from gridt_server.tables import (
+    followers,
+    leader_signals,
+    movement_stats,
+    movements,
+    signals,
+    subscriptions,
+    users,
+)
+
+
+def signal_entry(time_stamp, message):
+    if time_stamp is None:
+        return None
+    return {"time_stamp": isoformat(time_stamp), "message": message}
+
+
+def last_signal_entries(connection, pairs):
+    """Return the last signal of every (movement id, leader id) pair."""
+    if not pairs:
+        return {}
+    rows = connection.execute(
+        select(
+            leader_signals.c.movement_id,
+            leader_signals.c.leader_id,
+            leader_signals.c.last_signal,
+            signals.c.message,
+        )
+        .select_from(
+            leader_signals.outerjoin(
+                signals,
+                and_(
+                    signals.c.movement_id == leader_signals.c.movement_id,
+                    signals.c.leader_id == leader_signals.c.leader_id,
+                    signals.c.time_stamp == leader_signals.c.last_signal,
+                ),
+            )
+        )
+        .where(
+            and_(
+                leader_signals.c.movement_id.in_({pair[0] for pair in pairs}),
+                leader_signals.c.leader_id.in_({pair[1] for pair in pairs}),
+            )
+        )
+    )
+    last = {
+        (movement_id, leader_id): signal_entry(last_signal, message)
+        for movement_id, leader_id, last_signal, message in rows
+    }
+    return {pair: last.get(pair) for pair in pairs}
+
+
+def leaders_of(connection, user_id, movement_ids):
+    """Return the ids and usernames of the leaders of a user, by movement id."""
+    rows = connection.execute(
+        select(followers.c.movement_id, users.c.id, users.c.username)
+        .select_from(followers.join(users, users.c.id == followers.c.leader_id))
+        .where(
+            and_(
+                followers.c.follower_id == user_id,
+                followers.c.movement_id.in_(movement_ids),
+                followers.c.destroyed.is_(None),
+            )
+        )
+        .order_by(followers.c.movement_id, users.c.id)
+    )
+    leaders = defaultdict(list)
+    for movement_id, leader_id, username in rows:
+        leaders[movement_id].append({"id": leader_id, "username": username})
+    return leaders
+
+
+class MovementReader:
+    def __init__(self, engine, adjacency=None):
+        self.engine = engine
+        self.adjacency = adjacency
+
+    def leaders(self, connection, user_id, movement_ids):
+        """
+        Return the leaders of a user by movement id, with the ids from the
+        adjacency index when there is one.
+        """
+        if not movement_ids:
+            return {}
+        if self.adjacency is None:
+            return leaders_of(connection, user_id, movement_ids)
+
+        leader_ids = {
+            movement_id: sorted(self.adjacency.leaders(user_id, movement_id))
+            for movement_id in movement_ids
+        }
+        wanted = set().union(*leader_ids.values())
+        usernames = {}
+        if wanted:
+            usernames = dict(
+                connection.execute(
+                    select(users.c.id, users.c.username).where(users.c.id.in_(wanted))
+                ).all()
+            )
+        return {
+            movement_id: [
+                {"id": leader_id, "username": usernames.get(leader_id)}
+                for leader_id in ids
+            ]
+            for movement_id, ids in leader_ids.items()
+        }
+
+    def read(self, user_id, movement_ids=None):
+        """
+        Return the movements, all of them or those in ``movement_ids``, as
+        the user sees them, ordered by id.
+        """
+        query = (
+            select(
+                movements.c.id,
+                movements.c.name,
+                movements.c.short_description,
+                movements.c.description,
+                movements.c.interval,
+                movement_stats.c.subscribers,
+            )
+            .select_from(
+                movements.outerjoin(
+                    movement_stats, movement_stats.c.movement_id == movements.c.id
+                )
+            )
+            .order_by(movements.c.id)
+        )
+        member_query = select(subscriptions.c.movement_id).where(
+            and_(
+                subscriptions.c.user_id == user_id,
+                subscriptions.c.time_removed.is_(None),
+            )
+        )
+        if movement_ids is not None:
+            query = query.where(movements.c.id.in_(movement_ids))
+            member_query = member_query.where(
+                subscriptions.c.movement_id.in_(movement_ids)
+            )
+
+        with self.engine.connect() as connection:
+            rows = connection.execute(query).all()
+            member_of = set(connection.execute(member_query).scalars())
+            leaders = self.leaders(connection, user_id, member_of)
+            pairs = [(movement_id, user_id) for movement_id in member_of] + [
+                (movement_id, leader["id"])
+                for movement_id, found in leaders.items()
+                for leader in found
+            ]
+            last = last_signal_entries(connection, pairs)
+
+        result = []
+        for row in rows:
+            movement = {
+                "id": row.id,
+                "name": row.name,
+                "short_description": row.short_description,
+                "description": row.description,
+                "interval": row.interval,
+                "subscribers": row.subscribers or 0,
+                "subscribed": row.id in member_of,
+            }
+            if movement["subscribed"]:
+                movement["last_signal_sent"] = last[(row.id, user_id)]
+                movement["leaders"] = [
+                    dict(leader, last_signal=last[(row.id, leader["id"])])
+                    for leader in leaders.get(row.id, [])
+                ]
+            result.append(movement)
+        return result
+
+    def all(self, user_id):
+        return self.read(user_id)
+
+    def one(self, movement_id, user_id):
+        found = self.read(user_id, [movement_id])
+        return found[0] if found else None
+
+
+def get_movement_reader():
+    """Return the movement reader of the current app, or None if it has none."""
+    return current_app.extensions.get("movement_reader")
+
+
+def install_movement_reader(app, engine):
+    reader = MovementReader(engine, app.extensions.get("adjacency_index"))
+    app.extensions["movement_reader"] = reader
+    return reader
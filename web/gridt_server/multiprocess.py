@@ -0,0 +1,119 @@
+"""
+Multiprocess metrics
+********************
+
+Gunicorn workers write their metrics to files in ``PROMETHEUS_MULTIPROC_DIR``
+and the master aggregates those files on every scrape. This module takes care
+of that directory over the life of the server:
+
+- :func:`reset_metrics_dir` removes the files of a previous run when the
+  master starts, so restarts do not leave stale files behind.
+- :func:`compact_dead_worker` folds the counters, histograms and summaries of
+  a worker that exited into one archive file per type, so the number of files
+  stays proportional to the number of live workers instead of growing with
+  every restart of a worker.
+- :func:`start_metrics_server` serves the metrics and exports how long the
+  aggregation takes and how many files it has to read.
+
+The directory is configured with the ``PROMETHEUS_MULTIPROC_DIR`` environment
+variable and defaults to :data:`DEFAULT_METRICS_DIR`. The Prometheus client
+decides whether to write metrics to files when it is imported, so this module
+must be imported before anything imports the client, which is why it cannot
+be set in the conf file.
+"""
+import glob
+import os
+import re
+import threading
+import time
+
+DEFAULT_METRICS_DIR = "/tmp/gridt-metrics"
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", DEFAULT_METRICS_DIR)
+
+from prometheus_client import CollectorRegistry, start_http_server  # noqa: E402
+from prometheus_client.core import GaugeMetricFamily  # noqa: E402
+from prometheus_client.mmap_dict import MmapedDict  # noqa: E402
+from prometheus_client.multiprocess import (  # noqa: E402
+    MultiProcessCollector,
+    mark_process_dead,
+)
+
+METRICS_FILE = re.compile(r"^(counter|histogram|summary|gauge_\w+?)_(\d+|archive)\.db$")
+COMPACTED_TYPES = ("counter", "histogram", "summary")
+
+# Compaction and scrapes both run in the gunicorn master. Without the lock a
+# scrape could count a worker twice, or not at all, while it is compacted.
+compaction_lock = threading.Lock()
+
+
+def metrics_dir():
+    """Return the metrics directory, creating it when necessary."""
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def reset_metrics_dir(path):
+    """
+    Remove the metric files of a previous run. Only files named like metric
+    files are removed, in case the directory is shared with something else.
+    """
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if METRICS_FILE.match(name):
+            os.remove(os.path.join(path, name))
+
+
+def compact_dead_worker(path, pid):
+    """Fold the metric files of worker ``pid`` into the archive files."""
+    mark_process_dead(pid, path)
+    with compaction_lock:
+        for typ in COMPACTED_TYPES:
+            compact_file(path, typ, pid)
+
+
+def compact_file(path, typ, pid):
+    worker_file = os.path.join(path, f"{typ}_{pid}.db")
+    if not os.path.exists(worker_file):
+        return
+    archive = MmapedDict(os.path.join(path, f"{typ}_archive.db"))
+    try:
+        for key, value, timestamp, _ in MmapedDict.read_all_values_from_file(
+            worker_file
+        ):
+            archived, _ = archive.read_value(key)
+            archive.write_value(key, archived + value, timestamp)
+    finally:
+        archive.close()
+    os.remove(worker_file)
+
+
+class InstrumentedMultiProcessCollector(MultiProcessCollector):
+    """Multiprocess collector that also reports on its own cost."""
+
+    def collect(self):
+        start = time.perf_counter()
+        with compaction_lock:
+            files = glob.glob(os.path.join(self._path, "*.db"))
+            metrics = self.merge(files, accumulate=True)
+        yield from metrics
+
+        files_metric = GaugeMetricFamily(
+            "gridt_metrics_files", "Number of metric files read per scrape."
+        )
+        files_metric.add_metric([], len(files))
+        yield files_metric
+
+        duration_metric = GaugeMetricFamily(
+            "gridt_metrics_scrape_duration_seconds",
+            "Time it took to aggregate the metric files of the workers.",
+        )
+        duration_metric.add_metric([], time.perf_counter() - start)
+        yield duration_metric
+
+
+def start_metrics_server(port, path):
+    """Serve the aggregated metrics of all workers on ``port``."""
+    registry = CollectorRegistry()
+    InstrumentedMultiProcessCollector(registry, path)
+    start_http_server(port, registry=registry)
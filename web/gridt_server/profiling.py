@@ -0,0 +1,155 @@
+"""
+Profiling
+*********
+
+On-demand statistical profiling of single requests in production. A
+background thread samples the stack of the thread that handles the request
+every ``PROFILE_INTERVAL`` seconds. The samples are written in the collapsed
+stack format, which can be turned into a flamegraph with ``flamegraph.pl`` or
+opened in speedscope.
+
+A request is profiled when it carries a valid ``X-Gridt-Profile`` header, see
+:func:`profile_token`, or at random with probability ``PROFILE_SAMPLE_RATE``.
+The header is signed with ``PROFILE_KEY`` so that only admins can trigger it.
+When neither setting is present no hooks are installed and requests pay
+nothing. Profiles are written to ``PROFILE_DIR``, which keeps the newest
+``PROFILE_MAX_FILES`` profiles, and at most ``PROFILE_MAX_CONCURRENT`` requests
+per worker are profiled at the same time.
+"""
+import hashlib
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+
+PROFILE_HEADER = "X-Gridt-Profile"
+
+
+def frame_name(frame):
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame):
+    """Return the stack of ``frame`` from the outermost call inward, ;-joined."""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler(threading.Thread):
+    """Count the stacks that the thread ``thread_id`` is in, until stopped."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[collapse_stack(frame)] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        return self.samples
+
+
+def sign(expires, key):
+    return hmac.new(key.encode(), str(expires).encode(), hashlib.sha256).hexdigest()
+
+
+def profile_token(key, ttl=300):
+    """Return a value for the profile header that is valid for ``ttl`` seconds."""
+    expires = int(time.time()) + ttl
+    return f"{expires}.{sign(expires, key)}"
+
+
+def valid_token(token, key):
+    expires, _, signature = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, sign(expires, key))
+
+
+class ProfileDirectory:
+    """Directory that keeps only the newest ``max_files`` profiles."""
+
+    def __init__(self, path, max_files):
+        self.path = path
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, endpoint, samples):
+        name = f"{time.time():.6f}-{os.getpid()}-{endpoint}.folded"
+        with open(os.path.join(self.path, name), "w") as profile:
+            for stack, count in samples.items():
+                profile.write(f"{stack} {count}\n")
+        self.prune()
+        return name
+
+    def prune(self):
+        with self._lock:
+            profiles = sorted(
+                entry for entry in os.listdir(self.path) if entry.endswith(".folded")
+            )
+            for name in profiles[: max(len(profiles) - self.max_files, 0)]:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except FileNotFoundError:
+                    pass  # Another worker pruned it first.
+
+
+def install_profiling(app):
+    """Install the profiling hooks if profiling is enabled in the conf file."""
+    key = app.config.get("PROFILE_KEY")
+    sample_rate = app.config.get("PROFILE_SAMPLE_RATE", 0)
+    if not key and not sample_rate:
+        return
+
+    interval = app.config.get("PROFILE_INTERVAL", 0.005)
+    directory = ProfileDirectory(
+        app.config.get("PROFILE_DIR", "/tmp/gridt-profiles"),
+        app.config.get("PROFILE_MAX_FILES", 100),
+    )
+    slots = threading.BoundedSemaphore(app.config.get("PROFILE_MAX_CONCURRENT", 1))
+
+    def requested():
+        token = request.headers.get(PROFILE_HEADER)
+        if token and key:
+            return valid_token(token, key)
+        return random.random() < sample_rate
+
+    def start_profile():
+        if not requested() or not slots.acquire(blocking=False):
+            return
+        g.profiler = SamplingProfiler(threading.get_ident(), interval)
+        g.profiler.start()
+
+    def finish_profile(exception=None):
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return
+        try:
+            samples = profiler.stop()
+            if samples:
+                name = directory.write(request.endpoint or "none", samples)
+                app.logger.info(f"Wrote profile {name}.")
+        finally:
+            slots.release()
+
+    app.before_request(start_profile)
+    app.teardown_request(finish_profile)
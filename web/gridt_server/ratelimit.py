@@ -0,0 +1,85 @@
+"""
+Rate limiting
+*************
+
+Logging in, registering and requesting a password reset hash a password or
+send an e-mail, and signals are written to the database, so a single client
+can keep the workers busy. These endpoints are limited with token buckets in
+the store (see :mod:`gridt_server.store`), configured in ``RATE_LIMITS``: ::
+
+    RATE_LIMITS = {
+        "login": {"capacity": 10, "rate": 0.1, "key": "ip"},
+        "register": {"capacity": 5, "rate": 0.01, "key": "ip"},
+        "password_reset": {"capacity": 3, "rate": 0.001, "key": "ip"},
+        "signal": {"capacity": 10, "rate": 0.05, "key": "identity"},
+    }
+
+A bucket holds ``capacity`` requests and refills ``rate`` requests per
+second. ``key`` is ``"identity"`` for a bucket per user, which requires a JWT,
+or ``"ip"`` for a bucket per client address. Behind a proxy ``PROXY_COUNT``
+should be the number of proxies that set ``X-Forwarded-For``, otherwise all
+clients share the address of the proxy.
+
+Limited requests get a 429 with a ``Retry-After`` header that tells when the
+next token is available and are counted in ``requests_rate_limited_total``.
+Endpoints without a configured limit, and apps without a store, are not
+limited.
+"""
+import math
+from functools import wraps
+
+from flask import current_app, request
+from flask_jwt_extended import get_jwt_identity
+from prometheus_client import Counter
+from werkzeug.exceptions import TooManyRequests
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from gridt_server.store import get_store
+
+REQUESTS_RATE_LIMITED = Counter(
+    "requests_rate_limited_total",
+    "Requests rejected because the client exceeded its rate limit.",
+    ["limit"],
+)
+
+
+def client_key(key):
+    if key == "identity":
+        return f"user:{get_jwt_identity()}"
+    if key == "ip":
+        return f"ip:{request.remote_addr}"
+    raise ValueError(f"Unknown rate limit key {key}.")
+
+
+def rate_limit(name):
+    """
+    Limit the decorated view with the ``name`` limit of ``RATE_LIMITS``. Put
+    it below ``jwt_required`` when the limit is per identity.
+    """
+
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            limit = current_app.config.get("RATE_LIMITS", {}).get(name)
+            store = get_store()
+            if limit and store is not None:
+                key = f"ratelimit:{name}:{client_key(limit.get('key', 'ip'))}"
+                wait = store.take_token(key, limit["capacity"], limit["rate"])
+                if wait:
+                    REQUESTS_RATE_LIMITED.labels(name).inc()
+                    raise TooManyRequests(
+                        "Too many requests, try again later.",
+                        retry_after=math.ceil(wait),
+                    )
+            return fn(*args, **kwargs)
+
+        return decorator
+
+    return wrapper
+
+
+def install_proxy_fix(app):
+    """Trust ``X-Forwarded-For`` from the ``PROXY_COUNT`` proxies in front."""
+    proxies = app.config.get("PROXY_COUNT", 0)
+    if proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies)
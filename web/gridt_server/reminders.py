@@ -0,0 +1,252 @@
+"""
+Reminders
+*********
+
+Every subscriber of a movement is a leader to somebody, and is expected to
+signal once per interval of the movement. The reminder scheduler nudges
+leaders whose interval is about to elapse without a signal, by e-mail with
+the ``REMINDER_TEMPLATE`` template, ``REMINDER_LEAD`` (default 0.1) of the
+interval before the end of it.
+
+The scheduler runs as a process of its own: ::
+
+    $ python -m gridt_server.cli scheduler
+
+It keeps the next reminder of every subscription in a timing wheel (see
+:mod:`gridt_server.timingwheel`), which it builds from the subscriptions and
+the last signals in the database once, instead of scanning them every
+minute. After that it is kept up to date by events that the web workers push
+to the store when a leader signals, subscribes or unsubscribes (see
+:mod:`gridt_server.events`). The web workers only push events with
+``REMINDERS=True``, which fails at startup unless the store is shared
+(``STORE_BACKEND="redis"``) and ``REMINDER_TEMPLATE`` is set. The list of
+events keeps the newest ``REMINDER_EVENTS_LIMIT`` (default 100000), so it
+does not grow without bound while the scheduler is down; the scheduler
+builds the wheel from the database when it starts, which covers the events
+that were dropped. As a safety net the wheel is rebuilt every
+``REMINDER_RESYNC_INTERVAL`` seconds (default a day).
+
+Reminders that are due are sent in batches of ``REMINDER_BATCH_SIZE``
+(default 500, SendGrid accepts at most 1000), with one e-mail request and one
+database query per batch.
+"""
+import json
+import logging
+import time
+from datetime import timezone
+
+from sqlalchemy import and_, func, select
+
+from gridt_server.events import listen
+from gridt_server.tables import movements, signals, subscriptions, users
+from gridt_server.throttle import INTERVAL_SECONDS
+from gridt_server.timingwheel import TimingWheel
+
+logger = logging.getLogger(__name__)
+
+EVENTS_KEY = "reminders:events"
+
+
+def check_reminder_config(app):
+    """Raise RuntimeError when the conf file can not send reminders."""
+    if app.config.get("STORE_BACKEND", "memory") != "redis":
+        raise RuntimeError('REMINDERS requires STORE_BACKEND="redis".')
+    if not app.config.get("REMINDER_TEMPLATE"):
+        raise RuntimeError("REMINDERS requires a REMINDER_TEMPLATE.")
+
+
+def schedule_event_publisher(store, kind, limit=None):
+    """
+    Return a listener that tells the scheduler that a user signalled in,
+    subscribed to or unsubscribed from a movement; ``kind`` is ``"signal"``,
+    ``"subscribe"`` or ``"unsubscribe"``. At most ``limit`` events are kept.
+    """
+
+    def publish(user_id, movement_id, edges=None):
+        event = json.dumps([kind, user_id, movement_id, time.time()])
+        store.push(EVENTS_KEY, event, limit=limit)
+
+    return publish
+
+
+def install_reminder_events(app):
+    if not app.config.get("REMINDERS"):
+        return
+    check_reminder_config(app)
+    limit = app.config.get("REMINDER_EVENTS_LIMIT", 100000)
+    for kind in ("signal", "subscribe", "unsubscribe"):
+        listen(
+            app, kind, schedule_event_publisher(app.extensions["store"], kind, limit)
+        )
+
+
+def epoch(moment):
+    """Seconds since the epoch of a naive UTC datetime from the database."""
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+
+def next_due(last, interval, lead, now):
+    """
+    Return the time of the next reminder of a leader that last signalled (or
+    subscribed) at ``last``, skipping reminders that were missed.
+    """
+    due = last + interval * (1 - lead)
+    if due <= now:
+        due += ((now - due) // interval + 1) * interval
+    return due
+
+
+def schedule_query():
+    """Active subscriptions with the interval and time of the last signal."""
+    last_signal = (
+        select(func.max(signals.c.time_stamp))
+        .where(
+            and_(
+                signals.c.movement_id == subscriptions.c.movement_id,
+                signals.c.leader_id == subscriptions.c.user_id,
+            )
+        )
+        .scalar_subquery()
+    )
+    return (
+        select(
+            subscriptions.c.user_id,
+            subscriptions.c.movement_id,
+            movements.c.interval,
+            subscriptions.c.time_added,
+            last_signal,
+        )
+        .select_from(
+            subscriptions.join(movements, movements.c.id == subscriptions.c.movement_id)
+        )
+        .where(subscriptions.c.time_removed.is_(None))
+    )
+
+
+class ReminderScheduler:
+    def __init__(self, engine, store, send, lead=0.1, batch_size=500):
+        self.engine = engine
+        self.store = store
+        self.send = send
+        self.lead = lead
+        self.batch_size = batch_size
+        self.intervals = {}
+        self.wheel = None
+
+    def interval(self, movement_id):
+        if movement_id not in self.intervals:
+            with self.engine.connect() as connection:
+                interval = connection.execute(
+                    select(movements.c.interval).where(movements.c.id == movement_id)
+                ).scalar()
+            self.intervals[movement_id] = INTERVAL_SECONDS.get(interval)
+        return self.intervals[movement_id]
+
+    def rebuild(self, now):
+        """Build the wheel from the database."""
+        wheel = TimingWheel(now)
+        with self.engine.connect() as connection:
+            rows = connection.execution_options(yield_per=10000).execute(
+                schedule_query()
+            )
+            for user_id, movement_id, interval, added, last_signal in rows:
+                seconds = INTERVAL_SECONDS.get(interval)
+                if not seconds:
+                    continue
+                self.intervals[movement_id] = seconds
+                last = epoch(last_signal or added)
+                wheel.schedule(
+                    (user_id, movement_id), next_due(last, seconds, self.lead, now)
+                )
+        self.wheel = wheel
+        logger.info(f"Scheduled reminders for {len(wheel)} subscriptions.")
+
+    def apply(self, kind, user_id, movement_id, moment):
+        """Update the wheel with an event of the web workers."""
+        key = (user_id, movement_id)
+        if kind == "unsubscribe":
+            self.wheel.cancel(key)
+            return
+
+        interval = self.interval(movement_id)
+        if not interval:
+            return
+        due = next_due(moment, interval, self.lead, moment)
+        # Events can be older than the wheel after a rebuild, a signal only
+        # ever moves the reminder forward.
+        current = self.wheel.due(key)
+        if kind == "signal" and (current is None or current < due):
+            self.wheel.schedule(key, due)
+        elif kind == "subscribe" and current is None:
+            self.wheel.schedule(key, due)
+
+    def drain_events(self):
+        while True:
+            events = self.store.pop(EVENTS_KEY, self.batch_size)
+            for event in events:
+                self.apply(*json.loads(event))
+            if len(events) < self.batch_size:
+                return
+
+    def dispatch(self, now):
+        """Send the reminders that are due and schedule the next ones."""
+        due = self.wheel.advance(now)
+        for start in range(0, len(due), self.batch_size):
+            batch = due[start : start + self.batch_size]
+            try:
+                self.send([key for key, _ in batch])
+            except Exception:
+                logger.exception(f"Failed to send {len(batch)} reminders.")
+            for key, moment in batch:
+                self.wheel.schedule(key, moment + self.intervals[key[1]])
+        return len(due)
+
+    def run(self, stop, poll_interval=1, resync_interval=24 * 60 * 60):
+        """Dispatch reminders until the ``stop`` event is set."""
+        self.rebuild(time.time())
+        rebuilt = time.monotonic()
+        while not stop.is_set():
+            if time.monotonic() - rebuilt > resync_interval:
+                self.rebuild(time.time())
+                rebuilt = time.monotonic()
+            self.drain_events()
+            self.dispatch(time.time())
+            stop.wait(poll_interval)
+
+
+def email_sender(engine):
+    """Return a function that e-mails reminders to (user id, movement id) pairs."""
+    from util.email_templates import send_reminder_emails
+
+    def send(keys):
+        user_ids = {user_id for user_id, _ in keys}
+        movement_ids = {movement_id for _, movement_id in keys}
+        with engine.connect() as connection:
+            recipients = {
+                row.id: row
+                for row in connection.execute(
+                    select(users.c.id, users.c.username, users.c.email).where(
+                        users.c.id.in_(user_ids)
+                    )
+                )
+            }
+            names = dict(
+                connection.execute(
+                    select(movements.c.id, movements.c.name).where(
+                        movements.c.id.in_(movement_ids)
+                    )
+                ).all()
+            )
+        send_reminder_emails(
+            [
+                (
+                    recipients[user_id].email,
+                    recipients[user_id].username,
+                    names[movement_id],
+                )
+                for user_id, movement_id in keys
+                if user_id in recipients and movement_id in names
+            ]
+        )
+
+    return send
@@ -1,6 +1,6 @@
 from flask import request
 from flask_restful import Resource
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import get_jwt_identity
 
 from gridt_server.schemas import (
     AnnouncementSchema,
@@ -9,7 +9,8 @@ from gridt_server.schemas import (
 )
 import gridt.exc as GridtExpections
 
-from .helpers import schema_loader
+from .helpers import schema_loader, jwt_required
+from gridt_server.events import emit
 
 from gridt.controllers.announcement import (
     create_announcement,
@@ -38,6 +39,7 @@ class AnnouncementsResource(Resource):
         except GridtExpections.UserNotAdmin:
             message = "Insufficient privileges to create an announcement."
             return {"message": message}, 403
+        emit("announcement", get_jwt_identity(), data["movement_id"])
         return {"message": "Successfully created announcement."}, 201
 
 
@@ -60,6 +62,7 @@ class SingleAnnouncementResource(Resource):
             return {"message": message}, 403
         except GridtExpections.AnnouncementNotFoundError:
             return {"message": "Announcement dose not exist."}, 404
+        emit("announcement", get_jwt_identity(), int(movement_id))
         return {"message": "Announcement successfully updated."}, 201
 
     @jwt_required()
@@ -72,4 +75,5 @@ class SingleAnnouncementResource(Resource):
             return {"message": message}, 403
         except GridtExpections.AnnouncementNotFoundError:
             return {"message": "Announcement dose not exist."}, 404
+        emit("announcement", get_jwt_identity(), int(movement_id))
         return {"message": "Announcement successfully deleted."}, 201
@@ -0,0 +1,11 @@
+from flask_restful import Resource
+from flask_jwt_extended import get_jwt_identity
+
+from gridt_server.feed import get_feed
+from .helpers import jwt_required
+
+
+class FeedResource(Resource):
+    @jwt_required()
+    def get(self):
+        return get_feed().get(get_jwt_identity())
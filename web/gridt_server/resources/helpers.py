@@ -1,6 +1,12 @@
+from functools import wraps
+
+from flask import current_app
+from flask_jwt_extended import verify_jwt_in_request
 from flask_restful import abort
 from marshmallow import ValidationError
 
+from gridt_server.instrumentation import timed_phase
+
 
 def schema_loader(schema, inp):
     """
@@ -8,10 +14,27 @@ def schema_loader(schema, inp):
     returning the first reason why it failed.
     """
     try:
-        data = schema.load(inp)
+        with timed_phase("validation"):
+            data = schema.load(inp)
     except ValidationError as err:
         field = list(err.messages.keys())[0]
         abort(400, message=f"{field}: {err.messages[field][0]}")
     else:
         return data
 
+
+def jwt_required(**kwargs):
+    """
+    Same as ``flask_jwt_extended.jwt_required``, but the verification of the
+    token is timed as the jwt phase of the request.
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kw):
+            with timed_phase("jwt"):
+                verify_jwt_in_request(**kwargs)
+            return current_app.ensure_sync(fn)(*args, **kw)
+
+        return decorator
+
+    return wrapper
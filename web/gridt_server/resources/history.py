@@ -0,0 +1,30 @@
+from flask import request
+from flask_restful import Resource
+from flask_jwt_extended import get_jwt_identity
+
+from gridt_server.archive import get_signal_archiver
+from gridt_server.schemas import SignalHistorySchema
+from .helpers import schema_loader, jwt_required
+
+
+class SignalHistoryResource(Resource):
+    schema = SignalHistorySchema()
+
+    @jwt_required()
+    def get(self, movement_id, leader_id):
+        data = schema_loader(
+            self.schema,
+            {
+                "movement_id": movement_id,
+                "follower_id": get_jwt_identity(),
+                "leader_id": leader_id,
+                **request.args.to_dict(),
+            },
+        )
+        return get_signal_archiver().history(
+            int(data["movement_id"]),
+            int(data["leader_id"]),
+            start=data.get("start"),
+            end=data.get("end"),
+            limit=data["limit"],
+        )
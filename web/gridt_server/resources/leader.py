@@ -1,9 +1,12 @@
 from flask_restful import Resource
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import get_jwt_identity
+from werkzeug.exceptions import ServiceUnavailable
 
+from gridt_server.candidates import SwapConflict, get_candidate_pools
+from gridt_server.events import emit
 from gridt_server.schemas import LeaderSchema
 from gridt.controllers.follower import get_leader, swap_leader
-from .helpers import schema_loader
+from .helpers import schema_loader, jwt_required
 
 
 class LeaderResource(Resource):
@@ -36,12 +39,36 @@ class LeaderResource(Resource):
             },
         )
 
-        new_leader = swap_leader(
-            follower_id=get_jwt_identity(),
-            movement_id=int(movement_id),
-            leader_id=int(leader_id)
-        )
+        follower_id = get_jwt_identity()
+        pools = get_candidate_pools()
+        if pools:
+            try:
+                new_leader_id = pools.swap(
+                    follower_id=follower_id,
+                    movement_id=int(movement_id),
+                    leader_id=int(leader_id)
+                )
+            except SwapConflict:
+                raise ServiceUnavailable(
+                    "The leaders of this user are being changed, try again.",
+                    retry_after=1,
+                )
+            new_leader = new_leader_id and get_leader(
+                follower_id=follower_id,
+                movement_id=int(movement_id),
+                leader_id=new_leader_id
+            )
+        else:
+            new_leader = swap_leader(
+                follower_id=follower_id,
+                movement_id=int(movement_id),
+                leader_id=int(leader_id)
+            )
+            # The library does not tell who the new leader is.
+            new_leader_id = None
+
         if not new_leader:
             return {"message": "Could not find leader to replace the current one."}
 
+        emit("swap", follower_id, int(movement_id), int(leader_id), new_leader_id)
         return new_leader
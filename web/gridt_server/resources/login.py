@@ -5,6 +5,7 @@ from flask import request
 from flask_restful import Resource
 from flask_jwt_extended import create_access_token
 from .helpers import schema_loader
+from gridt_server.ratelimit import rate_limit
 from gridt_server.schemas import LoginSchema
 
 from gridt.controllers.user import verify_password_for_email
@@ -14,6 +15,7 @@ from sqlalchemy.exc import NoResultFound
 class LoginResource(Resource):
     schema = LoginSchema()
 
+    @rate_limit("login")
     def post(self):
         data = schema_loader(self.schema, request.get_json())
 
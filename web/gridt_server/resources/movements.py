@@ -1,24 +1,34 @@
+import math
+
 from flask import request
 from flask_restful import Resource
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import TooManyRequests
 
 from gridt_server.schemas import (
     MovementSchema,
     SingleMovementSchema,
     SignalSchema,
+    subscribed,
 )
 
-from .helpers import schema_loader
+from .helpers import schema_loader, jwt_required
+from gridt_server.ratelimit import rate_limit
+from gridt_server.edges import edge_changes
+from gridt_server.events import emit
+from gridt_server.movements import get_movement_reader
+from gridt_server.throttle import SIGNALS_THROTTLED, get_signal_throttle
 
 from gridt.controllers.subscription import (
     get_subscriptions,
     new_subscription,
     remove_subscription,
-    is_subscribed
 )
 from gridt.controllers.movements import (
     get_all_movements,
-    get_movement
+    get_movement,
+    movement_name_exists,
 )
 import gridt.exc as GridtExpections
 from gridt.controllers.creation import (
@@ -32,6 +42,9 @@ class MovementsResource(Resource):
 
     @jwt_required()
     def get(self):
+        reader = get_movement_reader()
+        if reader:
+            return reader.all(get_jwt_identity())
         return get_all_movements(get_jwt_identity())
 
     @jwt_required()
@@ -45,9 +58,16 @@ class MovementsResource(Resource):
                 short_description=data.get("short_description"),
                 description=data.get("long_description"),
             )
+        except IntegrityError:
+            # Names are unique, checking before inserting would cost a query
+            # and could still race with another request.
+            if not movement_name_exists(data["name"]):
+                raise
+            return {"message": "name: Movement name already in use."}, 400
         except GridtExpections.UserNotAdmin:
             message = "Insufficient privileges to create a movement."
             return {"message": message}, 403
+        emit("create_movement", get_jwt_identity())
         return {"message": "Successfully created movement."}, 201
 
 
@@ -63,6 +83,9 @@ class SingleMovementResource(Resource):
     @jwt_required()
     def get(self, identifier):
         schema_loader(self.schema, {"movement_id": identifier})
+        reader = get_movement_reader()
+        if reader:
+            return reader.one(int(identifier), get_jwt_identity())
         return get_movement(int(identifier), get_jwt_identity())
 
 
@@ -73,8 +96,16 @@ class SubscribeResource(Resource):
     def put(self, movement_id):
         schema_loader(self.schema, {"movement_id": movement_id})
         user_id = get_jwt_identity()
-        if not is_subscribed(user_id, int(movement_id)):
-            new_subscription(user_id, int(movement_id))
+        # A user has one active subscription per movement, which the
+        # database enforces, so a second one means that PUT is repeated.
+        try:
+            with edge_changes(user_id, int(movement_id)) as edges:
+                new_subscription(user_id, int(movement_id))
+        except IntegrityError:
+            if not subscribed(user_id, int(movement_id)):
+                raise
+        else:
+            emit("subscribe", user_id, int(movement_id), edges)
         return {"message": "Successfully subscribed to this movement."}
 
     @jwt_required()
@@ -82,8 +113,10 @@ class SubscribeResource(Resource):
         schema_loader(self.schema, {"movement_id": movement_id})
         # HTTP DELETE request is idempotent, meaning that it should not matter
         # if the user is subscribed or not, if he is, he should be removed.
-        if is_subscribed(get_jwt_identity(), int(movement_id)):
-            remove_subscription(get_jwt_identity(), int(movement_id))
+        if subscribed(get_jwt_identity(), int(movement_id)):
+            with edge_changes(get_jwt_identity(), int(movement_id)) as edges:
+                remove_subscription(get_jwt_identity(), int(movement_id))
+            emit("unsubscribe", get_jwt_identity(), int(movement_id), edges)
         return {"message": "Successfully unsubscribed from this movement."}
 
 
@@ -91,6 +124,7 @@ class NewSignalResource(Resource):
     schema = SignalSchema()
 
     @jwt_required()
+    @rate_limit("signal")
     def post(self, movement_id):
         schema_loader(
             self.schema, {"leader_id": get_jwt_identity(), "movement_id": movement_id},
@@ -99,6 +133,25 @@ class NewSignalResource(Resource):
         if request.get_json(silent=True):
             message = request.get_json().get("message")
 
-        send_signal(get_jwt_identity(), int(movement_id), message)
+        throttle = get_signal_throttle()
+        if throttle:
+            wait = throttle.claim(get_jwt_identity(), int(movement_id))
+            if wait:
+                SIGNALS_THROTTLED.labels(throttle.mode).inc()
+                if throttle.mode == "coalesce":
+                    message = "Signal coalesced with the previous signal."
+                    return {"message": message, "coalesced": True}, 202
+                raise TooManyRequests(
+                    "Signal sent too soon after the previous one.",
+                    retry_after=math.ceil(wait),
+                )
+
+        try:
+            send_signal(get_jwt_identity(), int(movement_id), message)
+        except Exception:
+            if throttle:
+                throttle.release(get_jwt_identity(), int(movement_id))
+            raise
+        emit("signal", get_jwt_identity(), int(movement_id))
 
         return {"message": "Successfully created signal."}, 201
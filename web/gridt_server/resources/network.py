@@ -1,8 +1,7 @@
 from flask_restful import Resource
-from flask_jwt_extended import jwt_required
 
 from gridt_server.schemas import SingleMovementSchema
-from .helpers import schema_loader
+from .helpers import schema_loader, jwt_required
 
 from gridt.controllers.network import (
     get_network_data,
@@ -1,12 +1,22 @@
 from flask import request, current_app
 from flask_restful import Resource
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 
-from .helpers import schema_loader
+from .helpers import schema_loader, jwt_required
+from gridt_server.ratelimit import rate_limit
 from gridt_server.schemas import NewUserSchema
+from gridt_server.tables import users
 from gridt.controllers.user import get_identity, register
 
 
+def email_in_use(email):
+    with current_app.extensions["engine"].connect() as connection:
+        query = select(users.c.id).where(users.c.email == email)
+        return connection.execute(query).first() is not None
+
+
 class IdentityResource(Resource):
     @jwt_required()
     def get(self):
@@ -16,6 +26,7 @@ class IdentityResource(Resource):
 class RegisterResource(Resource):
     schema = NewUserSchema()
 
+    @rate_limit("register")
     def post(self):
         data = schema_loader(self.schema, request.get_json())
 
@@ -24,5 +35,12 @@ class RegisterResource(Resource):
         if has_key and request_admin_key != current_app.config["ADMIN_KEY"]:
             return {"message": "Incorrect admin key."}, 403
 
-        register(data["username"], data["email"], data["password"], has_key)
+        try:
+            register(data["username"], data["email"], data["password"], has_key)
+        except IntegrityError:
+            # Addresses are unique, checking before inserting would cost a
+            # query and could still race with another request.
+            if not email_in_use(data["email"]):
+                raise
+            return {"message": "email: E-mail address already in use."}, 400
         return {"message": "Succesfully created user."}, 201
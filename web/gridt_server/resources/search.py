@@ -0,0 +1,17 @@
+from flask import request
+from flask_restful import Resource
+
+from gridt_server.schemas import MovementSearchSchema
+from gridt_server.search import get_movement_search
+from .helpers import schema_loader, jwt_required
+
+
+class MovementSearchResource(Resource):
+    schema = MovementSearchSchema()
+
+    @jwt_required()
+    def get(self):
+        data = schema_loader(self.schema, request.args.to_dict())
+        return get_movement_search().search(
+            data["q"], limit=data["limit"], offset=data["offset"]
+        )
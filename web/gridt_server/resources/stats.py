@@ -0,0 +1,19 @@
+from flask import request
+from flask_restful import Resource
+
+from gridt_server.schemas import MovementStatsSchema
+from gridt_server.rollups import get_activity_stats
+from .helpers import schema_loader, jwt_required
+
+
+class MovementStatsResource(Resource):
+    schema = MovementStatsSchema()
+
+    @jwt_required()
+    def get(self, movement_id):
+        data = schema_loader(
+            self.schema, {"movement_id": movement_id, **request.args.to_dict()}
+        )
+        return get_activity_stats().activity(
+            data["movement_id"], data["granularity"], data["start"], data["end"]
+        )
@@ -1,6 +1,6 @@
 from flask import request, current_app
 from flask_restful import Resource
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import get_jwt_identity
 
 from gridt_server.schemas import (
     BioSchema,
@@ -12,7 +12,8 @@ from gridt_server.schemas import (
 )
 
 
-from .helpers import schema_loader
+from .helpers import schema_loader, jwt_required
+from gridt_server.ratelimit import rate_limit
 
 from gridt.controllers.user import (
     update_user_bio,
@@ -73,6 +74,7 @@ class ChangeEmailResource(Resource):
 class RequestPasswordResetResource(Resource):
     schema = RequestPasswordResetSchema()
 
+    @rate_limit("password_reset")
     def post(self):
         data = schema_loader(self.schema, request.get_json())
 
@@ -0,0 +1,264 @@
+"""
+Signal rollups
+**************
+
+The activity of a movement, the number of signals and of leaders that
+signalled per hour or per day, is kept in ``signal_rollups``, so charting it
+does not scan the signals table. Migration 0004 installs a trigger on
+``signals`` that adds every new signal to its hour and its day bucket in the
+same transaction. Every leader that signalled in a bucket has a row in
+``signal_rollup_leaders``, which the trigger inserts ignoring duplicates
+before adding the signal, and the leader is only counted when the row is
+new. The primary key of that table makes a concurrent signal of the same
+leader wait, so a leader is counted once per bucket (migration 0008).
+
+``GET /movements/<id>/stats?granularity=hour|day&from=&to=`` answers from the
+rollups, reading one row per bucket. Ranges are limited to
+``STATS_MAX_BUCKETS`` buckets (default 744, a month of hours).
+
+Like the counters of :mod:`gridt_server.counters`, the rollups are checked
+and repaired by ``python -m gridt_server.cli stats check`` and
+``stats repair``. Repairing a bucket rewrites its leader rows too.
+"""
+from collections import namedtuple
+from datetime import timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import (
+    DateTime,
+    and_,
+    cast,
+    delete,
+    distinct,
+    func,
+    insert,
+    select,
+    type_coerce,
+    union_all,
+    update,
+)
+
+from gridt_server.counters import Drift, get_movement_stats
+from gridt_server.tables import (
+    signal_rollup_leaders,
+    signal_rollups,
+    signals,
+    signals_archive,
+)
+
+GRANULARITIES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+Bucket = namedtuple("Bucket", ["signals", "leaders"])
+
+# Archived signals are counted in the rollups too.
+SOURCES = (signals, signals_archive)
+
+
+def truncate(moment, granularity):
+    """Return the start of the bucket that ``moment`` falls in."""
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def isoformat(moment):
+    return moment.replace(tzinfo=timezone.utc).isoformat() if moment else None
+
+
+def bucket_start(column, granularity, dialect):
+    """:func:`truncate` in SQL."""
+    if dialect == "sqlite":
+        # SQLite stores times as text in the format of SQLAlchemy.
+        hour = "%H" if granularity == "hour" else "00"
+        return type_coerce(
+            func.strftime(f"%Y-%m-%d {hour}:00:00.000000", column), DateTime
+        )
+    if dialect == "mysql":
+        if granularity == "hour":
+            return cast(func.date_format(column, "%Y-%m-%d %H:00:00"), DateTime)
+        return cast(func.date(column), DateTime)
+    return func.date_trunc(granularity, column)
+
+
+def expected_rollups(connection):
+    """Compute all buckets from the signals tables."""
+    rows = union_all(
+        *(
+            select(source.c.movement_id, source.c.leader_id, source.c.time_stamp)
+            for source in SOURCES
+        )
+    ).subquery()
+    expected = {}
+    for granularity in GRANULARITIES:
+        bucket = bucket_start(rows.c.time_stamp, granularity, connection.dialect.name)
+        counts = connection.execute(
+            select(
+                rows.c.movement_id,
+                bucket,
+                func.count(),
+                func.count(distinct(rows.c.leader_id)),
+            ).group_by(rows.c.movement_id, bucket)
+        )
+        for movement_id, start, signal_count, leaders in counts:
+            expected[(movement_id, granularity, start)] = Bucket(signal_count, leaders)
+    return expected
+
+
+def stored_rollups(connection):
+    rows = connection.execute(
+        select(
+            signal_rollups.c.movement_id,
+            signal_rollups.c.granularity,
+            signal_rollups.c.bucket,
+            signal_rollups.c.signals,
+            signal_rollups.c.leaders,
+        )
+    )
+    return {tuple(row[:3]): Bucket(*row[3:]) for row in rows}
+
+
+def drift(connection):
+    """List the buckets that differ from the signals tables."""
+    stored = stored_rollups(connection)
+    expected = expected_rollups(connection)
+    return [
+        Drift("signal_rollups", key, stored.get(key), expected.get(key))
+        for key in sorted(stored.keys() | expected.keys())
+        if stored.get(key) != expected.get(key)
+    ]
+
+
+def repair_leaders(connection, movement_id, granularity, bucket):
+    """Replace the leader rows of a bucket with the leaders in the signals tables."""
+    connection.execute(
+        delete(signal_rollup_leaders).where(
+            and_(
+                signal_rollup_leaders.c.movement_id == movement_id,
+                signal_rollup_leaders.c.granularity == granularity,
+                signal_rollup_leaders.c.bucket == bucket,
+            )
+        )
+    )
+    end = bucket + GRANULARITIES[granularity]
+    leader_ids = set()
+    for source in SOURCES:
+        leader_ids.update(
+            connection.execute(
+                select(distinct(source.c.leader_id)).where(
+                    and_(
+                        source.c.movement_id == movement_id,
+                        source.c.time_stamp >= bucket,
+                        source.c.time_stamp < end,
+                    )
+                )
+            ).scalars()
+        )
+    if leader_ids:
+        connection.execute(
+            insert(signal_rollup_leaders),
+            [
+                {
+                    "movement_id": movement_id,
+                    "granularity": granularity,
+                    "bucket": bucket,
+                    "leader_id": leader_id,
+                }
+                for leader_id in sorted(leader_ids)
+            ],
+        )
+
+
+def repair(connection):
+    """
+    Overwrite the buckets that drifted with the counts from the signals tables
+    and return what was repaired. Run it in a transaction.
+    """
+    found = drift(connection)
+    for item in found:
+        movement_id, granularity, bucket = item.key
+        repair_leaders(connection, movement_id, granularity, bucket)
+        where = and_(
+            signal_rollups.c.movement_id == movement_id,
+            signal_rollups.c.granularity == granularity,
+            signal_rollups.c.bucket == bucket,
+        )
+        if item.stored is None:
+            connection.execute(
+                insert(signal_rollups).values(
+                    movement_id=movement_id,
+                    granularity=granularity,
+                    bucket=bucket,
+                    **item.expected._asdict(),
+                )
+            )
+        elif item.expected is None:
+            connection.execute(delete(signal_rollups).where(where))
+        else:
+            connection.execute(
+                update(signal_rollups).where(where).values(**item.expected._asdict())
+            )
+    return found
+
+
+class ActivityStats:
+    def __init__(self, engine, max_buckets=744):
+        self.engine = engine
+        self.max_buckets = max_buckets
+
+    def buckets(self, start, end, granularity):
+        """The number of buckets between ``start`` and ``end``."""
+        first = truncate(start, granularity)
+        return -(-(end - first) // GRANULARITIES[granularity])
+
+    def activity(self, movement_id, granularity, start, end):
+        """
+        Return the buckets from ``start`` up to ``end``, which are naive UTC
+        datetimes, with the counters of the movement. Buckets without signals
+        are included with zero counts.
+        """
+        step = GRANULARITIES[granularity]
+        first = truncate(start, granularity)
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                select(
+                    signal_rollups.c.bucket,
+                    signal_rollups.c.signals,
+                    signal_rollups.c.leaders,
+                ).where(
+                    signal_rollups.c.movement_id == movement_id,
+                    signal_rollups.c.granularity == granularity,
+                    signal_rollups.c.bucket >= first,
+                    signal_rollups.c.bucket < end,
+                )
+            )
+            found = {bucket: Bucket(count, leaders) for bucket, count, leaders in rows}
+            stats = get_movement_stats(connection, [movement_id])[movement_id]
+
+        buckets = []
+        bucket = first
+        while bucket < end:
+            count, leaders = found.get(bucket, (0, 0))
+            buckets.append(
+                {"start": isoformat(bucket), "signals": count, "leaders": leaders}
+            )
+            bucket += step
+
+        return {
+            "movement_id": movement_id,
+            "granularity": granularity,
+            "from": isoformat(first),
+            "to": isoformat(end),
+            "subscribers": stats["subscribers"],
+            "last_signal_sent": isoformat(stats["last_signal_sent"]),
+            "buckets": buckets,
+        }
+
+
+def get_activity_stats():
+    return current_app.extensions["activity_stats"]
+
+
+def install_activity_stats(app, engine):
+    stats = ActivityStats(engine, app.config.get("STATS_MAX_BUCKETS", 744))
+    app.extensions["activity_stats"] = stats
+    return stats
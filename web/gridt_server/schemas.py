@@ -1,22 +1,53 @@
+from datetime import timezone
+
 from marshmallow import (
     Schema,
     fields,
+    post_load,
     validates,
     validates_schema,
     ValidationError,
 )
-from marshmallow.validate import Length, OneOf
+from marshmallow.validate import Length, OneOf, Range
 from flask import current_app
 import jwt
 
-from gridt.controllers.movements import (
-    movement_exists,
-    movement_name_exists,
-)
+from gridt.controllers.movements import movement_exists
 from gridt.controllers.user import user_exists, verify_password_for_id
 from gridt.controllers.follower import follows_leader
 from gridt.controllers.subscription import is_subscribed
 
+from gridt_server.adjacency import get_adjacency_index
+from gridt_server.membership import get_subscription_index
+from gridt_server.rollups import GRANULARITIES, get_activity_stats
+from gridt_server.tables import utcnow
+
+
+def subscribed(user_id, movement_id):
+    """
+    Whether the user is subscribed to the movement, from memory if the
+    subscription index has the subscription. The database decides when it
+    does not, the index may not have seen a subscription of another worker yet.
+    """
+    index = get_subscription_index()
+    if index is not None and index.contains(user_id, movement_id):
+        return True
+    return is_subscribed(user_id, movement_id)
+
+
+def following(follower_id, movement_id, leader_id):
+    """
+    Whether the follower follows the leader in the movement, from memory if
+    the adjacency index has the edge. The database decides when it does not,
+    the index may not have seen an edge of another worker yet.
+    """
+    index = get_adjacency_index()
+    if index is not None and index.follows(follower_id, movement_id, leader_id):
+        return True
+    return user_exists(leader_id) and follows_leader(
+        follower_id, movement_id, leader_id
+    )
+
 
 class LoginSchema(Schema):
     username = fields.Str(required=True)
@@ -60,11 +91,6 @@ class MovementSchema(Schema):
         ])
     )
 
-    @validates("name")
-    def unique_name(self, name):
-        if movement_name_exists(name):
-            raise ValidationError("Movement name already in use.")
-
 
 class ChangePasswordSchema(Schema):
     old_password = fields.Str(required=True)
@@ -140,18 +166,42 @@ class LeaderSchema(Schema):
 
     @validates_schema
     def in_movement_and_following(self, data, **kwargs):
-        data = {field: int(data[field]) for field in data}
-        if not is_subscribed(data['follower_id'], data['movement_id']):
+        data = {
+            field: int(data[field])
+            for field in ("movement_id", "follower_id", "leader_id")
+        }
+        if not subscribed(data['follower_id'], data['movement_id']):
             raise ValidationError("User is not subscribed to this movement.")
         # This prevents a malicious user from finding user ids.
         # Returning a 404 for a nonexistant user would give them more
         # information than we want to share.
-        if not user_exists(data["leader_id"]) or not follows_leader(
-                data["follower_id"], data["movement_id"], data["leader_id"]
-        ):
+        if not following(data["follower_id"], data["movement_id"], data["leader_id"]):
             raise ValidationError("User is not following this leader.")
 
 
+def naive_utc(moment):
+    return moment.astimezone(timezone.utc).replace(tzinfo=None) if moment else moment
+
+
+class SignalHistorySchema(LeaderSchema):
+    start = fields.AwareDateTime(data_key="from", default_timezone=timezone.utc)
+    end = fields.AwareDateTime(data_key="to", default_timezone=timezone.utc)
+    limit = fields.Int(load_default=50, validate=Range(min=1, max=500))
+
+    @post_load
+    def utc(self, data, **kwargs):
+        for field in ("start", "end"):
+            if field in data:
+                data[field] = naive_utc(data[field])
+        return data
+
+
+class MovementSearchSchema(Schema):
+    q = fields.Str(required=True, validate=Length(min=1, max=100))
+    limit = fields.Int(load_default=20, validate=Range(min=1, max=100))
+    offset = fields.Int(load_default=0, validate=Range(min=0, max=1000))
+
+
 class SingleMovementSchema(Schema):
     movement_id = fields.Int(required=True)
 
@@ -161,6 +211,35 @@ class SingleMovementSchema(Schema):
             raise ValidationError("No movement found for that id.")
 
 
+class MovementStatsSchema(SingleMovementSchema):
+    granularity = fields.Str(load_default="day", validate=OneOf(list(GRANULARITIES)))
+    start = fields.AwareDateTime(data_key="from", default_timezone=timezone.utc)
+    end = fields.AwareDateTime(data_key="to", default_timezone=timezone.utc)
+
+    # Buckets returned when no start is given.
+    default_buckets = 30
+
+    @post_load
+    def fill_range(self, data, **kwargs):
+        """Use naive UTC times and default to the last 30 buckets."""
+        for field in ("start", "end"):
+            if field in data:
+                data[field] = naive_utc(data[field])
+        data.setdefault("end", utcnow())
+        step = GRANULARITIES[data["granularity"]]
+        data.setdefault("start", data["end"] - self.default_buckets * step)
+
+        if data["start"] >= data["end"]:
+            raise ValidationError("Should be before to.", "from")
+        stats = get_activity_stats()
+        buckets = stats.buckets(data["start"], data["end"], data["granularity"])
+        if buckets > stats.max_buckets:
+            raise ValidationError(
+                f"Range is longer than {stats.max_buckets} buckets.", "from"
+            )
+        return data
+
+
 class SignalSchema(Schema):
     movement_id = fields.Int(required=True)
     leader_id = fields.Int(required=True)
@@ -177,5 +256,5 @@ class SignalSchema(Schema):
 
     @validates_schema
     def leader_in_movement(self, data, *args, **kwargs):
-        if not is_subscribed(data["leader_id"], data["movement_id"]):
+        if not subscribed(data["leader_id"], data["movement_id"]):
             raise ValidationError("User not subscribed to movement")
@@ -0,0 +1,309 @@
+"""
+Movement search
+***************
+
+``GET /movements/search?q=`` finds movements by the words in their name and
+short description. Every worker keeps an inverted index of these words in
+memory: a sorted vocabulary and, for every word, the movements it occurs in
+with a weight. Every word of the query has to occur in a movement, as a whole
+word or, for words of at least ``MIN_PREFIX`` characters, as the start of a
+word, so that the index can be searched while the user is typing.
+
+Movements are ranked by the sum of the weights of the words they matched:
+a word in the name weighs more than a word in the short description and a
+whole word more than a prefix. Equal scores are ordered by id, so older
+movements come first, and movements whose name is the query come before all
+others. The movements of every word are also kept sorted by weight, so a
+query of one word only reads as many movements as it returns. A query of
+more words reads the movements of its rarest word in that order and stops
+once the others can not add enough to change the result.
+
+The index is loaded with a single query on the first search. The gridt
+library does not change or delete movements, so afterwards only new
+movements have to be added. Creating a movement bumps a version in the store
+(see :mod:`gridt_server.store`, which should be shared), and a worker that
+sees another version than it has loads the movements it does not know yet.
+It also does so every ``SEARCH_REFRESH`` seconds (default 60) for movements
+that were created without the server.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from heapq import heappush, heappushpop, merge
+
+from flask import current_app
+from sqlalchemy import select
+
+from gridt_server.events import listen
+from gridt_server.tables import movements
+
+WORD = re.compile(r"\w+")
+
+# Shorter words only match whole words, prefixes this short match too much
+# of the index to be useful.
+MIN_PREFIX = 3
+NAME_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+PREFIX_FACTOR = 0.5
+# Ids are handed out before the movements are committed, so a movement with
+# a lower id than the newest one that was loaded can still appear. This many
+# ids below the newest one are looked at again when catching up.
+CATCH_UP_WINDOW = 100
+# Terms that match at most this many words are scored by looking a movement
+# up in the postings of those words instead of going through its words.
+LOOKUPS = 8
+
+
+def words(text):
+    return WORD.findall(text.lower()) if text else []
+
+
+class MovementSearch:
+    version_key = "search:movements"
+
+    def __init__(self, engine, store, refresh=60):
+        self.engine = engine
+        self.store = store
+        self.refresh = refresh
+        self.vocabulary = []
+        # Maps every word to {movement id: weight}.
+        self.postings = {}
+        # Maps every word to its movement ids, highest weight first.
+        self.ranked = {}
+        # Maps movement ids to what a search returns about them and to the
+        # weights of their words.
+        self.documents = {}
+        self.weights = {}
+        # Maps the words of a name to the movements with that name.
+        self.names = {}
+        self.last_id = 0
+        self.version = None
+        self.loaded_at = None
+        self.lock = threading.Lock()
+
+    def add(self, movement_id, name, short_description, interval):
+        if movement_id in self.documents:
+            return
+        self.documents[movement_id] = {
+            "id": movement_id,
+            "name": name,
+            "short_description": short_description,
+            "interval": interval,
+        }
+        self.names.setdefault(" ".join(words(name)), []).append(movement_id)
+        weights = self.weights[movement_id] = {}
+        for word in words(name):
+            weights[word] = NAME_WEIGHT
+        for word in words(short_description):
+            weights[word] = weights.get(word, 0) + DESCRIPTION_WEIGHT
+        for word, weight in weights.items():
+            posting = self.postings.get(word)
+            if posting is None:
+                posting = self.postings[word] = {}
+                if self.loaded_at is not None:
+                    insort(self.vocabulary, word)
+            posting[movement_id] = weight
+            if self.loaded_at is not None:
+                self.insert(word, movement_id)
+        self.last_id = max(self.last_id, movement_id)
+
+    def key(self, word, movement_id):
+        return -self.postings[word][movement_id], movement_id
+
+    def insert(self, word, movement_id):
+        ranked = self.ranked.setdefault(word, [])
+        key = self.key(word, movement_id)
+        low, high = 0, len(ranked)
+        while low < high:
+            middle = (low + high) // 2
+            if self.key(word, ranked[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        ranked.insert(low, movement_id)
+
+    def load(self, after=None):
+        query = select(
+            movements.c.id,
+            movements.c.name,
+            movements.c.short_description,
+            movements.c.interval,
+        ).order_by(movements.c.id)
+        if after is not None:
+            query = query.where(movements.c.id > after)
+        with self.engine.connect() as connection:
+            return connection.execute(query).all()
+
+    def build(self, rows):
+        for row in rows:
+            self.add(*row)
+        self.vocabulary = sorted(self.postings)
+        self.ranked = {
+            word: sorted(
+                posting,
+                key=lambda movement_id: (-posting[movement_id], movement_id),
+            )
+            for word, posting in self.postings.items()
+        }
+
+    def stale(self, version, now):
+        return (
+            self.loaded_at is None
+            or version != self.version
+            or now - self.loaded_at >= self.refresh
+        )
+
+    def catch_up(self):
+        """
+        Add the movements that were created since the last search. The rows
+        are read, and the first time indexed, without holding the lock, which
+        is only held to put them in.
+        """
+        now = time.monotonic()
+        version = self.store.get(self.version_key)
+        with self.lock:
+            if not self.stale(version, now):
+                return
+            after = None if self.loaded_at is None else self.last_id - CATCH_UP_WINDOW
+
+        rows = self.load(after)
+        if after is None:
+            index = MovementSearch(self.engine, self.store, self.refresh)
+            index.build(rows)
+
+        with self.lock:
+            if after is None and self.loaded_at is None:
+                self.vocabulary = index.vocabulary
+                self.postings = index.postings
+                self.ranked = index.ranked
+                self.documents = index.documents
+                self.weights = index.weights
+                self.names = index.names
+                self.last_id = index.last_id
+            else:
+                # Another thread loaded the index first, or this is a catch up.
+                for row in rows:
+                    self.add(*row)
+            self.version = version
+            self.loaded_at = now
+
+    def expand(self, term):
+        """Return the words that ``term`` matches."""
+        if len(term) < MIN_PREFIX:
+            return [term] if term in self.postings else []
+        matched = []
+        for word in self.vocabulary[bisect_left(self.vocabulary, term) :]:
+            if not word.startswith(term):
+                break
+            matched.append(word)
+        return matched
+
+    def score(self, term, movement_id):
+        """Return the score of ``term`` for a movement, 0 if it does not match."""
+        weights = self.weights[movement_id]
+        if len(term) < MIN_PREFIX:
+            return weights.get(term, 0)
+        return max(
+            (
+                weight * (1 if word == term else PREFIX_FACTOR)
+                for word, weight in weights.items()
+                if word.startswith(term)
+            ),
+            default=0,
+        )
+
+    def scorer(self, term, matched):
+        """Return a function that returns the score of ``term`` for a movement."""
+        if len(matched) > LOOKUPS:
+            return lambda movement_id: self.score(term, movement_id)
+        postings = [
+            (self.postings[word], 1 if word == term else PREFIX_FACTOR)
+            for word in matched
+        ]
+        return lambda movement_id: max(
+            (posting.get(movement_id, 0) * factor for posting, factor in postings),
+            default=0,
+        )
+
+    def weighted(self, word, factor):
+        posting = self.postings[word]
+        for movement_id in self.ranked[word]:
+            yield -posting[movement_id] * factor, movement_id
+
+    def ranked_matches(self, term, matched):
+        """Yield (-score, movement id) of the movements with ``term``, best first."""
+        lists = [
+            self.weighted(word, 1 if word == term else PREFIX_FACTOR)
+            for word in matched
+        ]
+        seen = set()
+        for score, movement_id in merge(*lists):
+            if movement_id not in seen:
+                seen.add(movement_id)
+                yield score, movement_id
+
+    def rank(self, terms, count, exclude):
+        """Return the ids of the ``count`` best movements that match all terms."""
+        matched = {term: self.expand(term) for term in terms}
+        driver = min(
+            terms,
+            key=lambda term: sum(len(self.postings[word]) for word in matched[term]),
+        )
+        others = [self.scorer(term, matched[term]) for term in terms if term != driver]
+        # The most the other terms can add to the score of the driver.
+        headroom = (NAME_WEIGHT + DESCRIPTION_WEIGHT) * len(others)
+
+        best = []
+        for score, movement_id in self.ranked_matches(driver, matched[driver]):
+            if len(best) == count and best[0][0] > headroom - score:
+                break
+            if movement_id in exclude:
+                continue
+            total = -score
+            for scorer in others:
+                term_score = scorer(movement_id)
+                if not term_score:
+                    break
+                total += term_score
+            else:
+                if not others:
+                    # Movements of a single term come in order already.
+                    best.append((total, -movement_id))
+                    if len(best) == count:
+                        break
+                elif len(best) < count:
+                    heappush(best, (total, -movement_id))
+                else:
+                    heappushpop(best, (total, -movement_id))
+        return [-movement_id for _, movement_id in sorted(best, reverse=True)]
+
+    def search(self, query, limit=20, offset=0):
+        """Return the movements that match ``query``, best match first."""
+        terms = list(dict.fromkeys(words(query)))
+        if not terms:
+            return []
+
+        self.catch_up()
+        with self.lock:
+            count = offset + limit
+            ids = sorted(self.names.get(" ".join(terms), []))[:count]
+            if len(ids) < count:
+                ids += self.rank(terms, count - len(ids), exclude=set(ids))
+            return [self.documents[movement_id] for movement_id in ids[offset:]]
+
+    def created(self, user_id):
+        self.store.incr(self.version_key)
+
+
+def get_movement_search():
+    return current_app.extensions["movement_search"]
+
+
+def install_movement_search(app, engine):
+    search = MovementSearch(
+        engine, app.extensions["store"], app.config.get("SEARCH_REFRESH", 60)
+    )
+    app.extensions["movement_search"] = search
+    listen(app, "create_movement", search.created)
+    return search
@@ -0,0 +1,185 @@
+"""
+Slow request log
+****************
+
+Every request that takes longer than ``SLOW_REQUEST_THRESHOLD`` seconds is
+written as one JSON line to ``SLOW_REQUEST_LOG`` (or to the app logger when no
+file is given). An entry contains the endpoint, its url parameters (like
+``movement_id`` and ``leader_id``), the JWT identity, the phase timings and
+the SQL statements of the :class:`~gridt_server.instrumentation.RequestTrace`,
+and the stacks that the request was in when it crossed the threshold.
+
+A single watchdog thread per worker samples the stacks of requests that are
+still running after the threshold, so fast requests only pay for two
+dictionary operations. At most ``SLOW_REQUEST_LOG_RATE`` entries per second are
+written, with bursts of ``SLOW_REQUEST_LOG_BURST``, so that the log stays
+usable during an incident. Dropped entries are counted in the next one.
+"""
+import json
+import logging
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import g, request
+from flask_jwt_extended import get_jwt_identity
+
+from gridt_server.instrumentation import current_trace
+from gridt_server.profiling import collapse_stack
+
+
+class RateLimiter:
+    """Allow ``rate`` events per second with bursts of ``burst`` events."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class InFlightRequest:
+    def __init__(self, thread_id, threshold):
+        self.thread_id = thread_id
+        self.deadline = time.monotonic() + threshold
+        self.stacks = []
+
+
+class Watchdog(threading.Thread):
+    """Samples the stacks of requests that run past their deadline."""
+
+    def __init__(self, interval, max_samples=5):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.max_samples = max_samples
+        self.requests = {}
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            now = time.monotonic()
+            frames = None
+            for in_flight in list(self.requests.values()):
+                if (
+                    in_flight.deadline > now
+                    or len(in_flight.stacks) >= self.max_samples
+                ):
+                    continue
+                if frames is None:
+                    frames = sys._current_frames()
+                frame = frames.get(in_flight.thread_id)
+                if frame is not None:
+                    in_flight.stacks.append(collapse_stack(frame))
+
+
+def jwt_identity():
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        return None  # The endpoint does not require a token.
+
+
+def slow_request_entry(in_flight, duration, status):
+    trace = current_trace()
+    entry = {
+        "time": datetime.now(timezone.utc).isoformat(),
+        "duration_ms": round(duration * 1000, 2),
+        "method": request.method,
+        "endpoint": request.endpoint,
+        "path": request.path,
+        "status": status,
+        "params": request.view_args or {},
+        "identity": jwt_identity(),
+        "stacks": in_flight.stacks,
+    }
+    if trace is not None:
+        entry["phases_ms"] = {
+            phase: round(seconds * 1000, 2)
+            for phase, seconds in trace.phase_timings().items()
+        }
+        entry["queries"] = [
+            {
+                "statement": query.statement,
+                "duration_ms": round(query.duration * 1000, 2),
+            }
+            for query in trace.queries
+        ]
+    return entry
+
+
+def install_slow_request_log(app):
+    """
+    Install the slow request log if ``SLOW_REQUEST_THRESHOLD`` is set. Must be
+    called after :func:`~gridt_server.instrumentation.install_instrumentation`
+    so that the trace is still available when the entry is written.
+    """
+    threshold = app.config.get("SLOW_REQUEST_THRESHOLD")
+    if threshold is None:
+        return
+
+    if app.config.get("SLOW_REQUEST_LOG"):
+        # A logger of its own, outside of the logging hierarchy, so nothing
+        # else writes to the file and nothing else receives the entries.
+        logger = logging.Logger("gridt_server.slowlog")
+        handler = logging.FileHandler(app.config["SLOW_REQUEST_LOG"])
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+    else:
+        logger = app.logger
+
+    limiter = RateLimiter(
+        app.config.get("SLOW_REQUEST_LOG_RATE", 1),
+        app.config.get("SLOW_REQUEST_LOG_BURST", 10),
+    )
+    dropped = 0
+    dropped_lock = threading.Lock()
+
+    watchdog = Watchdog(interval=threshold / 2)
+    watchdog.start()
+
+    def register_request():
+        g.in_flight = InFlightRequest(threading.get_ident(), threshold)
+        g.in_flight_started = time.perf_counter()
+        watchdog.requests[id(g.in_flight)] = g.in_flight
+
+    def record_status(response):
+        g.response_status = response.status_code
+        return response
+
+    def log_slow_request(exception=None):
+        nonlocal dropped
+        in_flight = g.pop("in_flight", None)
+        if in_flight is None:
+            return
+        watchdog.requests.pop(id(in_flight), None)
+
+        duration = time.perf_counter() - g.in_flight_started
+        if duration < threshold:
+            return
+        if not limiter.allow():
+            with dropped_lock:
+                dropped += 1
+            return
+
+        entry = slow_request_entry(in_flight, duration, g.get("response_status", 500))
+        with dropped_lock:
+            entry["dropped_before"], dropped = dropped, 0
+        logger.warning(json.dumps(entry, default=str))
+
+    app.before_request(register_request)
+    app.after_request(record_status)
+    app.teardown_request(log_slow_request)
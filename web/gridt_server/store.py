@@ -0,0 +1,296 @@
+"""
+Store
+*****
+
+Small key-value store for state that has to be shared between requests, like
+rate limits. ``STORE_BACKEND`` selects the backend:
+
+- ``"memory"`` (default) keeps everything in the worker itself. It needs no
+  extra service but every gunicorn worker has a store of its own, so limits
+  are per worker.
+- ``"redis"`` keeps everything in the Redis server at ``STORE_URL`` and is
+  shared by all workers. It requires the ``redis`` package.
+
+The store of an app is available as ``app.extensions["store"]``, see
+:func:`get_store`. Features that keep workers in step through the store call
+:func:`require_shared_store`, which refuses the memory backend when gunicorn
+runs more than one worker (``WEB_CONCURRENCY``).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from gridt_server.health import register_readiness_check
+
+
+class MemoryStore:
+    """Store that lives in the memory of the worker."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, key, now):
+        value, expires = self._data[key]
+        if expires is not None and expires <= now:
+            del self._data[key]
+            return True
+        return False
+
+    def _set(self, key, value, ttl, now):
+        self._data[key] = (value, now + ttl if ttl else None)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_keys:
+            self._data.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data or self._expired(key, time.monotonic()):
+                return None
+            return self._data[key][0]
+
+    def get_many(self, keys):
+        """Return the values of ``keys``, None for the missing ones."""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                None
+                if key not in self._data or self._expired(key, now)
+                else self._data[key][0]
+                for key in keys
+            ]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._set(key, value, ttl, time.monotonic())
+
+    def add(self, key, value, ttl=None):
+        """Set ``key`` only if it does not exist, return whether it was set."""
+        with self._lock:
+            now = time.monotonic()
+            if key in self._data and not self._expired(key, now):
+                return False
+            self._set(key, value, ttl, now)
+            return True
+
+    def update(self, key, change):
+        """
+        Replace the value of ``key`` with ``change(value)`` atomically and
+        return it. Nothing is written when ``key`` does not exist or
+        ``change`` returns None. The key keeps its expiry.
+        """
+        with self._lock:
+            if key not in self._data or self._expired(key, time.monotonic()):
+                return None
+            value, expires = self._data[key]
+            value = change(value)
+            if value is not None:
+                self._data[key] = (value, expires)
+            return value
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key):
+        """Add one to the counter ``key`` and return the new value."""
+        with self._lock:
+            now = time.monotonic()
+            value = 1
+            if key in self._data and not self._expired(key, now):
+                value += self._data[key][0]
+            self._set(key, value, None, now)
+            return value
+
+    def push(self, key, *values, limit=None):
+        """
+        Append ``values`` to the list ``key`` and return its new length. With
+        ``limit`` only that many of the newest values are kept.
+        """
+        with self._lock:
+            if key not in self._data:
+                self._set(key, [], None, time.monotonic())
+            stored = self._data[key][0]
+            stored.extend(values)
+            if limit is not None and len(stored) > limit:
+                del stored[:-limit]
+            return len(stored)
+
+    def range(self, key, start):
+        """Return the values of the list ``key`` from index ``start`` on."""
+        with self._lock:
+            if key not in self._data:
+                return []
+            return self._data[key][0][start:]
+
+    def pop(self, key, count):
+        """Remove and return up to ``count`` values from the start of ``key``."""
+        with self._lock:
+            if key not in self._data:
+                return []
+            values = self._data[key][0]
+            popped = values[:count]
+            del values[:count]
+            return popped
+
+    def take_token(self, key, capacity, rate):
+        """
+        Take a token from the bucket ``key``, which holds ``capacity`` tokens
+        and refills ``rate`` tokens per second. Return 0 when a token was
+        taken, otherwise the number of seconds until one is available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if key in self._data and not self._expired(key, now):
+                tokens, updated = self._data[key][0]
+                tokens = min(capacity, tokens + (now - updated) * rate)
+            else:
+                tokens = capacity
+
+            if tokens >= 1:
+                wait = 0
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._set(key, (tokens, now), capacity / rate, now)
+            return wait
+
+    def ping(self):
+        return {"backend": "memory", "keys": len(self._data)}
+
+
+# Refills and takes a token atomically, using the clock of the Redis server
+# so that the workers agree on the time.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = tonumber(bucket[1])
+if tokens == nil then
+    tokens = capacity
+else
+    tokens = math.min(capacity, tokens + (now - tonumber(bucket[2])) * rate)
+end
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated", tostring(now))
+redis.call("PEXPIRE", KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(wait)
+"""
+
+
+class RedisStore:
+    """Store in a Redis server, shared by all workers."""
+
+    def __init__(self, url, prefix="gridt:"):
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._token_bucket = self.redis.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def get(self, key):
+        return self.redis.get(self.prefix + key)
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        return self.redis.mget([self.prefix + key for key in keys])
+
+    def set(self, key, value, ttl=None):
+        self.redis.set(self.prefix + key, value, px=int(ttl * 1000) if ttl else None)
+
+    def add(self, key, value, ttl=None):
+        px = int(ttl * 1000) if ttl else None
+        return bool(self.redis.set(self.prefix + key, value, px=px, nx=True))
+
+    def update(self, key, change):
+        key = self.prefix + key
+
+        # Redis runs the write only if nobody wrote the key since the GET,
+        # otherwise redis-py calls this again.
+        def transaction(pipeline):
+            value = pipeline.get(key)
+            if value is None:
+                return None
+            value = change(value)
+            if value is not None:
+                pipeline.multi()
+                pipeline.set(key, value, keepttl=True)
+            return value
+
+        return self.redis.transaction(transaction, key, value_from_callable=True)
+
+    def delete(self, key):
+        self.redis.delete(self.prefix + key)
+
+    def incr(self, key):
+        return self.redis.incr(self.prefix + key)
+
+    def push(self, key, *values, limit=None):
+        if limit is None:
+            return self.redis.rpush(self.prefix + key, *values)
+        pipeline = self.redis.pipeline()
+        pipeline.rpush(self.prefix + key, *values)
+        pipeline.ltrim(self.prefix + key, -limit, -1)
+        length, _ = pipeline.execute()
+        return min(length, limit)
+
+    def range(self, key, start):
+        return self.redis.lrange(self.prefix + key, start, -1)
+
+    def pop(self, key, count):
+        return self.redis.lpop(self.prefix + key, count) or []
+
+    def take_token(self, key, capacity, rate):
+        return float(
+            self._token_bucket(keys=[self.prefix + key], args=[capacity, rate])
+        )
+
+    def ping(self):
+        self.redis.ping()
+        return {"backend": "redis"}
+
+
+def create_store(app):
+    backend = app.config.get("STORE_BACKEND", "memory")
+    if backend == "memory":
+        return MemoryStore(app.config.get("STORE_MAX_KEYS", 100000))
+    if backend == "redis":
+        return RedisStore(app.config["STORE_URL"])
+    raise ValueError(f"Unknown STORE_BACKEND {backend}.")
+
+
+def workers():
+    """Return the number of gunicorn workers, from ``WEB_CONCURRENCY``."""
+    return int(os.environ.get("WEB_CONCURRENCY", 1))
+
+
+def require_shared_store(app, feature):
+    """Raise RuntimeError when ``feature`` would get a store per worker."""
+    if isinstance(app.extensions["store"], MemoryStore) and workers() > 1:
+        raise RuntimeError(
+            f'{feature} requires STORE_BACKEND="redis" with {workers()} workers.'
+        )
+
+
+def install_store(app):
+    store = create_store(app)
+    app.extensions["store"] = store
+    register_readiness_check(app, "store", store.ping)
+    return store
+
+
+def get_store():
+    """Return the store of the current app, or None if it has none."""
+    return current_app.extensions.get("store")
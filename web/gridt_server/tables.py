@@ -0,0 +1,114 @@
+"""
+Tables
+******
+
+Lightweight descriptions of the tables of the gridt library. The models
+themselves live in the library, these only exist for the places where the
+server has to query or alter those tables directly with SQLAlchemy Core, and
+they keep the assumptions about table and column names in one place.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import DateTime, table, column
+
+users = table(
+    "users",
+    column("id"),
+    column("username"),
+    column("email"),
+)
+
+movements = table(
+    "movements",
+    column("id"),
+    column("name"),
+    column("interval"),
+    column("short_description"),
+    column("description"),
+)
+
+subscriptions = table(
+    "subscriptions",
+    column("id"),
+    column("user_id"),
+    column("movement_id"),
+    column("time_added", DateTime),
+    column("time_removed", DateTime),
+)
+
+followers = table(
+    "movement_user_association",
+    column("id"),
+    column("movement_id"),
+    column("follower_id"),
+    column("leader_id"),
+    column("created", DateTime),
+    column("destroyed", DateTime),
+)
+
+signals = table(
+    "signals",
+    column("id"),
+    column("leader_id"),
+    column("movement_id"),
+    column("time_stamp", DateTime),
+    column("message"),
+)
+
+signals_archive = table(
+    "signals_archive",
+    column("id"),
+    column("leader_id"),
+    column("movement_id"),
+    column("time_stamp", DateTime),
+    column("message"),
+)
+
+announcements = table(
+    "announcements",
+    column("id"),
+    column("movement_id"),
+    column("user_id"),
+    column("message"),
+    column("created_time", DateTime),
+    column("updated_time", DateTime),
+    column("removed_time", DateTime),
+)
+
+# Tables that belong to the server, see gridt_server.counters.
+movement_stats = table(
+    "movement_stats",
+    column("movement_id"),
+    column("subscribers"),
+    column("last_signal_sent", DateTime),
+    column("last_announcement", DateTime),
+)
+
+leader_signals = table(
+    "leader_signals",
+    column("movement_id"),
+    column("leader_id"),
+    column("last_signal", DateTime),
+)
+
+signal_rollups = table(
+    "signal_rollups",
+    column("movement_id"),
+    column("granularity"),
+    column("bucket", DateTime),
+    column("signals"),
+    column("leaders"),
+)
+
+signal_rollup_leaders = table(
+    "signal_rollup_leaders",
+    column("movement_id"),
+    column("granularity"),
+    column("bucket", DateTime),
+    column("leader_id"),
+)
+
+
+def utcnow():
+    """The gridt tables store times as naive UTC datetimes."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
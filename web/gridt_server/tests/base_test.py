@@ -1,9 +1,24 @@
+import os
 import sys
 import logging
+import tempfile
 
 from unittest import TestCase
 
+from alembic import command
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    text,
+)
+
 from gridt_server.app import load_config, register_api_endpoints
+from gridt_server.migrations import alembic_config
 
 from flask import Flask
 from flask_jwt_extended import JWTManager, create_access_token
@@ -46,6 +61,124 @@ class LogThisTestCase(type):
         return type.__new__(cls, name, bases, dct)
 
 
+# The columns of the gridt tables that the server queries directly and the
+# tables of the migrations, without indexes or triggers, for unit tests that
+# run against SQLite without the library.
+metadata = MetaData()
+GRIDT_TABLES = [
+    Table(
+        "users",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("username", String(32)),
+        Column("email", String(320)),
+    ),
+    Table(
+        "movements",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("name", String(50)),
+        Column("interval", String(20)),
+        Column("short_description", String(100)),
+        Column("description", String(1000)),
+    ),
+    Table(
+        "subscriptions",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("user_id", Integer),
+        Column("movement_id", Integer),
+        Column("time_added", DateTime),
+        Column("time_removed", DateTime),
+    ),
+    Table(
+        "movement_user_association",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("movement_id", Integer),
+        Column("follower_id", Integer),
+        Column("leader_id", Integer),
+        Column("created", DateTime),
+        Column("destroyed", DateTime),
+    ),
+    Table(
+        "signals",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("leader_id", Integer),
+        Column("movement_id", Integer),
+        Column("time_stamp", DateTime),
+        Column("message", String(140)),
+    ),
+    Table(
+        "announcements",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("movement_id", Integer),
+        Column("user_id", Integer),
+        Column("message", String(140)),
+        Column("created_time", DateTime),
+        Column("updated_time", DateTime),
+        Column("removed_time", DateTime),
+    ),
+]
+SERVER_TABLES = [
+    Table(
+        "movement_stats",
+        metadata,
+        Column("movement_id", Integer, primary_key=True),
+        Column("subscribers", Integer, nullable=False, server_default="0"),
+        Column("last_signal_sent", DateTime),
+        Column("last_announcement", DateTime),
+    ),
+    Table(
+        "leader_signals",
+        metadata,
+        Column("movement_id", Integer, primary_key=True),
+        Column("leader_id", Integer, primary_key=True),
+        Column("last_signal", DateTime),
+    ),
+    Table(
+        "signal_rollups",
+        metadata,
+        Column("movement_id", Integer, primary_key=True),
+        Column("granularity", String(8), primary_key=True),
+        Column("bucket", DateTime, primary_key=True),
+        Column("signals", Integer, nullable=False),
+        Column("leaders", Integer, nullable=False),
+    ),
+    Table(
+        "signal_rollup_leaders",
+        metadata,
+        Column("movement_id", Integer, primary_key=True),
+        Column("granularity", String(8), primary_key=True),
+        Column("bucket", DateTime, primary_key=True),
+        Column("leader_id", Integer, primary_key=True),
+    ),
+    Table(
+        "signals_archive",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("leader_id", Integer),
+        Column("movement_id", Integer),
+        Column("time_stamp", DateTime),
+        Column("message", String(140)),
+    ),
+]
+
+
+def create_schema(engine, *statements, server_tables=True):
+    """
+    Create the test schema in ``engine``, the tables of the migrations too
+    unless ``server_tables`` is false, and run ``statements`` to fill it.
+    """
+    tables = GRIDT_TABLES + SERVER_TABLES if server_tables else GRIDT_TABLES
+    metadata.create_all(engine, tables=tables)
+    with engine.begin() as connection:
+        for statement in statements:
+            connection.execute(text(statement))
+
+
 class LoggedTestCase(TestCase):
     __metaclass__ = LogThisTestCase
     logger = logging.getLogger()
@@ -85,3 +218,29 @@ class BaseTest(LoggedTestCase):
 
     def get_user(self, index):
         raise NotImplementedError
+
+
+class MigratedDatabaseTest(LoggedTestCase):
+    """
+    Test case with a real database that has been migrated to the newest
+    revision. A throwaway SQLite file is used unless ``GRIDT_TEST_DATABASE_URL``
+    points to another database, like a local MySQL server.
+    """
+
+    def setUp(self):
+        self.tmpdir = None
+        self.database_url = os.getenv("GRIDT_TEST_DATABASE_URL")
+        if not self.database_url:
+            self.tmpdir = tempfile.TemporaryDirectory()
+            self.database_url = f"sqlite:///{self.tmpdir.name}/gridt.db"
+
+        self.alembic_config = alembic_config(self.database_url)
+        command.upgrade(self.alembic_config, "head")
+        self.engine = create_engine(self.database_url)
+
+    def tearDown(self):
+        self.engine.dispose()
+        if self.tmpdir:
+            self.tmpdir.cleanup()
+        else:
+            command.downgrade(self.alembic_config, "base")
@@ -0,0 +1,70 @@
+"""
+Signal archive
+==============
+
+Moves signals of a migrated database to the archive and reads them back.
+"""
+from datetime import timedelta
+
+from sqlalchemy import func, select, update
+
+from gridt.db import Session
+from gridt.controllers.user import register
+from gridt.controllers.creation import new_movement_by_user
+from gridt.controllers.subscription import new_subscription
+from gridt.controllers.leader import send_signal
+
+from gridt_server.archive import SignalArchiver
+from gridt_server.tables import movements, signals, signals_archive, users, utcnow
+from gridt_server.tests.base_test import MigratedDatabaseTest
+
+
+class SignalArchiveTest(MigratedDatabaseTest):
+    def setUp(self):
+        super().setUp()
+        Session.configure(bind=self.engine)
+
+        register("admin", "admin@gridt.org", "password", True)
+        self.admin_id = self.scalar(
+            select(users.c.id).where(users.c.username == "admin")
+        )
+        new_movement_by_user(
+            user_id=self.admin_id,
+            name="flossing",
+            interval="daily",
+            short_description="Floss every day.",
+            description="",
+        )
+        self.movement_id = self.scalar(
+            select(movements.c.id).where(movements.c.name == "flossing")
+        )
+        new_subscription(self.admin_id, self.movement_id)
+        for _ in range(5):
+            send_signal(self.admin_id, self.movement_id, "Done!")
+
+        # Pretend the signals were sent on the five days before a year ago.
+        with self.engine.begin() as connection:
+            ids = connection.execute(
+                select(signals.c.id).order_by(signals.c.id)
+            ).scalars()
+            for age, signal_id in enumerate(reversed(list(ids))):
+                connection.execute(
+                    update(signals)
+                    .where(signals.c.id == signal_id)
+                    .values(time_stamp=utcnow() - timedelta(days=366 + age))
+                )
+
+    def scalar(self, query):
+        with self.engine.connect() as connection:
+            return connection.execute(query).scalar()
+
+    def test_archive(self):
+        archiver = SignalArchiver(self.engine, retention_days=365, keep=3, batch_size=2)
+        self.assertEqual(archiver.run(), 2)
+
+        self.assertEqual(self.scalar(select(func.count()).select_from(signals)), 3)
+        self.assertEqual(
+            self.scalar(select(func.count()).select_from(signals_archive)), 2
+        )
+        history = archiver.history(self.movement_id, self.admin_id)
+        self.assertEqual(len(history), 5)
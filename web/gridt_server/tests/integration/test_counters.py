@@ -0,0 +1,103 @@
+"""
+Movement counters
+=================
+
+The counter and rollup tables are maintained by triggers, so these tests make
+changes through the gridt library and check the tables that the triggers
+filled in.
+"""
+from sqlalchemy import func, select, text
+
+from gridt.db import Session
+from gridt.controllers.user import register
+from gridt.controllers.creation import new_movement_by_user
+from gridt.controllers.subscription import new_subscription, remove_subscription
+from gridt.controllers.leader import send_signal
+from gridt.controllers.announcement import create_announcement
+
+from gridt_server import rollups
+from gridt_server.counters import drift, get_last_signals, get_movement_stats, repair
+from gridt_server.tables import users, movements, signal_rollups
+from gridt_server.tests.base_test import MigratedDatabaseTest
+
+
+class CountersTest(MigratedDatabaseTest):
+    def setUp(self):
+        super().setUp()
+        Session.configure(bind=self.engine)
+
+        register("admin", "admin@gridt.org", "password", True)
+        register("member", "member@gridt.org", "password", False)
+        self.admin_id = self.scalar(
+            select(users.c.id).where(users.c.username == "admin")
+        )
+        self.member_id = self.scalar(
+            select(users.c.id).where(users.c.username == "member")
+        )
+
+        new_movement_by_user(
+            user_id=self.admin_id,
+            name="flossing",
+            interval="daily",
+            short_description="Floss every day.",
+            description="",
+        )
+        self.movement_id = self.scalar(
+            select(movements.c.id).where(movements.c.name == "flossing")
+        )
+
+    def scalar(self, query):
+        with self.engine.connect() as connection:
+            return connection.execute(query).scalar()
+
+    def stats(self):
+        with self.engine.connect() as connection:
+            return get_movement_stats(connection, [self.movement_id])[self.movement_id]
+
+    def test_maintained_on_write(self):
+        new_subscription(self.admin_id, self.movement_id)
+        new_subscription(self.member_id, self.movement_id)
+        self.assertEqual(self.stats()["subscribers"], 2)
+
+        send_signal(self.member_id, self.movement_id, "Done!")
+        create_announcement(
+            message="Hello", movement_id=self.movement_id, user_id=self.admin_id
+        )
+        stats = self.stats()
+        self.assertIsNotNone(stats["last_signal_sent"])
+        self.assertIsNotNone(stats["last_announcement"])
+        with self.engine.connect() as connection:
+            last_signals = get_last_signals(connection, self.movement_id)
+        self.assertEqual(list(last_signals), [self.member_id])
+        self.assertEqual(last_signals[self.member_id], stats["last_signal_sent"])
+
+        remove_subscription(self.member_id, self.movement_id)
+        self.assertEqual(self.stats()["subscribers"], 1)
+
+        with self.engine.connect() as connection:
+            self.assertEqual(drift(connection), [])
+
+    def test_repair(self):
+        new_subscription(self.member_id, self.movement_id)
+        with self.engine.begin() as connection:
+            connection.execute(text("UPDATE movement_stats SET subscribers = 7"))
+            self.assertEqual(len(drift(connection)), 1)
+            repair(connection)
+
+        self.assertEqual(self.stats()["subscribers"], 1)
+
+    def test_rollups(self):
+        new_subscription(self.admin_id, self.movement_id)
+        new_subscription(self.member_id, self.movement_id)
+        send_signal(self.member_id, self.movement_id, "Done!")
+        send_signal(self.member_id, self.movement_id, "Done again!")
+        send_signal(self.admin_id, self.movement_id, "Done!")
+
+        with self.engine.connect() as connection:
+            self.assertEqual(rollups.drift(connection), [])
+            total = connection.execute(
+                select(func.sum(signal_rollups.c.signals)).where(
+                    signal_rollups.c.granularity == "day"
+                )
+            ).scalar()
+        self.assertEqual(total, 3)
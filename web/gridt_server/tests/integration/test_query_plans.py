@@ -0,0 +1,62 @@
+from sqlalchemy import select, func
+
+from gridt_server.tests.base_test import MigratedDatabaseTest
+from gridt_server.tables import movements, subscriptions, followers, signals
+
+HOT_QUERIES = {
+    "is_subscribed": select(subscriptions.c.id).where(
+        subscriptions.c.user_id == 1,
+        subscriptions.c.movement_id == 2,
+        subscriptions.c.time_removed.is_(None),
+    ),
+    "follows_leader": select(followers.c.id).where(
+        followers.c.follower_id == 1,
+        followers.c.movement_id == 2,
+        followers.c.leader_id == 3,
+        followers.c.destroyed.is_(None),
+    ),
+    "leaders_of_follower": select(followers.c.leader_id).where(
+        followers.c.follower_id == 1,
+        followers.c.movement_id == 2,
+        followers.c.destroyed.is_(None),
+    ),
+    "followers_of_leader": select(followers.c.follower_id).where(
+        followers.c.movement_id == 2,
+        followers.c.leader_id == 3,
+    ),
+    "movement_name_exists": select(movements.c.id).where(
+        movements.c.name == "flossing"
+    ),
+    "last_signal_of_leader": select(func.max(signals.c.time_stamp)).where(
+        signals.c.movement_id == 2,
+        signals.c.leader_id == 3,
+    ),
+}
+
+
+class QueryPlanTest(MigratedDatabaseTest):
+    def explain(self, connection, query):
+        """Return the plan rows that read a whole table."""
+        statement = str(
+            query.compile(
+                dialect=connection.dialect,
+                compile_kwargs={"literal_binds": True},
+            )
+        )
+        if connection.dialect.name == "sqlite":
+            rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}")
+            # SQLite reports both plain scans and MAX() without an index
+            # without mentioning an index or the primary key.
+            return [
+                row.detail
+                for row in rows
+                if "INDEX" not in row.detail and "PRIMARY KEY" not in row.detail
+            ]
+        rows = connection.exec_driver_sql(f"EXPLAIN {statement}").mappings()
+        return [row["table"] for row in rows if row["type"] == "ALL"]
+
+    def test_hot_queries_use_indexes(self):
+        with self.engine.connect() as connection:
+            for name, query in HOT_QUERIES.items():
+                with self.subTest(query=name):
+                    self.assertEqual(self.explain(connection, query), [])
@@ -0,0 +1,159 @@
+"""
+Swap paths
+==========
+
+With ``CANDIDATE_POOLS=True`` the server swaps leaders by writing
+``movement_user_association`` itself instead of through ``swap_leader`` of
+the gridt library. These tests seed two movements the same way, swap a leader
+in one with the library and in the other with the candidate pools, and check
+that both leave the network in the same shape and that the library reads the
+swap of the pools like one of its own.
+"""
+from sqlalchemy import func, select
+
+from gridt.db import Session
+from gridt.controllers.creation import new_movement_by_user
+from gridt.controllers.follower import follows_leader, get_leader, swap_leader
+from gridt.controllers.subscription import new_subscription
+from gridt.controllers.user import register
+
+from gridt_server.candidates import CandidatePools
+from gridt_server.tables import followers, movements, subscriptions, users
+from gridt_server.tests.base_test import MigratedDatabaseTest
+
+PASSWORD = "password"
+
+
+class SwapPathsTest(MigratedDatabaseTest):
+    def setUp(self):
+        super().setUp()
+        Session.configure(bind=self.engine)
+        self.pools = CandidatePools(self.engine)
+
+        register("admin", "admin@gridt.org", PASSWORD, True)
+        self.admin_id = self.user_id("admin")
+
+    def scalar(self, query):
+        with self.engine.connect() as connection:
+            return connection.execute(query).scalar()
+
+    def user_id(self, username):
+        return self.scalar(select(users.c.id).where(users.c.username == username))
+
+    def seed(self, name, members):
+        """Create a movement that ``members`` new users joined, return the ids."""
+        new_movement_by_user(
+            user_id=self.admin_id,
+            name=name,
+            interval="daily",
+            short_description="A movement to swap leaders in.",
+            description="",
+        )
+        movement_id = self.scalar(
+            select(movements.c.id).where(movements.c.name == name)
+        )
+        member_ids = []
+        for i in range(members):
+            username = f"{name}{i}"
+            register(username, f"{username}@gridt.org", PASSWORD, False)
+            member_ids.append(self.user_id(username))
+            new_subscription(member_ids[-1], movement_id)
+        return movement_id, member_ids
+
+    def edges(self, movement_id):
+        """Return (follower, leader, active) of every edge of a movement."""
+        with self.engine.connect() as connection:
+            return connection.execute(
+                select(
+                    followers.c.follower_id,
+                    followers.c.leader_id,
+                    followers.c.destroyed.is_(None),
+                ).where(followers.c.movement_id == movement_id)
+            ).all()
+
+    def leaders(self, follower_id, movement_id):
+        return {
+            leader_id
+            for follower, leader_id, active in self.edges(movement_id)
+            if follower == follower_id and active
+        }
+
+    def shape(self, movement_id):
+        """Return the number of active and destroyed edges of a movement."""
+        edges = self.edges(movement_id)
+        active = sum(1 for _, _, is_active in edges if is_active)
+        return active, len(edges) - active
+
+    def swap_both(self, members):
+        """Swap a leader with the library and with the pools, return both results."""
+        results = []
+        for name, swap in (
+            ("library", lambda *args: swap_leader(*args) and True),
+            ("pools", self.pools.swap),
+        ):
+            movement_id, member_ids = self.seed(name, members)
+            follower_id = member_ids[0]
+            before = self.leaders(follower_id, movement_id)
+            leader_id = min(before)
+            swapped = swap(follower_id, movement_id, leader_id)
+            results.append(
+                {
+                    "movement_id": movement_id,
+                    "follower_id": follower_id,
+                    "leader_id": leader_id,
+                    "before": before,
+                    "after": self.leaders(follower_id, movement_id),
+                    "swapped": bool(swapped),
+                    "shape": self.shape(movement_id),
+                }
+            )
+        return results
+
+    def test_swap(self):
+        library, pools = self.swap_both(members=8)
+
+        self.assertTrue(library["swapped"])
+        self.assertTrue(pools["swapped"])
+        self.assertEqual(library["shape"], pools["shape"])
+        for result in (library, pools):
+            after, before = result["after"], result["before"]
+            self.assertEqual(len(after), len(before))
+            self.assertNotIn(result["leader_id"], after)
+            self.assertNotIn(result["follower_id"], after)
+            self.assertEqual(len(after - before), 1)
+
+        (new_leader_id,) = pools["after"] - pools["before"]
+        active = self.scalar(
+            select(func.count()).where(
+                subscriptions.c.user_id == new_leader_id,
+                subscriptions.c.movement_id == pools["movement_id"],
+                subscriptions.c.time_removed.is_(None),
+            )
+        )
+        self.assertEqual(active, 1)
+        # The library sees the leader the pools picked as its own.
+        self.assertTrue(
+            follows_leader(pools["follower_id"], pools["movement_id"], new_leader_id)
+        )
+        self.assertFalse(
+            follows_leader(
+                pools["follower_id"], pools["movement_id"], pools["leader_id"]
+            )
+        )
+        self.assertTrue(
+            get_leader(
+                follower_id=pools["follower_id"],
+                movement_id=pools["movement_id"],
+                leader_id=new_leader_id,
+            )
+        )
+
+    def test_no_candidate(self):
+        # In a movement this small the follower already follows everybody else.
+        library, pools = self.swap_both(members=3)
+
+        self.assertFalse(library["swapped"])
+        self.assertFalse(pools["swapped"])
+        self.assertEqual(library["shape"], pools["shape"])
+        for result in (library, pools):
+            self.assertEqual(result["after"], result["before"])
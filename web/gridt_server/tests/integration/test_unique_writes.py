@@ -0,0 +1,126 @@
+"""
+Concurrent duplicate writes
+===========================
+
+Subscribing, creating a movement and registering insert without checking
+first and rely on the unique constraints of migration 0006. These tests send
+the same request from several threads at once and check that exactly one
+row is written while every request gets the answer it would get on its own.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from flask_restful import Api
+from sqlalchemy import func, select
+
+from gridt.db import Session
+from gridt.controllers.user import register
+from gridt.controllers.creation import new_movement_by_user
+
+from gridt_server.app import load_config, register_api_endpoints
+from gridt_server.tables import movements, subscriptions, users
+from gridt_server.tests.base_test import MigratedDatabaseTest
+
+THREADS = 8
+
+
+class UniqueWritesTest(MigratedDatabaseTest):
+    def setUp(self):
+        super().setUp()
+        Session.configure(bind=self.engine)
+
+        self.app = Flask(__name__)
+        load_config(self.app, overwrite_conf="../conf/test.conf")
+        self.app.config["JWT_HEADER_TYPE"] = "JWT"
+        register_api_endpoints(Api(self.app))
+        JWTManager(self.app)
+
+        register("admin", "admin@gridt.org", "password", True)
+        self.admin_id = self.scalar(
+            select(users.c.id).where(users.c.username == "admin")
+        )
+        with self.app.app_context():
+            self.token = f"JWT {create_access_token(self.admin_id)}"
+
+    def scalar(self, query):
+        with self.engine.connect() as connection:
+            return connection.execute(query).scalar()
+
+    def concurrently(self, method, url, **kwargs):
+        """Send the request from every thread at once, return the responses."""
+        barrier = Barrier(THREADS)
+
+        def send(_):
+            client = self.app.test_client()
+            barrier.wait()
+            return client.open(
+                url, method=method, headers={"Authorization": self.token}, **kwargs
+            )
+
+        with ThreadPoolExecutor(THREADS) as pool:
+            return list(pool.map(send, range(THREADS)))
+
+    def test_subscribe(self):
+        new_movement_by_user(
+            user_id=self.admin_id,
+            name="flossing",
+            interval="daily",
+            short_description="Floss every day.",
+            description="",
+        )
+        movement_id = self.scalar(
+            select(movements.c.id).where(movements.c.name == "flossing")
+        )
+
+        responses = self.concurrently("PUT", f"/movements/{movement_id}/subscriber")
+
+        self.assertEqual(
+            [response.status_code for response in responses], [200] * THREADS
+        )
+        active = self.scalar(
+            select(func.count()).where(
+                subscriptions.c.user_id == self.admin_id,
+                subscriptions.c.movement_id == movement_id,
+                subscriptions.c.time_removed.is_(None),
+            )
+        )
+        self.assertEqual(active, 1)
+
+    def test_create_movement(self):
+        body = {
+            "name": "flossing",
+            "short_description": "Floss every day.",
+            "interval": "daily",
+        }
+        responses = self.concurrently("POST", "/movements", json=body)
+
+        codes = sorted(response.status_code for response in responses)
+        self.assertEqual(codes, [201] + [400] * (THREADS - 1))
+        for response in responses:
+            if response.status_code == 400:
+                self.assertEqual(
+                    response.get_json()["message"],
+                    "name: Movement name already in use.",
+                )
+        self.assertEqual(self.scalar(select(func.count()).select_from(movements)), 1)
+
+    def test_register(self):
+        body = {"username": "robin", "email": "robin@gridt.org", "password": "secret"}
+        barrier = Barrier(THREADS)
+
+        def send(_):
+            client = self.app.test_client()
+            barrier.wait()
+            return client.post("/register", json=body)
+
+        with ThreadPoolExecutor(THREADS) as pool:
+            responses = list(pool.map(send, range(THREADS)))
+
+        codes = sorted(response.status_code for response in responses)
+        self.assertEqual(codes, [201] + [400] * (THREADS - 1))
+        self.assertEqual(
+            self.scalar(select(func.count()).where(users.c.email == "robin@gridt.org")),
+            1,
+        )
@@ -0,0 +1,34 @@
+"""Unittests for the feed endpoint."""
+
+from unittest.mock import patch
+
+from gridt_server.feed import Feed
+from gridt_server.tests.base_test import BaseTest
+
+
+class FeedResourceTest(BaseTest):
+    """Unittests for GETs to: /feed."""
+
+    user_id = 42
+    feed = [{"id": 1, "name": "Flossing", "leaders": [], "last_announcement": None}]
+
+    def setUp(self):
+        super().setUp()
+        self.app.extensions["feed"] = Feed(engine=None, store=None)
+
+    def test_get_feed(self):
+        feed = self.app.extensions["feed"]
+        with patch.object(feed, "get", return_value=self.feed) as get:
+            with self.app_context():
+                response = self.client.get(
+                    "/feed",
+                    headers={"Authorization": self.obtain_token_header(self.user_id)},
+                )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), self.feed)
+        get.assert_called_once_with(self.user_id)
+
+    def test_unauthorized(self):
+        with self.app_context():
+            response = self.client.get("/feed")
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,72 @@
+"""Unittests for the signal history endpoint."""
+
+from datetime import datetime
+from unittest.mock import patch
+
+from gridt_server.archive import SignalArchiver
+from gridt_server.tests.base_test import BaseTest
+
+
+class SignalHistoryResourceTest(BaseTest):
+    """Unittests for GETs to: /movements/<id>/leader/<id>/signals."""
+
+    schema_path = "gridt_server.schemas"
+    user_id = 42
+    movement_id = 1
+    leader_id = 5
+    history = [{"time_stamp": "2021-01-01T12:00:00+00:00", "message": "Done!"}]
+
+    def setUp(self):
+        super().setUp()
+        self.archiver = SignalArchiver(engine=None)
+        self.app.extensions["signal_archiver"] = self.archiver
+
+    def send_history_request(self, **params):
+        return self.client.get(
+            f"/movements/{self.movement_id}/leader/{self.leader_id}/signals",
+            query_string=params,
+            headers={"Authorization": self.obtain_token_header(self.user_id)},
+        )
+
+    @patch(f"{schema_path}.following", return_value=True)
+    @patch(f"{schema_path}.subscribed", return_value=True)
+    @patch(f"{schema_path}.movement_exists", return_value=True)
+    def test_get_history(self, *mocks):
+        with patch.object(
+            self.archiver, "history", return_value=self.history
+        ) as history:
+            with self.app_context():
+                response = self.send_history_request(
+                    **{"from": "2020-01-01T00:00:00+01:00", "limit": 10}
+                )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), self.history)
+        history.assert_called_once_with(
+            self.movement_id,
+            self.leader_id,
+            start=datetime(2019, 12, 31, 23),
+            end=None,
+            limit=10,
+        )
+
+    @patch(f"{schema_path}.following", return_value=False)
+    @patch(f"{schema_path}.subscribed", return_value=True)
+    @patch(f"{schema_path}.movement_exists", return_value=True)
+    def test_not_following(self, *mocks):
+        with patch.object(self.archiver, "history") as history:
+            with self.app_context():
+                response = self.send_history_request()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.get_json(),
+            {"message": "_schema: User is not following this leader."},
+        )
+        history.assert_not_called()
+
+    @patch(f"{schema_path}.following", return_value=True)
+    @patch(f"{schema_path}.subscribed", return_value=True)
+    @patch(f"{schema_path}.movement_exists", return_value=True)
+    def test_invalid_limit(self, *mocks):
+        with self.app_context():
+            response = self.send_history_request(limit=1000)
+        self.assertEqual(response.status_code, 400)
@@ -1,3 +1,4 @@
+from gridt_server.candidates import SwapConflict
 from gridt_server.tests.base_test import BaseTest
 
 from unittest import mock
@@ -47,6 +48,65 @@ class SwapTest(BaseTest):
             follower_id=self.u_id, movement_id=self.m_id, leader_id=self.l_id
         )
 
+    @mock.patch(
+        "gridt_server.resources.leader.get_leader",
+        return_value={"leader": "profile"}
+    )
+    @mock.patch("gridt_server.resources.leader.swap_leader")
+    @mock.patch("gridt_server.schemas.movement_exists", return_value=True)
+    @mock.patch("gridt_server.schemas.is_subscribed", return_value=True)
+    @mock.patch("gridt_server.schemas.user_exists", return_value=True)
+    @mock.patch("gridt_server.schemas.follows_leader", return_value=True)
+    def test_swap_leader_candidate_pools(
+        self,
+        mock_follows,
+        mock_user_exists,
+        mock_is_subscribed,
+        mock_movement_exists,
+        mock_swap_leader,
+        mock_get_leader
+    ):
+        pools = mock.Mock()
+        pools.swap.return_value = 7
+        self.app.extensions["candidate_pools"] = pools
+
+        with self.app_context():
+            response = self.send_request(self.u_id, self.l_id, self.m_id)
+            self.assertEqual(response.status_code, 200)
+            self.assertDictEqual(response.get_json(), {"leader": "profile"})
+
+        pools.swap.assert_called_once_with(
+            follower_id=self.u_id, movement_id=self.m_id, leader_id=self.l_id
+        )
+        mock_get_leader.assert_called_once_with(
+            follower_id=self.u_id, movement_id=self.m_id, leader_id=7
+        )
+        mock_swap_leader.assert_not_called()
+
+    @mock.patch("gridt_server.resources.leader.swap_leader")
+    @mock.patch("gridt_server.schemas.movement_exists", return_value=True)
+    @mock.patch("gridt_server.schemas.is_subscribed", return_value=True)
+    @mock.patch("gridt_server.schemas.user_exists", return_value=True)
+    @mock.patch("gridt_server.schemas.follows_leader", return_value=True)
+    def test_swap_leader_conflict(
+        self,
+        mock_follows,
+        mock_user_exists,
+        mock_is_subscribed,
+        mock_movement_exists,
+        mock_swap_leader,
+    ):
+        pools = mock.Mock()
+        pools.swap.side_effect = SwapConflict()
+        self.app.extensions["candidate_pools"] = pools
+
+        with self.app_context():
+            response = self.send_request(self.u_id, self.l_id, self.m_id)
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers["Retry-After"], "1")
+
+        mock_swap_leader.assert_not_called()
+
     @mock.patch("gridt_server.resources.leader.swap_leader")
     @mock.patch("gridt_server.schemas.movement_exists", return_value=False)
     def test_swap_leader_movement_nonexistant(
@@ -1,7 +1,11 @@
 from unittest import skip
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
+from sqlalchemy.exc import IntegrityError
+
+from gridt_server.store import MemoryStore
 from gridt_server.tests.base_test import BaseTest
+from gridt_server.throttle import SignalThrottle
 from gridt.exc import UserNotAdmin
 
 
@@ -60,8 +64,25 @@ class MovementsTest(BaseTest):
 
         mock_get_all_movements.assert_called_once_with(self.user_id)
 
-    @patch(f"{resource_path}.new_movement_by_user")
-    @patch(f"{schema_path}.movement_name_exists", return_value=True)
+    @patch(f"{resource_path}.get_all_movements")
+    def test_get_movements_reader(self, mock_get_all_movements):
+        reader = Mock()
+        reader.all.return_value = self.mock_query_results
+        self.app.extensions["movement_reader"] = reader
+
+        with self.app_context():
+            response = self.send_get_movements(self.user_id)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_json(), self.mock_query_results)
+
+        reader.all.assert_called_once_with(self.user_id)
+        mock_get_all_movements.assert_not_called()
+
+    @patch(
+        f"{resource_path}.new_movement_by_user",
+        side_effect=IntegrityError("INSERT", {}, Exception("Duplicate entry")),
+    )
+    @patch(f"{resource_path}.movement_name_exists", return_value=True)
     def test_post_name_exists(self, mock_name_exists, mock_new_movement):
         body = {
             "name": "movement",
@@ -76,10 +97,28 @@ class MovementsTest(BaseTest):
             self.assertEqual(response.get_json()["message"], expect_message)
 
         mock_name_exists.assert_called_once_with(body["name"])
-        mock_new_movement.assert_not_called()
+        mock_new_movement.assert_called_once()
+
+    @patch(
+        f"{resource_path}.new_movement_by_user",
+        side_effect=IntegrityError("INSERT", {}, Exception("Other constraint")),
+    )
+    @patch(f"{resource_path}.movement_name_exists", return_value=False)
+    def test_post_other_integrity_error(self, mock_name_exists, mock_new_movement):
+        body = {
+            "name": "movement",
+            "short_description": "testing post request",
+            "interval": "daily"
+        }
+
+        with self.app_context():
+            with self.assertRaises(IntegrityError):
+                self.send_add_movement(self.user_id, body)
+
+        mock_name_exists.assert_called_once_with(body["name"])
 
     @patch(f"{resource_path}.new_movement_by_user")
-    @patch(f"{schema_path}.movement_name_exists", return_value=False)
+    @patch(f"{resource_path}.movement_name_exists")
     def test_interval_empty(self, mock_name_exists, mock_new_movement):
         body = {
             "name": "movement",
@@ -92,7 +131,7 @@ class MovementsTest(BaseTest):
             self.assertEqual(response.status_code, 400)
             self.assertEqual(response.get_json()["message"], expect_message)
 
-        mock_name_exists.assert_called_once_with(body["name"])
+        mock_name_exists.assert_not_called()
         mock_new_movement.assert_not_called()
 
     @skip
@@ -100,7 +139,7 @@ class MovementsTest(BaseTest):
         pass
 
     @patch(f"{resource_path}.new_movement_by_user")
-    @patch(f"{schema_path}.movement_name_exists", return_value=False)
+    @patch(f"{resource_path}.movement_name_exists")
     def test_post_successful(self, mock_name_exists, mock_new_movement):
         body = {
             "name": "movement",
@@ -114,7 +153,7 @@ class MovementsTest(BaseTest):
             self.assertEqual(response.status_code, 201)
             self.assertEqual(response.get_json()["message"], expect_message)
 
-        mock_name_exists.assert_called_once_with(body["name"])
+        mock_name_exists.assert_not_called()
         mock_new_movement.assert_called_once_with(
             user_id=self.user_id,
             name=body['name'],
@@ -124,7 +163,7 @@ class MovementsTest(BaseTest):
         )
 
     @patch(f"{resource_path}.new_movement_by_user", side_effect=UserNotAdmin)
-    @patch(f"{schema_path}.movement_name_exists", return_value=False)
+    @patch(f"{resource_path}.movement_name_exists")
     def test_post_non_admin(self, mock_name_exists, mock_new_movement):
         body = {
             "name": "movement",
@@ -138,7 +177,7 @@ class MovementsTest(BaseTest):
             self.assertEqual(response.status_code, 403)
             self.assertEqual(response.get_json()["message"], expect_message)
 
-        mock_name_exists.assert_called_once_with(body["name"])
+        mock_name_exists.assert_not_called()
         mock_new_movement.assert_called_once_with(
             user_id=self.user_id,
             name=body['name'],
@@ -174,6 +213,22 @@ class MovementsTest(BaseTest):
         mock_movement_exists.assert_called_once_with(movement_id)
         mock_get_movement.assert_called_once_with(movement_id, self.user_id)
 
+    @patch(f"{resource_path}.get_movement")
+    @patch(f"{schema_path}.movement_exists", return_value=True)
+    def test_single_movement_reader(self, mock_movement_exists, mock_get_movement):
+        reader = Mock()
+        reader.one.return_value = self.mock_movement
+        self.app.extensions["movement_reader"] = reader
+        movement_id = self.mock_movement["id"]
+
+        with self.app_context():
+            response = self.send_get_movement(self.user_id, movement_id)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_json(), self.mock_movement)
+
+        reader.one.assert_called_once_with(movement_id, self.user_id)
+        mock_get_movement.assert_not_called()
+
     @patch(
         f'{resource_path}.get_movement',
         return_value=mock_movement
@@ -218,7 +273,7 @@ class SubscribeTest(BaseTest):
         return response
 
     @patch(f'{resource_path}.new_subscription')
-    @patch(f'{resource_path}.is_subscribed', return_value=False)
+    @patch(f'{schema_path}.is_subscribed')
     @patch(f'{schema_path}.movement_exists', return_value=True)
     def test_subscribe(
         self, mock_movement_exists, mock_is_subscribed, mock_new_subscription
@@ -230,15 +285,13 @@ class SubscribeTest(BaseTest):
             self.assertEqual(response.get_json(), expected)
 
         mock_movement_exists.assert_called_once_with(self.movement_id)
-        mock_is_subscribed.assert_called_once_with(
-            self.user_id, self.movement_id
-        )
+        mock_is_subscribed.assert_not_called()
         mock_new_subscription.assert_called_once_with(
             self.user_id, self.movement_id
         )
 
     @patch(f'{resource_path}.new_subscription')
-    @patch(f'{resource_path}.is_subscribed', return_value=False)
+    @patch(f'{schema_path}.is_subscribed', return_value=False)
     @patch(f'{schema_path}.movement_exists', return_value=False)
     def test_subscribe_nonexisting_movement(
         self, mock_movement_exists, mock_is_subscribed, mock_new_subscription
@@ -253,8 +306,11 @@ class SubscribeTest(BaseTest):
         mock_is_subscribed.assert_not_called()
         mock_new_subscription.assert_not_called()
 
-    @patch(f'{resource_path}.new_subscription')
-    @patch(f'{resource_path}.is_subscribed', return_value=True)
+    @patch(
+        f'{resource_path}.new_subscription',
+        side_effect=IntegrityError("INSERT", {}, Exception("Duplicate entry")),
+    )
+    @patch(f'{schema_path}.is_subscribed', return_value=True)
     @patch(f'{schema_path}.movement_exists', return_value=True)
     def test_already_subscribed(
         self, mock_movement_exists, mock_is_subscribed, mock_new_subscription
@@ -266,13 +322,28 @@ class SubscribeTest(BaseTest):
             self.assertEqual(response.get_json(), expected)
 
         mock_movement_exists.assert_called_once_with(self.movement_id)
-        mock_is_subscribed.assert_called_once_with(
+        mock_is_subscribed.assert_called_once_with(self.user_id, self.movement_id)
+        mock_new_subscription.assert_called_once_with(
             self.user_id, self.movement_id
         )
-        mock_new_subscription.assert_not_called()
+
+    @patch(
+        f'{resource_path}.new_subscription',
+        side_effect=IntegrityError("INSERT", {}, Exception("Foreign key")),
+    )
+    @patch(f'{schema_path}.is_subscribed', return_value=False)
+    @patch(f'{schema_path}.movement_exists', return_value=True)
+    def test_subscribe_other_integrity_error(
+        self, mock_movement_exists, mock_is_subscribed, mock_new_subscription
+    ):
+        with self.app_context():
+            with self.assertRaises(IntegrityError):
+                self.send_subscribe(self.user_id, self.movement_id)
+
+        mock_is_subscribed.assert_called_once_with(self.user_id, self.movement_id)
 
     @patch(f'{resource_path}.remove_subscription')
-    @patch(f'{resource_path}.is_subscribed', return_value=True)
+    @patch(f'{schema_path}.is_subscribed', return_value=True)
     @patch(f'{schema_path}.movement_exists', return_value=True)
     def test_unsubscribe(
         self,
@@ -294,6 +365,31 @@ class SubscribeTest(BaseTest):
             self.user_id, self.movement_id
         )
 
+    @patch(f'{resource_path}.remove_subscription')
+    @patch(f'{schema_path}.is_subscribed', return_value=True)
+    @patch(f'{schema_path}.movement_exists', return_value=True)
+    def test_unsubscribe_subscription_index_miss(
+        self,
+        mock_movement_exists,
+        mock_is_subscribed,
+        mock_remove_subscription
+    ):
+        # Subscribed through another worker that the index has not seen yet.
+        index = Mock()
+        index.contains.return_value = False
+        self.app.extensions["subscription_index"] = index
+        with self.app_context():
+            response = self.send_unsubscribe(self.user_id, self.movement_id)
+            self.assertEqual(response.status_code, 200)
+
+        index.contains.assert_called_once_with(self.user_id, self.movement_id)
+        mock_is_subscribed.assert_called_once_with(
+            self.user_id, self.movement_id
+        )
+        mock_remove_subscription.assert_called_once_with(
+            self.user_id, self.movement_id
+        )
+
     @patch(f'{resource_path}.remove_subscription')
     @patch(f'{schema_path}.movement_exists', return_value=False)
     def test_unsubscribe_nonexisting_movement(
@@ -400,6 +496,83 @@ class NewSignalTest(BaseTest):
         mock_is_sub.assert_called_once_with(self.user_id, self.movement_id)
         mock_send_signal.assert_not_called()
 
+    def install_throttle(self, mode):
+        throttle = SignalThrottle(MemoryStore(), engine=None, mode=mode)
+        throttle._gaps[self.movement_id] = 60
+        throttle.last_signal = Mock(return_value=None)
+        self.app.extensions["signal_throttle"] = throttle
+
+    @patch(f"{resource_path}.send_signal")
+    @patch(f"{schema_path}.movement_exists", return_value=True)
+    @patch(f"{schema_path}.user_exists", return_value=True)
+    @patch(f"{schema_path}.is_subscribed", return_value=True)
+    def test_signal_throttled(
+        self,
+        mock_is_sub,
+        mock_user_exists,
+        mock_movement_exists,
+        mock_send_signal
+    ):
+        self.install_throttle("reject")
+        expected = {"message": "Signal sent too soon after the previous one."}
+        with self.app_context():
+            first = self.send_request(self.user_id, self.movement_id, self.message)
+            second = self.send_request(self.user_id, self.movement_id, self.message)
+            other = self.send_request(43, self.movement_id, self.message)
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 429)
+        self.assertEqual(second.get_json(), expected)
+        self.assertEqual(second.headers["Retry-After"], "60")
+        self.assertEqual(other.status_code, 201)
+        self.assertEqual(mock_send_signal.call_count, 2)
+
+    @patch(f"{resource_path}.send_signal")
+    @patch(f"{schema_path}.movement_exists", return_value=True)
+    @patch(f"{schema_path}.user_exists", return_value=True)
+    @patch(f"{schema_path}.is_subscribed", return_value=True)
+    def test_signal_coalesced(
+        self,
+        mock_is_sub,
+        mock_user_exists,
+        mock_movement_exists,
+        mock_send_signal
+    ):
+        self.install_throttle("coalesce")
+        expected = {
+            "message": "Signal coalesced with the previous signal.",
+            "coalesced": True,
+        }
+        with self.app_context():
+            self.send_request(self.user_id, self.movement_id, self.message)
+            response = self.send_request(self.user_id, self.movement_id, self.message)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.get_json(), expected)
+        mock_send_signal.assert_called_once_with(
+            self.user_id, self.movement_id, self.message
+        )
+
+    @patch(f"{resource_path}.send_signal", side_effect=[RuntimeError, None])
+    @patch(f"{schema_path}.movement_exists", return_value=True)
+    @patch(f"{schema_path}.user_exists", return_value=True)
+    @patch(f"{schema_path}.is_subscribed", return_value=True)
+    def test_failed_signal_not_throttled(
+        self,
+        mock_is_sub,
+        mock_user_exists,
+        mock_movement_exists,
+        mock_send_signal
+    ):
+        self.install_throttle("reject")
+        with self.app_context():
+            with self.assertRaises(RuntimeError):
+                self.send_request(self.user_id, self.movement_id, self.message)
+            response = self.send_request(self.user_id, self.movement_id, self.message)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(mock_send_signal.call_count, 2)
+
 
 class SubscriptionsResourceTest(BaseTest):
     resource_path = 'gridt_server.resources.movements'
@@ -1,6 +1,10 @@
 from unittest.mock import patch
 
-from gridt_server.tests.base_test import BaseTest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+
+from gridt_server.resources.register import email_in_use
+from gridt_server.tests.base_test import BaseTest, create_schema
 
 
 class RegistrationResourceTest(BaseTest):
@@ -35,6 +39,46 @@ class RegistrationResourceTest(BaseTest):
             self.username, self.email, self.password, False
         )
 
+    @patch(f"{resource_path}.email_in_use", return_value=True)
+    @patch(
+        f"{resource_path}.register",
+        side_effect=IntegrityError("INSERT", {}, Exception("Duplicate entry")),
+    )
+    def test_registration_email_in_use(self, mock_register, mock_email_in_use):
+        with self.app_context():
+            response = self.send_register_request()
+            self.assertEqual(response.status_code, 400)
+            expected_message = "email: E-mail address already in use."
+            self.assertEqual(response.get_json()['message'], expected_message)
+
+        mock_register.assert_called_once()
+        mock_email_in_use.assert_called_once_with(self.email)
+
+    @patch(f"{resource_path}.email_in_use", return_value=False)
+    @patch(
+        f"{resource_path}.register",
+        side_effect=IntegrityError("INSERT", {}, Exception("Duplicate entry")),
+    )
+    def test_registration_other_integrity_error(self, mock_register, mock_email_in_use):
+        with self.app_context():
+            with self.assertRaises(IntegrityError):
+                self.send_register_request()
+
+        mock_email_in_use.assert_called_once_with(self.email)
+
+    def test_email_in_use(self):
+        engine = create_engine("sqlite://")
+        create_schema(
+            engine,
+            "INSERT INTO users (id, username, email) "
+            f"VALUES (1, 'robin', '{self.email}')",
+        )
+        self.app.extensions["engine"] = engine
+
+        with self.app_context():
+            self.assertTrue(email_in_use(self.email))
+            self.assertFalse(email_in_use("sam@gridt.org"))
+
     @patch(f"{resource_path}.register")
     def test_registration_admin_user_correct(self, mock_register):
         self.app.config['ADMIN_KEY'] = 'correct_key'
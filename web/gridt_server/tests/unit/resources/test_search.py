@@ -0,0 +1,52 @@
+"""Unittests for the movement search endpoint."""
+
+from unittest.mock import patch
+
+from gridt_server.search import MovementSearch
+from gridt_server.tests.base_test import BaseTest
+
+
+class MovementSearchResourceTest(BaseTest):
+    """Unittests for GETs to: /movements/search."""
+
+    user_id = 42
+    results = [
+        {
+            "id": 1,
+            "name": "Flossing",
+            "short_description": "Floss.",
+            "interval": "daily",
+        }
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.search = MovementSearch(engine=None, store=None)
+        self.app.extensions["movement_search"] = self.search
+
+    def send_search_request(self, **params):
+        return self.client.get(
+            "/movements/search",
+            query_string=params,
+            headers={"Authorization": self.obtain_token_header(self.user_id)},
+        )
+
+    def test_search(self):
+        with patch.object(self.search, "search", return_value=self.results) as search:
+            with self.app_context():
+                response = self.send_search_request(q="floss", limit=5)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), self.results)
+        search.assert_called_once_with("floss", limit=5, offset=0)
+
+    def test_missing_query(self):
+        with patch.object(self.search, "search") as search:
+            with self.app_context():
+                response = self.send_search_request(limit=5)
+        self.assertEqual(response.status_code, 400)
+        search.assert_not_called()
+
+    def test_invalid_limit(self):
+        with self.app_context():
+            response = self.send_search_request(q="floss", limit=0)
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,86 @@
+"""Unittests for the movement activity statistics endpoint."""
+
+from datetime import datetime
+from unittest.mock import patch
+
+from gridt_server.rollups import ActivityStats
+from gridt_server.tests.base_test import BaseTest
+
+
+class MovementStatsResourceTest(BaseTest):
+    """Unittests for GETs to: /movements/<id>/stats."""
+
+    schema_path = "gridt_server.schemas"
+    user_id = 42
+    movement_id = 1
+
+    def setUp(self):
+        super().setUp()
+        self.stats = ActivityStats(engine=None, max_buckets=48)
+        self.app.extensions["activity_stats"] = self.stats
+
+    def send_stats_request(self, **params):
+        return self.client.get(
+            f"/movements/{self.movement_id}/stats",
+            query_string=params,
+            headers={"Authorization": self.obtain_token_header(self.user_id)},
+        )
+
+    @patch(f"{schema_path}.movement_exists", return_value=True)
+    def test_get_stats(self, mock_movement_exists):
+        with patch.object(
+            self.stats, "activity", return_value={"buckets": []}
+        ) as activity:
+            with self.app_context():
+                response = self.send_stats_request(
+                    granularity="hour",
+                    **{
+                        "from": "2021-01-01T12:00:00+01:00",
+                        "to": "2021-01-01T13:00:00",
+                    },
+                )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {"buckets": []})
+        activity.assert_called_once_with(
+            self.movement_id, "hour", datetime(2021, 1, 1, 11), datetime(2021, 1, 1, 13)
+        )
+
+    @patch(f"{schema_path}.movement_exists", return_value=True)
+    def test_default_range(self, mock_movement_exists):
+        with patch.object(self.stats, "activity", return_value={}) as activity:
+            with self.app_context():
+                response = self.send_stats_request()
+        self.assertEqual(response.status_code, 200)
+        _, granularity, start, end = activity.call_args[0]
+        self.assertEqual(granularity, "day")
+        self.assertEqual((end - start).days, 30)
+
+    @patch(f"{schema_path}.movement_exists", return_value=True)
+    def test_invalid_range(self, mock_movement_exists):
+        with patch.object(self.stats, "activity") as activity:
+            with self.app_context():
+                too_long = self.send_stats_request(
+                    granularity="hour",
+                    **{"from": "2021-01-01T00:00:00", "to": "2021-01-03T01:00:00"},
+                )
+                reversed_range = self.send_stats_request(
+                    **{"from": "2021-01-02T00:00:00", "to": "2021-01-01T00:00:00"},
+                )
+                granularity = self.send_stats_request(granularity="minute")
+        self.assertEqual(too_long.status_code, 400)
+        self.assertEqual(
+            too_long.get_json(), {"message": "from: Range is longer than 48 buckets."}
+        )
+        self.assertEqual(reversed_range.status_code, 400)
+        self.assertEqual(granularity.status_code, 400)
+        activity.assert_not_called()
+
+    @patch(f"{schema_path}.movement_exists", return_value=False)
+    def test_no_movement(self, mock_movement_exists):
+        with self.app_context():
+            response = self.send_stats_request()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.get_json(),
+            {"message": "movement_id: No movement found for that id."},
+        )
@@ -0,0 +1,171 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from flask import Flask
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+from gridt_server.adjacency import (
+    AdjacencyIndex,
+    MovementGraph,
+    install_adjacency_index,
+)
+from gridt_server.edges import Edges
+from gridt_server.events import emit
+from gridt_server.store import MemoryStore, install_store
+from gridt_server.tests.base_test import create_schema
+
+
+class MovementGraphTest(TestCase):
+    def test_add_remove(self):
+        graph = MovementGraph([(1, 2), (1, 3), (4, 2)])
+        graph.add(1, 2)
+        graph.remove(4, 2)
+        graph.remove(4, 5)
+
+        self.assertEqual(list(graph.leaders[1]), [2, 3])
+        self.assertEqual(list(graph.followers[2]), [1])
+        self.assertNotIn(4, graph.leaders)
+
+    def test_apply(self):
+        graph = MovementGraph([(1, 2)])
+        graph.apply("-1:2")
+        graph.apply("+1:5")
+
+        self.assertEqual(list(graph.leaders[1]), [5])
+        self.assertEqual(list(graph.followers[5]), [1])
+        self.assertNotIn(2, graph.followers)
+
+
+class AdjacencyIndexTest(TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        create_schema(
+            self.engine,
+            "INSERT INTO movement_user_association (movement_id, follower_id, "
+            "leader_id) VALUES (1, 1, 2), (1, 1, 3), (1, 2, 1), (2, 1, 4)",
+        )
+        self.store = MemoryStore()
+        # Two workers that share the store.
+        self.index = AdjacencyIndex(self.engine, self.store, check_interval=0)
+        self.other = AdjacencyIndex(self.engine, self.store, check_interval=0)
+
+    def execute(self, *statements):
+        with self.engine.begin() as connection:
+            for statement in statements:
+                connection.execute(text(statement))
+
+    def test_lookups(self):
+        self.assertTrue(self.index.follows(1, 1, 2))
+        self.assertFalse(self.index.follows(1, 1, 4))
+        self.assertTrue(self.index.follows(1, 2, 4))
+        self.assertEqual(self.index.leaders(1, 1), [2, 3])
+        self.assertEqual(self.index.followers(1, 1), [2])
+
+    def test_memory_reads(self):
+        self.index.follows(1, 1, 2)
+        with patch.object(self.engine, "connect", side_effect=AssertionError):
+            self.assertTrue(self.index.follows(1, 1, 3))
+            self.assertEqual(self.index.followers(2, 1), [1])
+
+    def test_swap_reaches_other_workers(self):
+        self.index.graph(1)
+        self.other.graph(1)
+
+        self.execute(
+            "UPDATE movement_user_association SET destroyed = '2021-01-01' "
+            "WHERE follower_id = 1 AND leader_id = 2",
+            "INSERT INTO movement_user_association (movement_id, follower_id, "
+            "leader_id) VALUES (1, 1, 5)",
+        )
+        self.index.swapped(1, 1, 2, 5)
+
+        for index in (self.index, self.other):
+            self.assertEqual(index.leaders(1, 1), [3, 5])
+            self.assertEqual(index.followers(2, 1), [])
+
+    def test_invalidate(self):
+        self.other.graph(1)
+        self.execute(
+            "INSERT INTO movement_user_association (movement_id, follower_id, "
+            "leader_id) VALUES (1, 6, 1)",
+        )
+        self.index.changed(6, 1)
+
+        self.assertEqual(self.other.followers(1, 1), [2, 6])
+
+    def test_changed_edges(self):
+        self.index.graph(1)
+        self.other.graph(1)
+        self.index.changed(6, 1, Edges(created=[(6, 1), (2, 6)], destroyed=[(2, 1)]))
+
+        with patch.object(self.engine, "connect", side_effect=AssertionError):
+            for index in (self.index, self.other):
+                self.assertEqual(index.followers(1, 1), [6])
+                self.assertEqual(index.leaders(2, 1), [6])
+        self.assertIsNone(self.store.get(AdjacencyIndex.epoch_key(1)))
+
+    def test_unknown_new_leader(self):
+        self.other.graph(1)
+        self.execute(
+            "UPDATE movement_user_association SET leader_id = 7 "
+            "WHERE follower_id = 1 AND leader_id = 2",
+        )
+        self.index.swapped(1, 1, 2, None)
+
+        self.assertEqual(sorted(self.other.leaders(1, 1)), [3, 7])
+
+    def test_log_limit(self):
+        self.index.log_limit = 2
+        self.other.graph(1)
+        self.index.swapped(1, 1, 2, 5)
+        self.assertEqual(self.store.get(AdjacencyIndex.epoch_key(1)), None)
+        self.index.swapped(1, 1, 5, 2)
+
+        self.assertEqual(self.store.get(AdjacencyIndex.epoch_key(1)), 1)
+        self.assertEqual(self.other.leaders(1, 1), [2, 3])
+
+    def test_check_interval(self):
+        self.other.check_interval = 60
+        self.other.graph(1)
+        self.index.swapped(1, 1, 2, 5)
+
+        self.assertTrue(self.other.follows(1, 1, 2))
+
+    def test_footprint(self):
+        self.index.graph(1)
+
+        self.assertGreater(
+            REGISTRY.get_sample_value("adjacency_index_bytes", {"movement": "1"}), 0
+        )
+        self.assertEqual(self.index.stats()["movements"], 1)
+
+
+class InstallAdjacencyIndexTest(TestCase):
+    def test_events(self):
+        app = Flask(__name__)
+        app.config["ADJACENCY_INDEX"] = True
+        install_store(app)
+        index = install_adjacency_index(app, engine=None)
+
+        with patch.object(index, "invalidate") as invalidate, patch.object(
+            index, "log"
+        ) as log, app.app_context():
+            emit("subscribe", 1, 2)
+            emit("unsubscribe", 1, 5, Edges(created=[], destroyed=[(1, 6)]))
+            emit("swap", 1, 3, 4, None)
+
+        self.assertEqual(
+            [call.args for call in invalidate.call_args_list], [(2,), (3,)]
+        )
+        log.assert_called_once_with(5, ["-1:6"])
+        self.assertIn("adjacency_index", app.extensions["readiness_checks"])
+
+    def test_memory_store_with_workers(self):
+        app = Flask(__name__)
+        app.config["ADJACENCY_INDEX"] = True
+        install_store(app)
+
+        with patch.dict("os.environ", {"WEB_CONCURRENCY": "2"}):
+            with self.assertRaises(RuntimeError):
+                install_adjacency_index(app, engine=None)
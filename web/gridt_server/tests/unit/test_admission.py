@@ -0,0 +1,83 @@
+import time
+from unittest import TestCase
+
+from flask import Flask
+from prometheus_client import REGISTRY
+
+from gridt_server.admission import (
+    AdmissionController,
+    install_admission_control,
+    queue_wait,
+)
+
+
+class AdmissionControlTest(TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["ADMISSION_CONTROL"] = True
+        self.app.config["ADMISSION_PRIORITIES"] = {"signal": "critical", "data": "bulk"}
+        self.app.config["ADMISSION_MAX_QUEUE_WAIT"] = {
+            "bulk": 0.5,
+            "normal": 2,
+            "critical": 5,
+        }
+        install_admission_control(self.app)
+
+        @self.app.route("/signal")
+        def signal():
+            return "signal"
+
+        @self.app.route("/data")
+        def data():
+            return "data"
+
+        self.client = self.app.test_client()
+
+    def get(self, path, waited):
+        return self.client.get(
+            path, headers={"X-Request-Start": f"t={time.time() - waited:.3f}"}
+        )
+
+    def shed(self, endpoint, priority):
+        return (
+            REGISTRY.get_sample_value(
+                "requests_shed_total",
+                {"endpoint": endpoint, "priority": priority, "reason": "queue_wait"},
+            )
+            or 0
+        )
+
+    def test_bulk_shed_before_critical(self):
+        before = self.shed("data", "bulk")
+
+        data = self.get("/data", waited=1.2)
+        signal = self.get("/signal", waited=1.2)
+
+        self.assertEqual(data.status_code, 503)
+        self.assertEqual(data.headers["Retry-After"], "2")
+        self.assertEqual(signal.status_code, 200)
+        self.assertEqual(self.shed("data", "bulk"), before + 1)
+
+    def test_no_header(self):
+        self.assertEqual(self.client.get("/data").status_code, 200)
+
+    def test_in_flight_released(self):
+        self.get("/data", waited=0)
+        self.get("/data", waited=10)
+        self.assertEqual(self.app.extensions["admission_controller"].in_flight, 0)
+
+    def test_max_in_flight(self):
+        controller = AdmissionController({}, {}, {"normal": 1})
+        self.assertIsNone(controller.admit("normal", 0))
+        self.assertEqual(controller.admit("normal", 0), "in_flight")
+        controller.release()
+        self.assertIsNone(controller.admit("normal", 0))
+
+    def test_queue_wait(self):
+        now = 1000000000.5
+        self.assertEqual(queue_wait("t=1000000000.0", now), 0.5)
+        self.assertEqual(queue_wait("t=1000000000000", now), 0.5)
+        self.assertEqual(queue_wait("t=1000000000000000", now), 0.5)
+        self.assertEqual(queue_wait("garbage", now), 0)
+        self.assertEqual(queue_wait(None, now), 0)
+        self.assertEqual(queue_wait("t=1000000001", now), 0)
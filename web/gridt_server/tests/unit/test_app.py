@@ -1,10 +1,15 @@
 import os
+import tempfile
 from unittest import TestCase
 from unittest.mock import patch
-from flask import Config
+from flask import Config, Flask
+from flask_jwt_extended import create_access_token
+from sqlalchemy import create_engine, inspect
+from alembic import command
 
 from util.nostderr import nostderr
-from gridt_server.app import create_app
+from gridt_server.app import create_app, prepare_schema
+from gridt_server.migrations import alembic_config, schema_is_current
 
 
 class AppTest(TestCase):
@@ -16,3 +21,72 @@ class AppTest(TestCase):
                 mocked_fun.assert_called_with(
                     os.getcwd() + "/gridt/conf/test_conf.conf"
                 )
+
+
+class PrepareSchemaTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.url = f"sqlite:///{self.tmpdir.name}/gridt.db"
+        self.engine = create_engine(self.url)
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = self.url
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def test_unmigrated_database(self):
+        with nostderr():
+            with self.assertRaises(SystemExit):
+                prepare_schema(self.app, self.engine)
+
+    def test_migrated_database(self):
+        command.upgrade(alembic_config(self.url), "head")
+        prepare_schema(self.app, self.engine)
+        self.assertTrue(schema_is_current(self.engine))
+
+    def test_auto_create_schema(self):
+        self.app.config["AUTO_CREATE_SCHEMA"] = True
+        prepare_schema(self.app, self.engine)
+        self.assertTrue(schema_is_current(self.engine))
+        tables = inspect(self.engine).get_table_names()
+        for table in ("users", "movement_stats", "signal_rollups", "signals_archive"):
+            self.assertIn(table, tables)
+
+    def test_auto_create_in_memory(self):
+        # The migrations have to run on the connection of the app, an
+        # in-memory database is gone as soon as that is closed.
+        engine = create_engine("sqlite://")
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+        self.app.config["AUTO_CREATE_SCHEMA"] = True
+        prepare_schema(self.app, engine)
+        self.assertTrue(schema_is_current(engine))
+        self.assertIn("movement_stats", inspect(engine).get_table_names())
+
+
+class CreateAppTest(TestCase):
+    """Requests to an app from ``create_app`` with the test conf file."""
+
+    def setUp(self):
+        self.app = create_app("conf/test.conf")
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            token = create_access_token(1)
+        self.headers = {"Authorization": f"JWT {token}"}
+
+    @patch("gridt_server.resources.movements.send_signal")
+    @patch("gridt_server.schemas.movement_exists", return_value=True)
+    @patch("gridt_server.schemas.user_exists", return_value=True)
+    @patch("gridt_server.schemas.is_subscribed", return_value=True)
+    def test_signal(self, *mocks):
+        # The listeners of the signal event read the tables of the migrations.
+        response = self.client.post(
+            "/movements/1/signal", headers=self.headers, json={"message": "Done"}
+        )
+        self.assertEqual(response.status_code, 201)
+
+    @patch("gridt_server.resources.movements.new_subscription")
+    @patch("gridt_server.schemas.movement_exists", return_value=True)
+    def test_subscribe(self, *mocks):
+        response = self.client.put("/movements/1/subscriber", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
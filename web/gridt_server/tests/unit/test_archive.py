@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+from unittest import TestCase
+from unittest.mock import patch
+
+from flask import Flask
+from sqlalchemy import create_engine, event, select
+
+from gridt_server.archive import SignalArchiver, create_archiver
+from gridt_server.tables import signals, signals_archive
+from gridt_server.tests.base_test import create_schema
+
+NOW = datetime(2021, 6, 1)
+
+
+class SignalArchiverTest(TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        create_schema(self.engine)
+        # Leader 1 signalled every day of May, leader 2 twice in January.
+        rows = [(1, 1, datetime(2021, 5, 1) + timedelta(days=day)) for day in range(31)]
+        rows[10:10] = [(2, 1, datetime(2021, 1, 1)), (2, 1, datetime(2021, 1, 2))]
+        with self.engine.begin() as connection:
+            connection.execute(
+                signals.insert(),
+                [
+                    {
+                        "id": index + 1,
+                        "leader_id": leader_id,
+                        "movement_id": movement_id,
+                        "time_stamp": time_stamp,
+                        "message": f"Signal {index + 1}",
+                    }
+                    for index, (leader_id, movement_id, time_stamp) in enumerate(rows)
+                ],
+            )
+        self.archiver = SignalArchiver(
+            self.engine, retention_days=10, keep=3, batch_size=4, pause=0
+        )
+
+    def ids(self, table):
+        with self.engine.connect() as connection:
+            return (
+                connection.execute(select(table.c.id).order_by(table.c.id))
+                .scalars()
+                .all()
+            )
+
+    def test_run(self):
+        self.assertEqual(self.archiver.run(now=NOW), 21)
+
+        archived = self.ids(signals_archive)
+        self.assertEqual(len(archived), 21)
+        # Everything of the last 10 days stays, and both signals of leader 2
+        # stay because they are among the newest 3 of that leader.
+        self.assertNotIn(11, archived)
+        self.assertNotIn(12, archived)
+        self.assertEqual(len(self.ids(signals)), 12)
+        self.assertEqual(set(archived) & set(self.ids(signals)), set())
+
+        self.assertEqual(self.archiver.run(now=NOW), 0)
+
+    def test_stop(self):
+        class Stop:
+            calls = 0
+
+            def is_set(self):
+                self.calls += 1
+                return self.calls > 1
+
+        self.assertEqual(self.archiver.run(now=NOW, stop=Stop()), 4)
+
+    def test_history(self):
+        self.archiver.run(now=NOW)
+
+        with patch("gridt_server.archive.utcnow", return_value=NOW):
+            recent = self.archiver.history(1, 1, start=datetime(2021, 5, 25), limit=3)
+            everything = self.archiver.history(1, 1, limit=100)
+            old = self.archiver.history(
+                1, 1, start=datetime(2021, 5, 1), end=datetime(2021, 5, 3)
+            )
+
+        self.assertEqual(
+            [signal["time_stamp"] for signal in recent],
+            [
+                "2021-05-31T00:00:00+00:00",
+                "2021-05-30T00:00:00+00:00",
+                "2021-05-29T00:00:00+00:00",
+            ],
+        )
+        self.assertEqual(len(everything), 31)
+        self.assertEqual(everything[-1]["message"], "Signal 1")
+        self.assertEqual(
+            [signal["message"] for signal in old], ["Signal 2", "Signal 1"]
+        )
+
+    def test_history_reads_archive_last(self):
+        self.archiver.run(now=NOW)
+        statements = []
+        event.listen(
+            self.engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement),
+        )
+
+        with patch("gridt_server.archive.utcnow", return_value=NOW):
+            self.archiver.history(1, 1, limit=5)
+            self.assertFalse(any("signals_archive" in sql for sql in statements))
+
+            history = self.archiver.history(1, 1, limit=12)
+            self.assertTrue(any("signals_archive" in sql for sql in statements))
+        self.assertEqual(
+            [signal["message"] for signal in history[9:]],
+            ["Signal 24", "Signal 23", "Signal 22"],
+        )
+
+    def test_keep_at_least_one(self):
+        app = Flask(__name__)
+        app.config["ARCHIVE_KEEP_PER_LEADER"] = 0
+        with self.assertRaises(ValueError):
+            create_archiver(app, self.engine)
@@ -0,0 +1,48 @@
+import random
+from array import array
+from unittest import TestCase
+
+from gridt_server.bitmap import ARRAY_MAX, RoaringBitmap
+
+
+class RoaringBitmapTest(TestCase):
+    def test_small(self):
+        bitmap = RoaringBitmap([5, 3, 70000, 3])
+        bitmap.discard(4)
+        bitmap.discard(70000)
+
+        self.assertEqual(list(bitmap), [3, 5])
+        self.assertEqual(len(bitmap), 2)
+        self.assertIn(3, bitmap)
+        self.assertNotIn(70000, bitmap)
+        self.assertEqual(list(bitmap.containers), [0])
+
+    def test_containers(self):
+        bitmap = RoaringBitmap(range(0, 2 * (ARRAY_MAX + 1), 2))
+        self.assertIsInstance(bitmap.containers[0], bytearray)
+
+        bitmap.discard(0)
+        bitmap.discard(2)
+        self.assertIsInstance(bitmap.containers[0], array)
+        self.assertEqual(list(bitmap), list(range(4, 2 * (ARRAY_MAX + 1), 2)))
+
+    def test_matches_set(self):
+        rand = random.Random(0)
+        bitmap = RoaringBitmap()
+        values = set()
+        for _ in range(30000):
+            value = rand.choice([rand.randrange(10000), rand.randrange(1 << 20)])
+            if rand.random() < 0.7:
+                bitmap.add(value)
+                values.add(value)
+            else:
+                bitmap.discard(value)
+                values.discard(value)
+
+        self.assertEqual(list(bitmap), sorted(values))
+        self.assertEqual(len(bitmap), len(values))
+        for value in range(0, 20000, 3):
+            self.assertEqual(value in bitmap, value in values)
+
+    def test_compact(self):
+        self.assertLess(RoaringBitmap(range(20)).nbytes(), 400)
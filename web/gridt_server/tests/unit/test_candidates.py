@@ -0,0 +1,282 @@
+import os
+import random
+import tempfile
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, insert, select, text
+from sqlalchemy.exc import OperationalError
+
+from gridt_server.candidates import (
+    RETRY,
+    CandidatePool,
+    CandidatePools,
+    SwapConflict,
+    is_lock_conflict,
+)
+from gridt_server.tables import followers
+from gridt_server.tests.base_test import create_schema
+
+
+def retries(reason):
+    return (
+        REGISTRY.get_sample_value("leader_swap_retries_total", {"reason": reason}) or 0
+    )
+
+
+class CandidatePoolTest(TestCase):
+    def test_add_remove(self):
+        pool = CandidatePool([1, 2, 3])
+        pool.add(4)
+        pool.add(4)
+        pool.remove(1)
+        pool.remove(5)
+
+        self.assertEqual(sorted(pool.members), [2, 3, 4])
+        self.assertEqual(len(pool), 3)
+        for member in (2, 3, 4):
+            self.assertEqual(pool.members[pool.positions[member]], member)
+
+    def test_pick(self):
+        pool = CandidatePool(range(100))
+        rand = random.Random(0)
+        excluded = set(range(99))
+
+        self.assertEqual(pool.pick(excluded, rand), 99)
+        self.assertIsNone(pool.pick(set(range(100)), rand))
+        self.assertIsNone(CandidatePool([]).pick(set(), rand))
+
+
+class CandidatePoolsTest(TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        create_schema(
+            self.engine,
+            "INSERT INTO subscriptions (user_id, movement_id) VALUES "
+            "(1, 1), (2, 1), (3, 1), (4, 1)",
+            "INSERT INTO movement_user_association (movement_id, follower_id, "
+            "leader_id) VALUES (1, 1, 2), (1, 1, 3)",
+        )
+        self.pools = CandidatePools(self.engine)
+
+    def leaders(self, follower_id):
+        with self.engine.connect() as connection:
+            return set(
+                connection.execute(
+                    select(followers.c.leader_id).where(
+                        followers.c.follower_id == follower_id,
+                        followers.c.destroyed.is_(None),
+                    )
+                ).scalars()
+            )
+
+    def test_swap(self):
+        self.assertEqual(self.pools.swap(1, 1, 2), 4)
+        self.assertEqual(self.leaders(1), {3, 4})
+
+    def test_no_candidate(self):
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    "INSERT INTO movement_user_association (movement_id, follower_id, "
+                    "leader_id) VALUES (1, 1, 4)"
+                )
+            )
+
+        self.assertIsNone(self.pools.swap(1, 1, 2))
+        self.assertEqual(self.leaders(1), {2, 3, 4})
+
+    def test_not_following(self):
+        self.assertIsNone(self.pools.swap(1, 1, 4))
+        self.assertEqual(self.leaders(1), {2, 3})
+
+    def test_stale_candidate(self):
+        self.pools.pool(1)
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    "UPDATE subscriptions SET time_removed = '2021-01-01' "
+                    "WHERE user_id = 4"
+                )
+            )
+
+        self.assertIsNone(self.pools.swap(1, 1, 2))
+        self.assertNotIn(4, self.pools.pool(1))
+        self.assertEqual(self.leaders(1), {2, 3})
+
+    def test_duplicate_leader(self):
+        before = retries("stale_candidate")
+        with self.engine.begin() as connection:
+            # Migration 0007.
+            connection.execute(
+                text(
+                    "CREATE UNIQUE INDEX uq_movement_user_association_active "
+                    "ON movement_user_association (movement_id, follower_id, "
+                    "leader_id) WHERE destroyed IS NULL"
+                )
+            )
+        pool = self.pools.pool(1)
+        pick = pool.pick
+
+        def concurrent_swap(excluded):
+            # Another swap adds the same leader after the first read.
+            if 4 not in excluded:
+                with self.engine.begin() as connection:
+                    connection.execute(
+                        text(
+                            "INSERT INTO movement_user_association (movement_id, "
+                            "follower_id, leader_id) VALUES (1, 1, 4)"
+                        )
+                    )
+            return pick(excluded)
+
+        def unchecked_insert(follower_id, movement_id, leader_id, now):
+            # What passes the NOT EXISTS check of a concurrent swap on MySQL.
+            return insert(followers).values(
+                movement_id=movement_id,
+                follower_id=follower_id,
+                leader_id=leader_id,
+                created=now,
+            )
+
+        with patch.object(pool, "pick", side_effect=concurrent_swap), patch.object(
+            self.pools, "add_leader", side_effect=unchecked_insert
+        ):
+            self.assertIsNone(self.pools.swap(1, 1, 2))
+
+        self.assertEqual(retries("stale_candidate"), before + 1)
+        self.assertEqual(self.leaders(1), {2, 3, 4})
+
+    def test_unsubscribed(self):
+        self.pools.pool(1)
+        self.pools.unsubscribed(4, 1)
+
+        self.assertIsNone(self.pools.swap(1, 1, 2))
+        self.assertEqual(self.leaders(1), {2, 3})
+
+    def test_conflict(self):
+        before = retries("conflict")
+        pool = self.pools.pool(1)
+        pick = pool.pick
+
+        def concurrent_swap(excluded):
+            # Another request swaps the same leader after the read.
+            with self.engine.begin() as connection:
+                connection.execute(
+                    text(
+                        "UPDATE movement_user_association SET destroyed = '2021-01-01' "
+                        "WHERE follower_id = 1 AND leader_id = 2"
+                    )
+                )
+            return pick(excluded)
+
+        with patch.object(pool, "pick", side_effect=concurrent_swap):
+            self.assertIsNone(self.pools.swap(1, 1, 2))
+
+        self.assertEqual(retries("conflict"), before + 1)
+        self.assertEqual(self.leaders(1), {3})
+
+    @patch("gridt_server.candidates.SWAP_BACKOFF", 0)
+    def test_deadlock(self):
+        before = retries("deadlock")
+        deadlock = OperationalError("UPDATE", {}, Exception(1213, "Deadlock found"))
+
+        with patch.object(self.pools, "try_swap", side_effect=[deadlock, 4]):
+            self.assertEqual(self.pools.swap(1, 1, 2), 4)
+        self.assertEqual(retries("deadlock"), before + 1)
+
+        other = OperationalError("UPDATE", {}, Exception(2006, "Gone away"))
+        with patch.object(self.pools, "try_swap", side_effect=other):
+            with self.assertRaises(OperationalError):
+                self.pools.swap(1, 1, 2)
+
+    @patch("gridt_server.candidates.SWAP_BACKOFF", 0)
+    def test_gave_up(self):
+        with patch.object(self.pools, "try_swap", return_value=RETRY) as try_swap:
+            with self.assertRaises(SwapConflict):
+                self.pools.swap(1, 1, 2)
+        self.assertEqual(try_swap.call_count, 5)
+
+    def test_is_lock_conflict(self):
+        self.assertTrue(is_lock_conflict(Exception(1205, "Lock wait timeout exceeded")))
+        self.assertTrue(is_lock_conflict(Exception("database is locked")))
+        self.assertFalse(is_lock_conflict(Exception(1062, "Duplicate entry")))
+        self.assertFalse(is_lock_conflict(None))
+
+
+class ConcurrentSwapTest(TestCase):
+    FOLLOWERS = 20
+    LEADERS = 3
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".sqlite")
+        os.close(handle)
+        self.engine = create_engine(f"sqlite:///{self.path}")
+        create_schema(self.engine)
+        with self.engine.begin() as connection:
+            for user in range(self.FOLLOWERS):
+                connection.execute(
+                    text(
+                        "INSERT INTO subscriptions (user_id, movement_id) "
+                        f"VALUES ({user}, 1)"
+                    )
+                )
+                for offset in range(1, self.LEADERS + 1):
+                    connection.execute(
+                        text(
+                            "INSERT INTO movement_user_association "
+                            "(movement_id, follower_id, leader_id) "
+                            f"VALUES (1, {user}, {(user + offset) % self.FOLLOWERS})"
+                        )
+                    )
+        self.pools = CandidatePools(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+        os.remove(self.path)
+
+    def test_concurrent_swaps(self):
+        start = threading.Barrier(10)
+        errors = []
+
+        def swap_all_leaders(thread):
+            start.wait()
+            try:
+                for turn in range(5):
+                    follower = (thread * 7 + turn) % self.FOLLOWERS
+                    with self.engine.connect() as connection:
+                        leader = connection.execute(
+                            text(
+                                "SELECT leader_id FROM movement_user_association "
+                                f"WHERE follower_id = {follower} AND destroyed IS NULL"
+                            )
+                        ).scalar()
+                    self.pools.swap(follower, 1, leader)
+            except Exception as err:
+                errors.append(err)
+
+        threads = [
+            threading.Thread(target=swap_all_leaders, args=(n,)) for n in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                text(
+                    "SELECT follower_id, leader_id FROM movement_user_association "
+                    "WHERE destroyed IS NULL"
+                )
+            ).all()
+        for follower in range(self.FOLLOWERS):
+            leaders = [
+                leader for row_follower, leader in rows if row_follower == follower
+            ]
+            self.assertEqual(len(leaders), self.LEADERS)
+            self.assertEqual(len(set(leaders)), self.LEADERS)
+            self.assertNotIn(follower, leaders)
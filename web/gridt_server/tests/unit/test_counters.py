@@ -0,0 +1,89 @@
+from datetime import datetime
+from unittest import TestCase
+
+from sqlalchemy import create_engine, text
+
+from gridt_server.counters import (
+    drift,
+    get_last_signals,
+    get_movement_stats,
+    repair,
+)
+from gridt_server.tests.base_test import create_schema
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        create_schema(
+            self.engine,
+            "INSERT INTO movements (id, name, interval) VALUES "
+            "(1, 'a', 'daily'), (2, 'b', 'daily'), (3, 'c', 'daily')",
+            "INSERT INTO subscriptions (id, user_id, movement_id, time_added, "
+            "time_removed) VALUES (1, 1, 1, '2021-01-01 10:00:00.000000', NULL), "
+            "(2, 2, 1, '2021-01-01 10:00:00.000000', NULL), "
+            "(3, 3, 1, '2021-01-01 10:00:00.000000', '2021-01-01 11:00:00.000000'), "
+            "(4, 1, 2, '2021-01-01 10:00:00.000000', NULL)",
+            "INSERT INTO signals (id, leader_id, movement_id, time_stamp, message) "
+            "VALUES (1, 1, 1, '2021-01-01 11:00:00.000000', NULL), "
+            "(2, 1, 1, '2021-01-01 12:00:00.000000', NULL), "
+            "(3, 2, 1, '2021-01-01 11:30:00.000000', NULL)",
+            "INSERT INTO announcements (id, movement_id, user_id, message, "
+            "created_time, updated_time, removed_time) VALUES "
+            "(1, 2, 1, 'a', '2021-01-02 00:00:00.000000', NULL, NULL), "
+            "(2, 2, 1, 'b', '2021-01-03 00:00:00.000000', NULL, "
+            "'2021-01-04 00:00:00.000000')",
+        )
+
+    def test_repair_backfills(self):
+        with self.engine.begin() as connection:
+            self.assertEqual(len(repair(connection)), 4)
+            self.assertEqual(drift(connection), [])
+
+            stats = get_movement_stats(connection, [1, 2, 3])
+            last_signals = get_last_signals(connection, 1)
+
+        self.assertEqual(
+            stats[1],
+            {
+                "subscribers": 2,
+                "last_signal_sent": datetime(2021, 1, 1, 12),
+                "last_announcement": None,
+            },
+        )
+        self.assertEqual(stats[2]["subscribers"], 1)
+        self.assertEqual(stats[2]["last_announcement"], datetime(2021, 1, 2))
+        self.assertEqual(
+            stats[3],
+            {"subscribers": 0, "last_signal_sent": None, "last_announcement": None},
+        )
+        self.assertEqual(
+            last_signals, {1: datetime(2021, 1, 1, 12), 2: datetime(2021, 1, 1, 11, 30)}
+        )
+
+    def test_drift(self):
+        with self.engine.begin() as connection:
+            repair(connection)
+            for statement in (
+                "UPDATE movement_stats SET subscribers = 5 WHERE movement_id = 1",
+                "DELETE FROM leader_signals WHERE leader_id = 2",
+                "INSERT INTO leader_signals "
+                "VALUES (3, 1, '2021-01-01 12:00:00.000000')",
+            ):
+                connection.execute(text(statement))
+
+            found = drift(connection)
+            self.assertEqual(
+                [(item.table, item.key) for item in found],
+                [
+                    ("movement_stats", 1),
+                    ("leader_signals", (1, 2)),
+                    ("leader_signals", (3, 1)),
+                ],
+            )
+            self.assertEqual(found[0].stored[0], 5)
+            self.assertEqual(found[0].expected[0], 2)
+
+            self.assertEqual(repair(connection), found)
+            self.assertEqual(drift(connection), [])
+            self.assertEqual(get_last_signals(connection, 3), {})
@@ -0,0 +1,81 @@
+import time
+from unittest import TestCase
+
+from flask import Flask
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+from gridt_server.deadlines import install_deadlines
+
+SLOW_QUERY = text(
+    "WITH RECURSIVE counter(n) AS "
+    "(SELECT 1 UNION ALL SELECT n + 1 FROM counter) "
+    "SELECT count(*) FROM (SELECT n FROM counter LIMIT 100000000)"
+)
+
+
+class DeadlineTest(TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["REQUEST_DEADLINE"] = 10
+        self.app.config["ENDPOINT_DEADLINES"] = {"slow_query": 0.1, "late_query": 0.05}
+        self.engine = create_engine("sqlite://")
+        install_deadlines(self.app, self.engine)
+
+        @self.app.route("/slow_query")
+        def slow_query():
+            with self.engine.connect() as connection:
+                return str(connection.execute(SLOW_QUERY).scalar())
+
+        @self.app.route("/late_query")
+        def late_query():
+            time.sleep(0.1)
+            with self.engine.connect() as connection:
+                return str(connection.execute(text("SELECT 1")).scalar())
+
+        @self.app.route("/fast_query")
+        def fast_query():
+            with self.engine.connect() as connection:
+                return str(connection.execute(text("SELECT 1")).scalar())
+
+        self.client = self.app.test_client()
+
+    def exceeded(self, endpoint, stage):
+        return (
+            REGISTRY.get_sample_value(
+                "deadline_exceeded_total", {"endpoint": endpoint, "stage": stage}
+            )
+            or 0
+        )
+
+    def test_statement_interrupted(self):
+        before = self.exceeded("slow_query", "database")
+        start = time.monotonic()
+
+        response = self.client.get("/slow_query")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(self.exceeded("slow_query", "database"), before + 1)
+
+    def test_statement_after_deadline(self):
+        before = self.exceeded("late_query", "statement")
+
+        response = self.client.get("/late_query")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.exceeded("late_query", "statement"), before + 1)
+
+    def test_deadline_spent_in_queue(self):
+        response = self.client.get(
+            "/fast_query", headers={"X-Request-Start": f"t={time.time() - 20}"}
+        )
+        self.assertEqual(response.status_code, 503)
+
+    def test_within_deadline(self):
+        response = self.client.get("/fast_query")
+        self.assertEqual(response.status_code, 200)
+
+        # The progress handler is gone once the request is over.
+        with self.engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
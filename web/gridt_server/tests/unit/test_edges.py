@@ -0,0 +1,55 @@
+from unittest import TestCase
+
+from sqlalchemy import create_engine, text
+
+from gridt_server.edges import EdgeTracker
+from gridt_server.tests.base_test import create_schema
+
+
+class EdgeTrackerTest(TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        create_schema(
+            self.engine,
+            "INSERT INTO movement_user_association "
+            "(movement_id, follower_id, leader_id, destroyed) VALUES "
+            "(1, 1, 2, NULL), (1, 2, 1, NULL), (1, 2, 3, NULL), (1, 3, 2, NULL), "
+            "(1, 3, 1, '2021-01-01 00:00:00'), (2, 4, 1, NULL)",
+            server_tables=False,
+        )
+        self.tracker = EdgeTracker(self.engine)
+
+    def execute(self, *statements):
+        with self.engine.begin() as connection:
+            for statement in statements:
+                connection.execute(text(statement))
+
+    def test_subscribe(self):
+        with self.tracker.changes(4, 1) as edges:
+            self.execute(
+                "INSERT INTO movement_user_association "
+                "(movement_id, follower_id, leader_id) VALUES "
+                "(1, 4, 1), (1, 4, 2), (1, 3, 4)"
+            )
+
+        self.assertEqual(edges.created, [(3, 4), (4, 1), (4, 2)])
+        self.assertEqual(edges.destroyed, [])
+
+    def test_unsubscribe(self):
+        with self.tracker.changes(1, 1) as edges:
+            self.execute(
+                "UPDATE movement_user_association SET destroyed = '2021-01-05' "
+                "WHERE movement_id = 1 AND (follower_id = 1 OR leader_id = 1)",
+                "INSERT INTO movement_user_association "
+                "(movement_id, follower_id, leader_id) VALUES (1, 2, 4)",
+            )
+
+        # The new leader of the follower of user 1 is found too.
+        self.assertEqual(edges.created, [(2, 4)])
+        self.assertEqual(edges.destroyed, [(1, 2), (2, 1)])
+
+    def test_failed_change(self):
+        with self.assertRaises(RuntimeError):
+            with self.tracker.changes(4, 1) as edges:
+                raise RuntimeError
+        self.assertEqual(edges, ([], []))
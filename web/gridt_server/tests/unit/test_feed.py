@@ -0,0 +1,197 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, text
+
+from gridt_server.counters import repair
+from gridt_server.edges import Edges
+from gridt_server.feed import Feed
+from gridt_server.store import MemoryStore
+from gridt_server.tests.base_test import create_schema
+
+
+class FeedTest(TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        create_schema(
+            self.engine,
+            "INSERT INTO users (id, username) VALUES "
+            "(1, 'robin'), (2, 'sam'), (3, 'alex'), (4, 'kim')",
+            "INSERT INTO movements (id, name, interval, short_description) VALUES "
+            "(1, 'Flossing', 'daily', 'Floss every day.'), "
+            "(2, 'Running', 'weekly', 'Run every week.')",
+            "INSERT INTO subscriptions (user_id, movement_id, time_removed) VALUES "
+            "(1, 1, NULL), (2, 1, NULL), (3, 1, NULL), (1, 2, NULL), (4, 2, NULL)",
+            "INSERT INTO movement_user_association "
+            "(movement_id, follower_id, leader_id, destroyed) VALUES "
+            "(1, 1, 3, '2021-01-01 00:00:00'), (1, 1, 2, NULL), (1, 2, 1, NULL), "
+            "(1, 3, 1, NULL), (2, 1, 4, NULL), (2, 4, 1, NULL)",
+            "INSERT INTO signals (leader_id, movement_id, time_stamp, message) VALUES "
+            "(2, 1, '2021-01-01 10:00:00.000000', 'Done!'), "
+            "(2, 1, '2021-01-01 08:00:00.000000', 'Early')",
+            "INSERT INTO announcements (movement_id, user_id, message, created_time) "
+            "VALUES (1, 1, 'Welcome to flossing.', '2021-01-01 00:00:00.000000')",
+        )
+        self.repair()
+        self.store = MemoryStore()
+        self.feed = Feed(self.engine, self.store)
+
+    def execute(self, *statements):
+        with self.engine.begin() as connection:
+            for statement in statements:
+                connection.execute(text(statement))
+
+    def leader_ids(self, user_id, movement_id):
+        for entry in self.feed.get(user_id):
+            if entry["id"] == movement_id:
+                return [leader["id"] for leader in entry["leaders"]]
+        return None
+
+    def repair(self):
+        # The triggers of migration 0003 are not installed here.
+        with self.engine.begin() as connection:
+            repair(connection)
+
+    def test_get(self):
+        feed = self.feed.get(1)
+
+        self.assertEqual(
+            feed[0],
+            {
+                "id": 1,
+                "name": "Flossing",
+                "short_description": "Floss every day.",
+                "interval": "daily",
+                "leaders": [
+                    {
+                        "id": 2,
+                        "username": "sam",
+                        "last_signal": {
+                            "time_stamp": "2021-01-01T10:00:00+00:00",
+                            "message": "Done!",
+                        },
+                    }
+                ],
+                "last_announcement": {
+                    "id": 1,
+                    "message": "Welcome to flossing.",
+                    "created_time": "2021-01-01T00:00:00+00:00",
+                },
+            },
+        )
+        self.assertEqual(
+            feed[1]["leaders"], [{"id": 4, "username": "kim", "last_signal": None}]
+        )
+        self.assertIsNone(feed[1]["last_announcement"])
+
+        with patch.object(self.engine, "connect", side_effect=AssertionError):
+            self.assertEqual(self.feed.get(1), feed)
+
+    def test_signalled(self):
+        self.feed.get(1)
+        self.execute(
+            "INSERT INTO signals (leader_id, movement_id, time_stamp, message) VALUES "
+            "(4, 2, '2021-01-02 10:00:00.000000', 'Ran!')"
+        )
+        self.repair()
+        # The cost of a signal does not depend on the number of followers.
+        with patch.object(self.feed, "update", side_effect=AssertionError):
+            self.feed.signalled(4, 2)
+
+        with patch.object(self.engine, "connect", side_effect=AssertionError):
+            leaders = self.feed.get(1)[1]["leaders"]
+        self.assertEqual(
+            leaders[0]["last_signal"],
+            {"time_stamp": "2021-01-02T10:00:00+00:00", "message": "Ran!"},
+        )
+
+    def test_announced(self):
+        self.feed.get(1)
+        self.feed.get(4)
+        self.execute(
+            "INSERT INTO announcements (movement_id, user_id, message, created_time) "
+            "VALUES (2, 1, 'New route this week.', '2021-01-02 00:00:00.000000')"
+        )
+        with patch.object(self.feed, "update", side_effect=AssertionError):
+            self.feed.announced(1, 2)
+
+        with patch.object(self.engine, "connect", side_effect=AssertionError):
+            for user_id in (1, 4):
+                announcement = self.feed.get(user_id)[-1]["last_announcement"]
+                self.assertEqual(announcement["message"], "New route this week.")
+
+    def test_subscribed(self):
+        for user_id in (1, 2, 3, 4):
+            self.feed.get(user_id)
+        self.execute(
+            "INSERT INTO subscriptions (user_id, movement_id, time_removed) "
+            "VALUES (4, 1, NULL)",
+            "INSERT INTO movement_user_association (movement_id, follower_id, "
+            "leader_id) VALUES (1, 4, 2), (1, 3, 4)",
+        )
+        self.repair()
+        edges = Edges(created=[(3, 4), (4, 2)], destroyed=[])
+        with patch.object(self.feed, "build", side_effect=AssertionError):
+            self.feed.subscribed(4, 1, edges)
+
+            self.assertEqual([entry["id"] for entry in self.feed.get(4)], [1, 2])
+            self.assertEqual(self.leader_ids(4, 1), [2])
+            # User 4 became a leader of user 3.
+            self.assertEqual(self.leader_ids(3, 1), [1, 4])
+            self.assertEqual(self.feed.get(3)[0]["leaders"][1]["username"], "kim")
+            self.assertEqual(self.leader_ids(2, 1), [1])
+
+    def test_unsubscribed(self):
+        for user_id in (1, 2, 3):
+            self.feed.get(user_id)
+        # User 2 gets user 3 as a leader instead of user 1.
+        self.execute(
+            "UPDATE subscriptions SET time_removed = '2021-01-05 00:00:00' "
+            "WHERE user_id = 1 AND movement_id = 1",
+            "UPDATE movement_user_association SET destroyed = '2021-01-05 00:00:00' "
+            "WHERE movement_id = 1 AND (follower_id = 1 OR leader_id = 1)",
+            "INSERT INTO movement_user_association (movement_id, follower_id, "
+            "leader_id) VALUES (1, 2, 3)",
+        )
+        self.repair()
+        edges = Edges(created=[(2, 3)], destroyed=[(1, 2), (2, 1), (3, 1)])
+        with patch.object(self.feed, "build", side_effect=AssertionError):
+            self.feed.unsubscribed(1, 1, edges)
+
+            self.assertEqual([entry["id"] for entry in self.feed.get(1)], [2])
+            self.assertEqual(self.leader_ids(2, 1), [3])
+            self.assertEqual(self.leader_ids(3, 1), [])
+
+    def test_missing_documents(self):
+        self.feed.subscribed(4, 1, Edges(created=[(3, 4)], destroyed=[]))
+        self.feed.unsubscribed(1, 1, Edges(created=[], destroyed=[(2, 1)]))
+
+        # Documents are only built on read.
+        for user_id in (1, 2, 3, 4):
+            self.assertIsNone(self.store.get(self.feed.key(user_id)))
+
+    def test_swapped(self):
+        self.feed.get(1)
+        self.execute(
+            "UPDATE movement_user_association SET destroyed = '2021-01-05 00:00:00' "
+            "WHERE follower_id = 1 AND leader_id = 2",
+            "INSERT INTO movement_user_association (movement_id, follower_id, "
+            "leader_id) VALUES (1, 1, 3)",
+        )
+        self.feed.swapped(1, 1, 2, 3)
+
+        leaders = self.feed.get(1)[0]["leaders"]
+        self.assertEqual(leaders, [{"id": 3, "username": "alex", "last_signal": None}])
+
+    def test_swapped_unknown_leader(self):
+        self.feed.get(1)
+        self.execute(
+            "UPDATE movement_user_association SET destroyed = '2021-01-05 00:00:00' "
+            "WHERE follower_id = 1 AND leader_id = 2",
+            "INSERT INTO movement_user_association (movement_id, follower_id, "
+            "leader_id) VALUES (1, 1, 4)",
+        )
+        self.feed.swapped(1, 1, 2, None)
+
+        self.assertEqual(self.leader_ids(1, 1), [4])
+        self.assertEqual(self.leader_ids(1, 2), [4])
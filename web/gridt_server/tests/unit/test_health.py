@@ -0,0 +1,59 @@
+import time
+from unittest import TestCase
+
+from flask import Flask
+from sqlalchemy import create_engine
+
+from gridt_server.health import install_health_checks, register_readiness_check
+
+
+class HealthCheckTest(TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["READINESS_TIMEOUT"] = 0.1
+        self.hooks_called = 0
+
+        @self.app.before_request
+        def count_hooks():
+            self.hooks_called += 1
+
+        install_health_checks(self.app, create_engine("sqlite://"))
+        self.client = self.app.test_client()
+
+    def test_liveness(self):
+        response = self.client.get("/healthz")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {"status": "ok"})
+        self.assertEqual(self.hooks_called, 0)
+
+    def test_ready(self):
+        response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body["status"], "ok")
+        self.assertEqual(body["checks"]["database"]["status"], "ok")
+        self.assertEqual(self.hooks_called, 0)
+
+    def test_failing_check(self):
+        def broken():
+            raise ConnectionError("cache is down")
+
+        register_readiness_check(self.app, "cache", broken)
+        response = self.client.get("/readyz")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(
+            response.get_json()["checks"]["cache"],
+            {"status": "error", "error": "cache is down"},
+        )
+
+    def test_slow_check(self):
+        register_readiness_check(self.app, "slow", lambda: time.sleep(0.5) or {})
+        response = self.client.get("/readyz")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.get_json()["checks"]["slow"], {"status": "timeout"})
+
+    def test_other_paths_reach_flask(self):
+        self.client.get("/somewhere")
+        self.assertEqual(self.hooks_called, 1)
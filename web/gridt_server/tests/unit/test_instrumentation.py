@@ -0,0 +1,127 @@
+from unittest import TestCase
+
+from flask import Flask, g, request
+from flask_jwt_extended import JWTManager, create_access_token
+from flask_restful import Api, Resource
+from marshmallow import Schema, fields
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+from gridt_server.instrumentation import (
+    Query,
+    install_instrumentation,
+    install_phase_timing,
+    redact,
+    repeated_shapes,
+)
+from gridt_server.resources.helpers import schema_loader, jwt_required
+
+
+class InstrumentationTest(TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.engine = create_engine("sqlite://")
+        install_instrumentation(self.app, self.engine)
+
+        @self.app.route("/three_queries")
+        def three_queries():
+            with self.engine.connect() as connection:
+                for _ in range(3):
+                    connection.execute(text("SELECT 1"))
+            return {"queries": len(g.trace.queries)}
+
+        self.client = self.app.test_client()
+
+    def sample(self, name):
+        return REGISTRY.get_sample_value(name, {"endpoint": "three_queries"}) or 0
+
+    def test_queries_attributed_to_endpoint(self):
+        count_before = self.sample("queries_per_request_count")
+        sum_before = self.sample("queries_per_request_sum")
+
+        response = self.client.get("/three_queries")
+
+        self.assertEqual(response.get_json(), {"queries": 3})
+        self.assertEqual(self.sample("queries_per_request_count"), count_before + 1)
+        self.assertEqual(self.sample("queries_per_request_sum"), sum_before + 3)
+        self.assertGreater(self.sample("db_time_seconds_count"), 0)
+
+    def test_slow_query_parameters_redacted(self):
+        self.app.config["SLOW_QUERY_THRESHOLD"] = 0
+        engine = create_engine("sqlite://")
+        install_instrumentation(self.app, engine)
+
+        with self.assertLogs(self.app.logger, "WARNING") as logs:
+            with engine.connect() as connection:
+                connection.execute(text("SELECT :secret"), {"secret": "hunter2"})
+
+        self.assertIn("Slow query", logs.output[0])
+        self.assertNotIn("hunter2", logs.output[0])
+
+    def test_redact(self):
+        self.assertEqual(redact(("a", 1)), ["?", "?"])
+        self.assertEqual(redact({"email": "a@b.c"}), {"email": "?"})
+        self.assertEqual(redact([("a",), ("b",)]), [["?"], ["?"]])
+
+    def test_repeated_shapes(self):
+        queries = [
+            Query("SELECT * FROM signals WHERE leader_id = 1", 0.1),
+            Query("SELECT * FROM signals WHERE leader_id = 2", 0.1),
+            Query("SELECT * FROM users WHERE id IN (?, ?)", 0.1),
+            Query("SELECT * FROM users WHERE id IN (?)", 0.1),
+            Query("SELECT * FROM movements WHERE name = 'x'", 0.1),
+        ]
+        self.assertEqual(
+            repeated_shapes(queries),
+            [
+                ("SELECT * FROM signals WHERE leader_id = ?", 2),
+                ("SELECT * FROM users WHERE id IN (...)", 2),
+            ],
+        )
+
+
+class PhaseTimingTest(TestCase):
+    class EchoSchema(Schema):
+        message = fields.Str(required=True)
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["SECRET_KEY"] = "test"
+        self.app.config["JWT_HEADER_TYPE"] = "JWT"
+        self.app.config["SERVER_TIMING_HEADER"] = True
+        JWTManager(self.app)
+        install_instrumentation(self.app, create_engine("sqlite://"))
+
+        schema = self.EchoSchema()
+
+        class EchoResource(Resource):
+            @jwt_required()
+            def post(self):
+                return schema_loader(schema, request.get_json())
+
+        api = Api(self.app)
+        install_phase_timing(api)
+        api.add_resource(EchoResource, "/echo")
+        self.client = self.app.test_client()
+
+    def test_server_timing_header(self):
+        with self.app.app_context():
+            token = create_access_token("42")
+        response = self.client.post(
+            "/echo", headers={"Authorization": f"JWT {token}"}, json={"message": "hi"}
+        )
+
+        self.assertEqual(response.get_json(), {"message": "hi"})
+        phases = [
+            entry.split(";")[0]
+            for entry in response.headers["Server-Timing"].split(", ")
+        ]
+        self.assertEqual(
+            phases, ["jwt", "validation", "controller", "serialization", "db", "total"]
+        )
+        self.assertIsNotNone(
+            REGISTRY.get_sample_value(
+                "request_phase_seconds_count",
+                {"endpoint": "echoresource", "phase": "jwt"},
+            )
+        )
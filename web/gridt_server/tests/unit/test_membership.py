@@ -0,0 +1,123 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from flask import Flask
+from sqlalchemy import create_engine, text
+
+from gridt_server.events import emit
+from gridt_server.membership import SubscriptionIndex, install_subscription_index
+from gridt_server.store import MemoryStore, install_store
+from gridt_server.tests.base_test import create_schema
+
+
+class SubscriptionIndexTest(TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        create_schema(
+            self.engine,
+            "INSERT INTO subscriptions (user_id, movement_id, time_removed) VALUES "
+            "(1, 1, NULL), (1, 2, NULL), (1, 3, '2021-01-01'), (2, 1, NULL)",
+        )
+        self.store = MemoryStore()
+        # Two workers that share the store.
+        self.index = SubscriptionIndex(self.engine, self.store)
+        self.other = SubscriptionIndex(self.engine, self.store)
+
+    def execute(self, *statements):
+        with self.engine.begin() as connection:
+            for statement in statements:
+                connection.execute(text(statement))
+
+    def test_contains(self):
+        self.assertTrue(self.index.contains(1, 1))
+        self.assertTrue(self.index.contains(1, 2))
+        self.assertFalse(self.index.contains(1, 3))
+        self.assertFalse(self.index.contains(3, 1))
+
+    def test_memory_reads(self):
+        self.index.movements(1)
+        with patch.object(self.engine, "connect", side_effect=AssertionError):
+            self.assertTrue(self.index.contains(1, 2))
+            self.assertFalse(self.index.contains(1, 4))
+
+    def test_version_checks(self):
+        self.index.movements(1)
+        with patch.object(self.store, "get", side_effect=AssertionError):
+            self.assertTrue(self.index.contains(1, 2))
+
+        self.index.check_interval = 0
+        with patch.object(self.engine, "connect", side_effect=AssertionError):
+            self.assertTrue(self.index.contains(1, 2))
+
+    def test_local_change(self):
+        self.index.movements(1)
+        self.index.subscribed(1, 4)
+        self.index.unsubscribed(1, 1)
+
+        with patch.object(self.engine, "connect", side_effect=AssertionError):
+            self.assertEqual(list(self.index.movements(1)), [2, 4])
+
+    def test_change_of_other_worker(self):
+        self.index.movements(1)
+        self.other.movements(1)
+        self.execute("INSERT INTO subscriptions (user_id, movement_id) VALUES (1, 5)")
+        self.other.subscribed(1, 5)
+        self.assertFalse(self.index.contains(1, 5))
+
+        self.index.check_interval = 0
+        self.assertTrue(self.index.contains(1, 5))
+
+    def test_concurrent_changes(self):
+        self.index.movements(1)
+        self.execute(
+            "INSERT INTO subscriptions (user_id, movement_id) VALUES (1, 5), (1, 6)"
+        )
+        self.other.subscribed(1, 5)
+        self.index.subscribed(1, 6)
+
+        self.assertEqual(list(self.index.movements(1)), [1, 2, 5, 6])
+
+    def test_ttl(self):
+        self.index.movements(1)
+        # Changed by the library without an event.
+        self.execute("INSERT INTO subscriptions (user_id, movement_id) VALUES (1, 5)")
+        self.assertFalse(self.index.contains(1, 5))
+
+        self.index.ttl = 0
+        self.assertTrue(self.index.contains(1, 5))
+
+    def test_max_users(self):
+        self.index.max_users = 1
+        self.index.movements(1)
+        self.index.movements(2)
+
+        self.assertEqual(list(self.index.users), [2])
+
+
+class InstallSubscriptionIndexTest(TestCase):
+    def test_events(self):
+        app = Flask(__name__)
+        app.config["SUBSCRIPTION_INDEX"] = True
+        install_store(app)
+        index = install_subscription_index(app, engine=None)
+
+        with patch.object(index, "changed") as changed, app.app_context():
+            emit("subscribe", 1, 2)
+            emit("unsubscribe", 1, 3)
+
+        self.assertEqual(
+            [
+                call.args + tuple(call.kwargs.values())
+                for call in changed.call_args_list
+            ],
+            [(1, 2, True), (1, 3, False)],
+        )
+
+    def test_memory_store_with_workers(self):
+        app = Flask(__name__)
+        app.config["SUBSCRIPTION_INDEX"] = True
+        install_store(app)
+
+        with patch.dict("os.environ", {"WEB_CONCURRENCY": "2"}):
+            with self.assertRaises(RuntimeError):
+                install_subscription_index(app, engine=None)
@@ -0,0 +1,62 @@
+from unittest import TestCase
+
+from flask import Flask
+from flask_restful import Api, Resource
+from prometheus_client import REGISTRY
+
+from gridt_server.metrics import install_request_metrics
+
+
+class RequestMetricsTest(TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["LATENCY_BUCKETS"] = [0.01, 0.1, 1]
+        self.app.config["ENDPOINT_LATENCY_BUCKETS"] = {"metricsresource": [0.5, 1, 2]}
+        install_request_metrics(self.app)
+        self.labels = {
+            "method": "GET",
+            "url_rule": "/movements/<movement_id>/metrics",
+            "status": "200",
+        }
+
+        class MetricsResource(Resource):
+            def get(self, movement_id):
+                return {
+                    "in_flight": REGISTRY.get_sample_value(
+                        "http_requests_in_flight", {"resource": "MetricsResource"}
+                    )
+                }
+
+        Api(self.app).add_resource(MetricsResource, "/movements/<movement_id>/metrics")
+        self.client = self.app.test_client()
+
+    def test_endpoint_histogram(self):
+        before = (
+            REGISTRY.get_sample_value(
+                "metricsresource_request_duration_seconds_count", self.labels
+            )
+            or 0
+        )
+
+        response = self.client.get("/movements/1/metrics")
+        self.client.get("/movements/2/metrics")
+
+        self.assertEqual(response.get_json()["in_flight"], 1)
+        self.assertEqual(
+            REGISTRY.get_sample_value(
+                "metricsresource_request_duration_seconds_count", self.labels
+            ),
+            before + 2,
+        )
+        self.assertIsNotNone(
+            REGISTRY.get_sample_value(
+                "metricsresource_request_duration_seconds_bucket",
+                {**self.labels, "le": "0.5"},
+            )
+        )
+        self.assertEqual(
+            REGISTRY.get_sample_value(
+                "http_requests_in_flight", {"resource": "MetricsResource"}
+            ),
+            0,
+        )
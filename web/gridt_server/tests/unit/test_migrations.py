@@ -0,0 +1,108 @@
+import tempfile
+from unittest import TestCase
+
+from alembic import command
+from sqlalchemy import create_engine, text
+
+from gridt_server import counters, rollups
+from gridt_server.migrations import alembic_config
+from gridt_server.tests.base_test import create_schema
+
+
+class CounterMigrationsTest(TestCase):
+    """
+    Runs the backfills and the triggers of migrations 0003, 0004 and 0008 on
+    SQLite, on top of the tables of the gridt library.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        database_url = f"sqlite:///{self.tmpdir.name}/gridt.db"
+        self.engine = create_engine(database_url)
+        create_schema(
+            self.engine,
+            "INSERT INTO movements (id, name, interval) VALUES "
+            "(1, 'a', 'daily'), (2, 'b', 'daily'), (3, 'c', 'daily')",
+            "INSERT INTO subscriptions "
+            "(user_id, movement_id, time_added, time_removed) VALUES "
+            "(1, 1, '2021-01-01 10:00:00.000000', NULL), "
+            "(2, 1, '2021-01-01 10:00:00.000000', '2021-01-01 11:00:00.000000')",
+            "INSERT INTO signals (leader_id, movement_id, time_stamp) VALUES "
+            "(1, 1, '2021-01-01 11:00:00.000000'), "
+            "(1, 1, '2021-01-01 11:59:00.000000'), "
+            "(2, 1, '2021-01-01 12:00:00.000000')",
+            "INSERT INTO announcements (movement_id, user_id, message, created_time) "
+            "VALUES (1, 1, 'Welcome!', '2021-01-02 00:00:00.000000')",
+            server_tables=False,
+        )
+        # The tables of 0001 exist, the indexes of 0002 are not needed here.
+        config = alembic_config(database_url)
+        command.stamp(config, "0002")
+        command.upgrade(config, "head")
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def execute(self, *statements):
+        with self.engine.begin() as connection:
+            for statement in statements:
+                connection.execute(text(statement))
+
+    def assertNoDrift(self):
+        with self.engine.connect() as connection:
+            self.assertEqual(counters.drift(connection), [])
+            self.assertEqual(rollups.drift(connection), [])
+
+    def test_backfill(self):
+        self.assertNoDrift()
+        with self.engine.connect() as connection:
+            stats = counters.get_movement_stats(connection, [1])[1]
+        self.assertEqual(stats["subscribers"], 1)
+        with self.engine.connect() as connection:
+            leader_rows = connection.execute(
+                text("SELECT COUNT(*) FROM signal_rollup_leaders")
+            ).scalar()
+        self.assertEqual(leader_rows, 4)
+
+    def test_triggers(self):
+        self.execute(
+            "INSERT INTO subscriptions (user_id, movement_id, time_added) VALUES "
+            "(3, 1, '2021-01-02 10:00:00.000000'), "
+            "(3, 2, '2021-01-02 10:00:00.000000')",
+            "UPDATE subscriptions SET time_removed = '2021-01-03 00:00:00.000000' "
+            "WHERE user_id = 1 AND movement_id = 1",
+            "DELETE FROM subscriptions WHERE user_id = 3 AND movement_id = 2",
+            "INSERT INTO signals (leader_id, movement_id, time_stamp) VALUES "
+            "(3, 1, '2021-01-02 10:30:00.000000'), "
+            "(3, 1, '2021-01-02 10:45:00.000000'), "
+            "(1, 3, '2021-01-02 23:59:59.999999')",
+            "INSERT INTO announcements (movement_id, user_id, message, created_time) "
+            "VALUES (2, 1, 'Hello!', '2021-01-02 00:00:00.000000')",
+            "UPDATE announcements SET removed_time = '2021-01-03 00:00:00.000000' "
+            "WHERE movement_id = 1",
+        )
+
+        self.assertNoDrift()
+
+    def test_leader_counted_once(self):
+        # A leader row that a concurrent transaction inserted for the bucket.
+        self.execute(
+            "INSERT INTO signal_rollup_leaders "
+            "(movement_id, granularity, bucket, leader_id) VALUES "
+            "(2, 'hour', '2021-01-02 10:00:00.000000', 3)",
+            "INSERT INTO signal_rollups "
+            "(movement_id, granularity, bucket, signals, leaders) VALUES "
+            "(2, 'hour', '2021-01-02 10:00:00.000000', 1, 1)",
+            "INSERT INTO signals (leader_id, movement_id, time_stamp) VALUES "
+            "(3, 2, '2021-01-02 10:30:00.000000')",
+        )
+
+        with self.engine.connect() as connection:
+            leaders = connection.execute(
+                text(
+                    "SELECT granularity, leaders FROM signal_rollups "
+                    "WHERE movement_id = 2 ORDER BY granularity"
+                )
+            ).all()
+        self.assertEqual(leaders, [("day", 1), ("hour", 1)])
@@ -0,0 +1,141 @@
+from unittest import TestCase
+
+from sqlalchemy import create_engine, event, text
+
+from gridt_server.adjacency import AdjacencyIndex
+from gridt_server.counters import repair
+from gridt_server.movements import MovementReader
+from gridt_server.store import MemoryStore
+from gridt_server.tests.base_test import create_schema
+
+
+class MovementReaderTest(TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        create_schema(
+            self.engine,
+            "INSERT INTO users (id, username) VALUES "
+            "(1, 'robin'), (2, 'sam'), (3, 'alex')",
+            "INSERT INTO movements "
+            "(id, name, interval, short_description, description) VALUES "
+            "(1, 'Flossing', 'daily', 'Floss every day.', 'Teeth.'), "
+            "(2, 'Running', 'weekly', 'Run every week.', 'Legs.')",
+            "INSERT INTO subscriptions (user_id, movement_id, time_removed) VALUES "
+            "(1, 1, NULL), (2, 1, NULL), (3, 1, NULL), "
+            "(1, 2, '2021-01-01 00:00:00.000000'), (3, 2, NULL)",
+            "INSERT INTO movement_user_association "
+            "(movement_id, follower_id, leader_id, destroyed) VALUES "
+            "(1, 1, 3, '2021-01-01 00:00:00.000000'), (1, 1, 2, NULL), "
+            "(1, 2, 1, NULL), (1, 3, 1, NULL)",
+            "INSERT INTO signals (leader_id, movement_id, time_stamp, message) VALUES "
+            "(2, 1, '2021-01-01 10:00:00.000000', 'Done!'), "
+            "(2, 1, '2021-01-01 08:00:00.000000', 'Early'), "
+            "(1, 1, '2021-01-01 09:00:00.000000', NULL)",
+        )
+        # The triggers of migration 0003 are not installed here.
+        with self.engine.begin() as connection:
+            repair(connection)
+        self.reader = MovementReader(self.engine)
+
+    def test_all(self):
+        self.assertEqual(
+            self.reader.all(1),
+            [
+                {
+                    "id": 1,
+                    "name": "Flossing",
+                    "short_description": "Floss every day.",
+                    "description": "Teeth.",
+                    "interval": "daily",
+                    "subscribers": 3,
+                    "subscribed": True,
+                    "last_signal_sent": {
+                        "time_stamp": "2021-01-01T09:00:00+00:00",
+                        "message": None,
+                    },
+                    "leaders": [
+                        {
+                            "id": 2,
+                            "username": "sam",
+                            "last_signal": {
+                                "time_stamp": "2021-01-01T10:00:00+00:00",
+                                "message": "Done!",
+                            },
+                        }
+                    ],
+                },
+                {
+                    "id": 2,
+                    "name": "Running",
+                    "short_description": "Run every week.",
+                    "description": "Legs.",
+                    "interval": "weekly",
+                    "subscribers": 1,
+                    "subscribed": False,
+                },
+            ],
+        )
+
+    def test_one(self):
+        movement = self.reader.one(1, 3)
+
+        self.assertEqual(movement["subscribers"], 3)
+        self.assertIsNone(movement["last_signal_sent"])
+        self.assertEqual(
+            movement["leaders"],
+            [
+                {
+                    "id": 1,
+                    "username": "robin",
+                    "last_signal": {
+                        "time_stamp": "2021-01-01T09:00:00+00:00",
+                        "message": None,
+                    },
+                }
+            ],
+        )
+        self.assertIsNone(self.reader.one(3, 1))
+
+    def test_query_count(self):
+        with self.engine.begin() as connection:
+            for movement_id in range(3, 23):
+                connection.execute(
+                    text(
+                        "INSERT INTO movements (id, name, interval) "
+                        f"VALUES ({movement_id}, 'Movement {movement_id}', 'daily')"
+                    )
+                )
+                connection.execute(
+                    text(
+                        "INSERT INTO subscriptions (user_id, movement_id) "
+                        f"VALUES (1, {movement_id})"
+                    )
+                )
+        statements = []
+        event.listen(
+            self.engine,
+            "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+
+        movements = self.reader.all(1)
+
+        self.assertEqual(len(movements), 22)
+        self.assertEqual(len(statements), 4)
+
+    def test_adjacency_index(self):
+        index = AdjacencyIndex(self.engine, MemoryStore())
+        reader = MovementReader(self.engine, index)
+        index.graph(1)
+        expected = self.reader.one(1, 1)
+        statements = []
+        event.listen(
+            self.engine,
+            "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+
+        movement = reader.one(1, 1)
+
+        self.assertEqual(movement, expected)
+        self.assertNotIn("movement_user_association", "".join(statements))
@@ -0,0 +1,64 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from prometheus_client import CollectorRegistry
+from prometheus_client.mmap_dict import MmapedDict, mmap_key
+
+from gridt_server.multiprocess import (
+    InstrumentedMultiProcessCollector,
+    compact_dead_worker,
+    reset_metrics_dir,
+)
+
+
+class MultiprocessTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = self.tmpdir.name
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_counter(self, pid, value):
+        key = mmap_key(
+            "requests", "requests_total", ["endpoint"], ["auth"], "Requests."
+        )
+        metrics_file = MmapedDict(os.path.join(self.path, f"counter_{pid}.db"))
+        metrics_file.write_value(key, value, 0)
+        metrics_file.close()
+
+    def collect(self):
+        registry = CollectorRegistry()
+        InstrumentedMultiProcessCollector(registry, self.path)
+        return registry
+
+    def test_compact_dead_worker(self):
+        self.write_counter(100, 3)
+        self.write_counter(101, 4)
+        self.write_counter(102, 5)
+
+        compact_dead_worker(self.path, 100)
+        compact_dead_worker(self.path, 101)
+
+        self.assertEqual(
+            sorted(os.listdir(self.path)), ["counter_102.db", "counter_archive.db"]
+        )
+        registry = self.collect()
+        self.assertEqual(
+            registry.get_sample_value("requests_total", {"endpoint": "auth"}), 12
+        )
+        self.assertEqual(registry.get_sample_value("gridt_metrics_files"), 2)
+        self.assertIsNotNone(
+            registry.get_sample_value("gridt_metrics_scrape_duration_seconds")
+        )
+
+    def test_reset_metrics_dir(self):
+        self.write_counter(100, 1)
+        self.write_counter("archive", 1)
+        open(os.path.join(self.path, "gauge_livesum_100.db"), "w").close()
+        open(os.path.join(self.path, "unrelated.txt"), "w").close()
+
+        reset_metrics_dir(self.path)
+
+        self.assertEqual(os.listdir(self.path), ["unrelated.txt"])
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import time
+from unittest import TestCase
+
+from flask import Flask
+
+from gridt_server.profiling import (
+    PROFILE_HEADER,
+    ProfileDirectory,
+    install_profiling,
+    profile_token,
+    valid_token,
+)
+
+
+class ProfilingTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.app = Flask(__name__)
+        self.app.config["PROFILE_KEY"] = "profile key"
+        self.app.config["PROFILE_DIR"] = self.tmpdir.name
+        self.app.config["PROFILE_INTERVAL"] = 0.001
+
+        @self.app.route("/slow")
+        def slow():
+            time.sleep(0.05)
+            return "done"
+
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def profiles(self):
+        return os.listdir(self.tmpdir.name)
+
+    def test_disabled(self):
+        app = Flask(__name__)
+        install_profiling(app)
+        self.assertEqual(app.before_request_funcs, {})
+
+    def test_signed_header(self):
+        install_profiling(self.app)
+        header = {PROFILE_HEADER: profile_token("profile key")}
+
+        self.client.get("/slow", headers=header)
+
+        profiles = self.profiles()
+        self.assertEqual(len(profiles), 1)
+        with open(os.path.join(self.tmpdir.name, profiles[0])) as profile:
+            self.assertIn("slow (test_profiling.py", profile.read())
+
+    def test_wrong_signature(self):
+        install_profiling(self.app)
+        header = {PROFILE_HEADER: profile_token("wrong key")}
+
+        self.client.get("/slow", headers=header)
+        self.client.get("/slow")
+
+        self.assertEqual(self.profiles(), [])
+
+    def test_expired_token(self):
+        self.assertFalse(valid_token(profile_token("key", ttl=-1), "key"))
+        self.assertFalse(valid_token("garbage", "key"))
+        self.assertTrue(valid_token(profile_token("key"), "key"))
+
+    def test_sample_rate(self):
+        self.app.config["PROFILE_KEY"] = None
+        self.app.config["PROFILE_SAMPLE_RATE"] = 1
+        install_profiling(self.app)
+
+        self.client.get("/slow")
+
+        self.assertEqual(len(self.profiles()), 1)
+
+    def test_ring_directory(self):
+        directory = ProfileDirectory(self.tmpdir.name, max_files=3)
+        for i in range(5):
+            directory.write("endpoint", {f"stack{i}": 1})
+
+        profiles = sorted(self.profiles())
+        self.assertEqual(len(profiles), 3)
+        with open(os.path.join(self.tmpdir.name, profiles[-1])) as profile:
+            self.assertEqual(profile.read(), "stack4 1\n")
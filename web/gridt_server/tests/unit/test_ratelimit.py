@@ -0,0 +1,182 @@
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from flask_restful import Api, Resource
+
+from gridt_server.ratelimit import install_proxy_fix, rate_limit
+from gridt_server.resources.helpers import jwt_required
+from gridt_server.store import MemoryStore, install_store
+
+
+class MemoryStoreTest(TestCase):
+    def test_take_token(self):
+        store = MemoryStore()
+        with patch("gridt_server.store.time.monotonic", return_value=100):
+            self.assertEqual(store.take_token("key", 2, 0.5), 0)
+            self.assertEqual(store.take_token("key", 2, 0.5), 0)
+            self.assertEqual(store.take_token("key", 2, 0.5), 2)
+        with patch("gridt_server.store.time.monotonic", return_value=101.5):
+            self.assertAlmostEqual(store.take_token("key", 2, 0.5), 0.5)
+        with patch("gridt_server.store.time.monotonic", return_value=102):
+            self.assertEqual(store.take_token("key", 2, 0.5), 0)
+            self.assertEqual(store.take_token("other", 2, 0.5), 0)
+
+    def test_expiry(self):
+        store = MemoryStore()
+        with patch("gridt_server.store.time.monotonic", return_value=100):
+            store.set("key", "value", ttl=10)
+            self.assertEqual(store.get("key"), "value")
+        with patch("gridt_server.store.time.monotonic", return_value=110):
+            self.assertIsNone(store.get("key"))
+
+    def test_max_keys(self):
+        store = MemoryStore(max_keys=2)
+        for key in ("a", "b", "c"):
+            store.set(key, key)
+        self.assertIsNone(store.get("a"))
+        self.assertEqual(store.get("c"), "c")
+
+    def test_get_many(self):
+        store = MemoryStore()
+        with patch("gridt_server.store.time.monotonic", return_value=100):
+            store.set("a", 1)
+            store.set("b", 2, ttl=10)
+        with patch("gridt_server.store.time.monotonic", return_value=110):
+            self.assertEqual(store.get_many(["a", "b", "c"]), [1, None, None])
+        self.assertEqual(store.get_many([]), [])
+
+    def test_update(self):
+        store = MemoryStore()
+        self.assertIsNone(store.update("key", lambda value: value + 1))
+        with patch("gridt_server.store.time.monotonic", return_value=100):
+            store.set("key", 1, ttl=10)
+            self.assertEqual(store.update("key", lambda value: value + 1), 2)
+            self.assertIsNone(store.update("key", lambda value: None))
+            self.assertEqual(store.get("key"), 2)
+        with patch("gridt_server.store.time.monotonic", return_value=110):
+            self.assertIsNone(store.get("key"))
+
+    def test_concurrent_update(self):
+        store = MemoryStore()
+        store.set("key", 0)
+        start = threading.Barrier(20)
+
+        def update():
+            start.wait()
+            for _ in range(50):
+                store.update("key", lambda value: value + 1)
+
+        threads = [threading.Thread(target=update) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(store.get("key"), 1000)
+
+    def test_concurrent_take_token(self):
+        store = MemoryStore()
+        start = threading.Barrier(20)
+        taken = []
+
+        def take():
+            start.wait()
+            for _ in range(50):
+                if store.take_token("key", 100, 0.0001) == 0:
+                    taken.append(1)
+
+        threads = [threading.Thread(target=take) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(taken), 100)
+
+
+class RateLimitTest(TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["SECRET_KEY"] = "secret"
+        self.app.config["JWT_HEADER_TYPE"] = "JWT"
+        self.app.config["PROXY_COUNT"] = 1
+        self.app.config["RATE_LIMITS"] = {
+            "login": {"capacity": 2, "rate": 0.1, "key": "ip"},
+            "signal": {"capacity": 1, "rate": 0.01, "key": "identity"},
+        }
+        api = Api(self.app)
+        JWTManager(self.app)
+        install_proxy_fix(self.app)
+        install_store(self.app)
+
+        class Login(Resource):
+            @rate_limit("login")
+            def post(self):
+                return {"message": "ok"}
+
+        class Signal(Resource):
+            @jwt_required()
+            @rate_limit("signal")
+            def post(self):
+                return {"message": "ok"}, 201
+
+        class Other(Resource):
+            @rate_limit("other")
+            def post(self):
+                return {"message": "ok"}
+
+        api.add_resource(Login, "/auth")
+        api.add_resource(Signal, "/signal")
+        api.add_resource(Other, "/other")
+        self.client = self.app.test_client()
+
+    def login(self, ip):
+        return self.client.post("/auth", headers={"X-Forwarded-For": ip})
+
+    def test_per_ip(self):
+        self.assertEqual(self.login("1.1.1.1").status_code, 200)
+        self.assertEqual(self.login("1.1.1.1").status_code, 200)
+
+        resp = self.login("1.1.1.1")
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(resp.headers["Retry-After"], "10")
+        self.assertEqual(
+            resp.get_json()["message"], "Too many requests, try again later."
+        )
+
+        self.assertEqual(self.login("2.2.2.2").status_code, 200)
+
+    def test_per_identity(self):
+        with self.app.app_context():
+            first = {"Authorization": f"JWT {create_access_token('1')}"}
+            second = {"Authorization": f"JWT {create_access_token('2')}"}
+
+        self.assertEqual(self.client.post("/signal", headers=first).status_code, 201)
+        resp = self.client.post("/signal", headers=first)
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(resp.headers["Retry-After"], "100")
+        self.assertEqual(self.client.post("/signal", headers=second).status_code, 201)
+
+    def test_unconfigured(self):
+        for _ in range(5):
+            self.assertEqual(self.client.post("/other").status_code, 200)
+
+    def test_concurrent_requests(self):
+        start = threading.Barrier(10)
+        codes = []
+
+        def post():
+            start.wait()
+            codes.append(self.login("3.3.3.3").status_code)
+
+        threads = [threading.Thread(target=post) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(codes.count(200), 2)
+        self.assertEqual(codes.count(429), 8)
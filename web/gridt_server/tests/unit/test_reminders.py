@@ -0,0 +1,142 @@
+import json
+from datetime import datetime
+from unittest import TestCase
+
+from flask import Flask
+from sqlalchemy import create_engine
+
+from gridt_server.reminders import (
+    EVENTS_KEY,
+    ReminderScheduler,
+    epoch,
+    next_due,
+    install_reminder_events,
+)
+from gridt_server.events import emit
+from gridt_server.store import MemoryStore, install_store
+from gridt_server.tests.base_test import create_schema
+
+HOUR = 60 * 60
+NOW = epoch(datetime(2021, 1, 1, 12))
+
+
+class NextDueTest(TestCase):
+    def test_next_due(self):
+        self.assertEqual(next_due(0, 100, 0.1, now=10), 90)
+        self.assertEqual(next_due(0, 100, 0.1, now=95), 190)
+        self.assertEqual(next_due(0, 100, 0.1, now=1000), 1090)
+
+
+class ReminderEventsTest(TestCase):
+    def test_disabled(self):
+        app = Flask(__name__)
+        store = install_store(app)
+        install_reminder_events(app)
+        with app.app_context():
+            emit("signal", 1, 2)
+        self.assertEqual(store.pop(EVENTS_KEY, 10), [])
+
+    def enabled_app(self):
+        app = Flask(__name__)
+        app.config["REMINDERS"] = True
+        app.config["STORE_BACKEND"] = "redis"
+        app.config["REMINDER_TEMPLATE"] = "d-reminder"
+        # Stands in for the redis store.
+        app.extensions["store"] = MemoryStore()
+        return app
+
+    def test_publish(self):
+        app = self.enabled_app()
+        store = app.extensions["store"]
+        install_reminder_events(app)
+        with app.app_context():
+            emit("signal", 1, 2)
+            emit("unsubscribe", 1, 3)
+
+        events = [json.loads(event)[:3] for event in store.pop(EVENTS_KEY, 10)]
+        self.assertEqual(events, [["signal", 1, 2], ["unsubscribe", 1, 3]])
+
+    def test_events_limit(self):
+        app = self.enabled_app()
+        app.config["REMINDER_EVENTS_LIMIT"] = 2
+        store = app.extensions["store"]
+        install_reminder_events(app)
+        with app.app_context():
+            for movement_id in (1, 2, 3):
+                emit("signal", 1, movement_id)
+
+        events = [json.loads(event)[2] for event in store.pop(EVENTS_KEY, 10)]
+        self.assertEqual(events, [2, 3])
+
+    def test_requires_redis_and_template(self):
+        app = self.enabled_app()
+        app.config["STORE_BACKEND"] = "memory"
+        with self.assertRaises(RuntimeError):
+            install_reminder_events(app)
+
+        app = self.enabled_app()
+        app.config["REMINDER_TEMPLATE"] = ""
+        with self.assertRaises(RuntimeError):
+            install_reminder_events(app)
+
+
+class ReminderSchedulerTest(TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        create_schema(
+            self.engine,
+            "INSERT INTO movements (id, name, interval) VALUES "
+            "(1, 'hourly', 'hourly'), (2, 'daily', 'daily')",
+            "INSERT INTO subscriptions (id, user_id, movement_id, time_added, "
+            "time_removed) VALUES (1, 1, 1, '2021-01-01 11:30:00', NULL), "
+            "(2, 2, 1, '2021-01-01 10:00:00', NULL), "
+            "(3, 3, 1, '2021-01-01 10:00:00', '2021-01-01 11:00:00'), "
+            "(4, 1, 2, '2020-12-31 12:00:00', NULL)",
+            "INSERT INTO signals (id, leader_id, movement_id, time_stamp, message) "
+            "VALUES (1, 2, 1, '2021-01-01 11:40:00', NULL), "
+            "(2, 2, 1, '2021-01-01 11:50:00', NULL)",
+        )
+        self.store = MemoryStore()
+        self.sent = []
+        self.scheduler = ReminderScheduler(
+            self.engine, self.store, self.sent.append, lead=0.1, batch_size=2
+        )
+        self.scheduler.rebuild(NOW)
+
+    def test_rebuild(self):
+        wheel = self.scheduler.wheel
+        self.assertEqual(len(wheel), 3)
+        self.assertEqual(wheel.due((1, 1)), NOW - 30 * 60 + 0.9 * HOUR)
+        self.assertEqual(wheel.due((2, 1)), NOW - 10 * 60 + 0.9 * HOUR)
+        # Missed the reminder of this interval, so the next one is the one of
+        # the next interval.
+        self.assertEqual(wheel.due((1, 2)), NOW + 0.9 * 24 * HOUR)
+        self.assertNotIn((3, 1), wheel)
+
+    def test_dispatch_batches(self):
+        self.assertEqual(self.scheduler.dispatch(NOW + HOUR), 2)
+        self.assertEqual(self.sent, [[(1, 1), (2, 1)]])
+        self.assertEqual(self.scheduler.wheel.due((1, 1)), NOW - 30 * 60 + 1.9 * HOUR)
+
+        self.scheduler.wheel.schedule((4, 1), NOW + HOUR)
+        self.scheduler.wheel.schedule((5, 1), NOW + HOUR)
+        self.scheduler.dispatch(NOW + 2 * HOUR)
+        self.assertEqual([len(batch) for batch in self.sent], [2, 2, 2])
+
+    def test_events(self):
+        self.store.push(
+            EVENTS_KEY,
+            json.dumps(["signal", 1, 1, NOW]),
+            json.dumps(["unsubscribe", 2, 1, NOW]),
+            json.dumps(["subscribe", 4, 2, NOW]),
+            json.dumps(["signal", 1, 2, NOW - 48 * HOUR]),
+        )
+        self.scheduler.drain_events()
+
+        wheel = self.scheduler.wheel
+        self.assertEqual(wheel.due((1, 1)), NOW + 0.9 * HOUR)
+        self.assertNotIn((2, 1), wheel)
+        self.assertEqual(wheel.due((4, 2)), NOW + 0.9 * 24 * HOUR)
+        # An old signal does not move the reminder back.
+        self.assertEqual(wheel.due((1, 2)), NOW + 0.9 * 24 * HOUR)
+        self.assertEqual(self.store.pop(EVENTS_KEY, 10), [])
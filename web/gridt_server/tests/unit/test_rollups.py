@@ -0,0 +1,127 @@
+from datetime import datetime
+from unittest import TestCase
+
+from sqlalchemy import create_engine, text
+
+from gridt_server.rollups import ActivityStats, Bucket, drift, repair, truncate
+from gridt_server.tests.base_test import create_schema
+
+
+class TruncateTest(TestCase):
+    def test_truncate(self):
+        moment = datetime(2021, 1, 1, 11, 40, 12, 5)
+        self.assertEqual(truncate(moment, "hour"), datetime(2021, 1, 1, 11))
+        self.assertEqual(truncate(moment, "day"), datetime(2021, 1, 1))
+
+
+class RollupsTest(TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        create_schema(
+            self.engine,
+            "INSERT INTO signals (id, leader_id, movement_id, time_stamp) VALUES "
+            "(1, 1, 1, '2021-01-01 11:00:00.000000'), "
+            "(2, 1, 1, '2021-01-01 11:59:00.000000'), "
+            "(3, 2, 1, '2021-01-01 12:00:00.000000'), "
+            "(4, 1, 1, '2021-01-02 08:00:00.000000'), "
+            "(5, 1, 2, '2021-01-01 11:00:00.000000')",
+            "INSERT INTO signals_archive (id, leader_id, movement_id, time_stamp) "
+            "VALUES (6, 2, 2, '2021-01-01 11:10:00.000000')",
+            "INSERT INTO movement_stats (movement_id, subscribers, last_signal_sent) "
+            "VALUES (1, 3, '2021-01-02 08:00:00.000000')",
+        )
+        self.stats = ActivityStats(self.engine, max_buckets=48)
+
+    def test_repair(self):
+        with self.engine.begin() as connection:
+            self.assertEqual(len(drift(connection)), 7)
+            repair(connection)
+            connection.execute(
+                text("UPDATE signal_rollups SET signals = 9 WHERE granularity = 'day'")
+            )
+
+            found = drift(connection)
+            self.assertEqual(
+                [item.key for item in found],
+                [
+                    (1, "day", datetime(2021, 1, 1)),
+                    (1, "day", datetime(2021, 1, 2)),
+                    (2, "day", datetime(2021, 1, 1)),
+                ],
+            )
+            self.assertEqual(found[0].expected, Bucket(signals=3, leaders=2))
+            # Archived signals are counted too.
+            self.assertEqual(found[2].expected, Bucket(signals=2, leaders=2))
+
+            repair(connection)
+            self.assertEqual(drift(connection), [])
+
+    def test_repair_leaders(self):
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    "INSERT INTO signal_rollup_leaders "
+                    "(movement_id, granularity, bucket, leader_id) VALUES "
+                    "(1, 'hour', '2021-01-01 11:00:00.000000', 7)"
+                )
+            )
+            repair(connection)
+            leaders = connection.execute(
+                text(
+                    "SELECT bucket, leader_id FROM signal_rollup_leaders "
+                    "WHERE movement_id = 2 OR granularity = 'hour' "
+                    "ORDER BY movement_id, granularity, bucket, leader_id"
+                )
+            ).all()
+
+        self.assertEqual(
+            [(str(bucket)[:13], leader_id) for bucket, leader_id in leaders],
+            [
+                ("2021-01-01 11", 1),
+                ("2021-01-01 12", 2),
+                ("2021-01-02 08", 1),
+                ("2021-01-01 00", 1),
+                ("2021-01-01 00", 2),
+                ("2021-01-01 11", 1),
+                ("2021-01-01 11", 2),
+            ],
+        )
+
+    def test_activity(self):
+        with self.engine.begin() as connection:
+            repair(connection)
+
+        activity = self.stats.activity(
+            1, "hour", datetime(2021, 1, 1, 10, 30), datetime(2021, 1, 1, 13)
+        )
+        self.assertEqual(activity["from"], "2021-01-01T10:00:00+00:00")
+        self.assertEqual(activity["subscribers"], 3)
+        self.assertEqual(activity["last_signal_sent"], "2021-01-02T08:00:00+00:00")
+        self.assertEqual(
+            activity["buckets"],
+            [
+                {"start": "2021-01-01T10:00:00+00:00", "signals": 0, "leaders": 0},
+                {"start": "2021-01-01T11:00:00+00:00", "signals": 2, "leaders": 1},
+                {"start": "2021-01-01T12:00:00+00:00", "signals": 1, "leaders": 1},
+            ],
+        )
+
+        activity = self.stats.activity(
+            1, "day", datetime(2021, 1, 1), datetime(2021, 1, 3)
+        )
+        self.assertEqual(
+            [(bucket["signals"], bucket["leaders"]) for bucket in activity["buckets"]],
+            [(3, 2), (1, 1)],
+        )
+
+    def test_buckets(self):
+        self.assertEqual(
+            self.stats.buckets(
+                datetime(2021, 1, 1, 10, 30), datetime(2021, 1, 1, 13), "hour"
+            ),
+            3,
+        )
+        self.assertEqual(
+            self.stats.buckets(datetime(2021, 1, 1), datetime(2021, 1, 1, 0, 1), "day"),
+            1,
+        )
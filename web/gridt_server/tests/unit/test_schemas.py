@@ -2,19 +2,20 @@ from marshmallow import ValidationError
 
 from gridt_server.tests.base_test import BaseTest
 from gridt_server.schemas import (
+    LeaderSchema,
     MovementSchema,
+    SignalSchema,
     RequestEmailChangeSchema,
     ChangeEmailSchema,
 )
 
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 import jwt
 
 
 class SchemasTest(BaseTest):
-    @patch("gridt_server.schemas.movement_name_exists", return_value=False)
-    def test_movement_schema_long(self, mock_name_exists):
+    def test_movement_schema_long(self):
         with self.app_context():
             proper_movement = {
                 "name": "flossing",
@@ -27,10 +28,8 @@ class SchemasTest(BaseTest):
             schema = MovementSchema()
             res = schema.load(proper_movement)
             self.assertEqual(res, proper_movement)
-            mock_name_exists.assert_called_once_with("flossing")
 
-    @patch("gridt_server.schemas.movement_name_exists", return_value=False)
-    def test_movement_schema_short2(self, mock_name_exists):
+    def test_movement_schema_short2(self):
         with self.app_context():
             proper_movement = {
                 "name": "flossing",
@@ -42,10 +41,8 @@ class SchemasTest(BaseTest):
             schema = MovementSchema()
             res = schema.load(proper_movement)
             self.assertEqual(res["name"], "flossing")
-            mock_name_exists.assert_called_once_with("flossing")
 
-    @patch("gridt_server.schemas.movement_name_exists", return_value=False)
-    def test_movement_schema_bad_interval(self, mock_name_exists):
+    def test_movement_schema_bad_interval(self):
         with self.app_context():
             bad_movement = {"name": "flossing", "interval": "daily"}
 
@@ -57,7 +54,6 @@ class SchemasTest(BaseTest):
                     error.exception.messages,
                     {"short_description": ["Missing data for required field."],},
                 )
-            mock_name_exists.assert_called_once_with("flossing")
 
     def test_movement_schema_lengths(self):
         bad_movement = {
@@ -186,3 +182,46 @@ class SchemasTest(BaseTest):
             "secr3t",
             algorithms=["HS256"]
         )
+
+    @patch("gridt_server.schemas.follows_leader", return_value=True)
+    @patch("gridt_server.schemas.user_exists", return_value=True)
+    @patch("gridt_server.schemas.is_subscribed", return_value=True)
+    @patch("gridt_server.schemas.movement_exists", return_value=True)
+    def test_leader_schema_adjacency_index(
+        self, mock_movement_exists, mock_is_subscribed, mock_user_exists, mock_follows
+    ):
+        index = Mock()
+        index.follows.side_effect = lambda follower, movement, leader: leader == 2
+        self.app.extensions["adjacency_index"] = index
+        schema = LeaderSchema()
+
+        with self.app_context():
+            # An edge in the index needs no query, a missing one is checked.
+            schema.load({"movement_id": 1, "follower_id": 3, "leader_id": 2})
+            mock_user_exists.assert_not_called()
+            mock_follows.assert_not_called()
+
+            schema.load({"movement_id": 1, "follower_id": 3, "leader_id": 4})
+            mock_follows.assert_called_once_with(3, 1, 4)
+
+            mock_follows.return_value = False
+            with self.assertRaises(ValidationError):
+                schema.load({"movement_id": 1, "follower_id": 3, "leader_id": 4})
+
+    @patch("gridt_server.schemas.is_subscribed", return_value=False)
+    @patch("gridt_server.schemas.user_exists", return_value=True)
+    @patch("gridt_server.schemas.movement_exists", return_value=True)
+    def test_signal_schema_subscription_index(
+        self, mock_movement_exists, mock_user_exists, mock_is_subscribed
+    ):
+        index = Mock()
+        index.contains.side_effect = lambda user, movement: movement == 1
+        self.app.extensions["subscription_index"] = index
+        schema = SignalSchema()
+
+        with self.app_context():
+            schema.load({"movement_id": 1, "leader_id": 3})
+            with self.assertRaises(ValidationError):
+                schema.load({"movement_id": 2, "leader_id": 3})
+
+        mock_is_subscribed.assert_called_once_with(3, 2)
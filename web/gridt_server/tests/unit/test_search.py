@@ -0,0 +1,141 @@
+import random
+from unittest import TestCase
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, text
+
+from gridt_server.search import MovementSearch, words
+from gridt_server.store import MemoryStore
+from gridt_server.tests.base_test import create_schema
+
+
+class WordsTest(TestCase):
+    def test_words(self):
+        self.assertEqual(words("Floss, every DAY!"), ["floss", "every", "day"])
+        self.assertEqual(words(None), [])
+
+
+class MovementSearchTest(TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        create_schema(
+            self.engine,
+            "INSERT INTO movements (id, name, interval, short_description) VALUES "
+            "(1, 'Flossing', 'daily', 'Floss your teeth every day.'), "
+            "(2, 'Running', 'weekly', 'Run a few kilometres.'), "
+            "(3, 'Daily run', 'daily', 'Before work, every day.'), "
+            "(4, 'Reading', 'daily', 'Read about running or flossing.')",
+        )
+        self.store = MemoryStore()
+        # Two workers that share the store.
+        self.search = MovementSearch(self.engine, self.store)
+        self.other = MovementSearch(self.engine, self.store)
+
+    def execute(self, *statements):
+        with self.engine.begin() as connection:
+            for statement in statements:
+                connection.execute(text(statement))
+
+    def ids(self, query, **kwargs):
+        return [movement["id"] for movement in self.search.search(query, **kwargs)]
+
+    def test_ranking(self):
+        # A name beats a short description and a whole word beats a prefix.
+        self.assertEqual(self.ids("run"), [3, 2, 4])
+        self.assertEqual(self.ids("floss"), [1, 4])
+        # The name bonus puts an exact name first.
+        self.assertEqual(self.ids("daily run"), [3])
+
+    def test_all_words(self):
+        self.assertEqual(self.ids("every day"), [1, 3])
+        self.assertEqual(self.ids("every day floss"), [1])
+        self.assertEqual(self.ids("swimming"), [])
+        self.assertEqual(self.ids("..."), [])
+
+    def test_short_prefix(self):
+        self.assertEqual(self.ids("fl"), [])
+        self.assertEqual(self.ids("a"), [2])
+
+    def test_pagination(self):
+        self.assertEqual(self.ids("run", limit=2), [3, 2])
+        self.assertEqual(self.ids("run", limit=2, offset=2), [4])
+
+    def test_result(self):
+        self.assertEqual(
+            self.search.search("flossing")[0],
+            {
+                "id": 1,
+                "name": "Flossing",
+                "short_description": "Floss your teeth every day.",
+                "interval": "daily",
+            },
+        )
+
+    def test_memory_reads(self):
+        self.ids("run")
+        with patch.object(self.engine, "connect", side_effect=AssertionError):
+            self.assertEqual(self.ids("reading"), [4])
+
+    def test_created(self):
+        self.ids("run")
+        self.other.search("run")
+
+        self.execute(
+            "INSERT INTO movements (id, name, interval, short_description) VALUES "
+            "(5, 'Running club', 'daily', 'Run together.')"
+        )
+        self.other.created(user_id=1)
+
+        self.assertEqual(self.ids("running"), [2, 5, 4])
+        self.assertIn("running", self.search.vocabulary)
+        self.assertEqual(self.search.vocabulary, sorted(self.search.postings))
+
+    def test_refresh(self):
+        self.search.refresh = 0
+        self.ids("run")
+        self.execute(
+            "INSERT INTO movements (id, name, interval, short_description) VALUES "
+            "(5, 'Runners', 'daily', NULL)"
+        )
+        self.assertEqual(self.ids("runners"), [5])
+
+    def test_load_without_lock(self):
+        load = self.search.load
+
+        def unlocked(*args, **kwargs):
+            self.assertFalse(self.search.lock.locked())
+            return load(*args, **kwargs)
+
+        with patch.object(self.search, "load", side_effect=unlocked) as mock_load:
+            self.ids("run")
+            self.search.refresh = 0
+            self.assertEqual(self.ids("reading"), [4])
+        self.assertEqual(mock_load.call_count, 2)
+
+    def test_rank(self):
+        # Stopping early ranks like scoring every movement would.
+        rand = random.Random(0)
+        vocabulary = ["run", "runner", "floss", "read", "walk", "ab", "day"]
+        search = MovementSearch(engine=None, store=None)
+        search.loaded_at = 0
+        for movement_id in range(1, 300):
+            search.add(
+                movement_id,
+                " ".join(rand.choices(vocabulary, k=2)),
+                " ".join(rand.choices(vocabulary, k=4)),
+                "daily",
+            )
+
+        for query in ("run", "ab", "run day", "runn walk ab", "floss read"):
+            terms = query.split()
+            scores = {}
+            for movement_id in search.documents:
+                term_scores = [search.score(term, movement_id) for term in terms]
+                if all(term_scores):
+                    scores[movement_id] = sum(term_scores)
+            expected = sorted(
+                scores, key=lambda movement_id: (-scores[movement_id], movement_id)
+            )
+            self.assertEqual(
+                search.rank(terms, 10, exclude=set()), expected[:10], query
+            )
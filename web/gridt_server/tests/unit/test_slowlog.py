@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import time
+from unittest import TestCase
+
+from flask import Flask
+from sqlalchemy import create_engine, text
+
+from gridt_server.instrumentation import install_instrumentation
+from gridt_server.slowlog import RateLimiter, install_slow_request_log
+
+
+class SlowRequestLogTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.tmpdir.name, "slow.log")
+
+        self.app = Flask(__name__)
+        self.app.config["SLOW_REQUEST_THRESHOLD"] = 0.02
+        self.app.config["SLOW_REQUEST_LOG"] = self.log_path
+        self.app.config["SLOW_REQUEST_LOG_BURST"] = 1
+        self.app.config["SLOW_REQUEST_LOG_RATE"] = 0.001
+        engine = create_engine("sqlite://")
+        install_instrumentation(self.app, engine)
+        install_slow_request_log(self.app)
+
+        @self.app.route("/movements/<movement_id>/slow")
+        def slow(movement_id):
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            time.sleep(0.1)
+            return "done"
+
+        @self.app.route("/fast")
+        def fast():
+            return "done"
+
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def entries(self):
+        if not os.path.exists(self.log_path):
+            return []
+        with open(self.log_path) as log:
+            return [json.loads(line) for line in log]
+
+    def test_slow_request_logged(self):
+        self.client.get("/fast")
+        self.client.get("/movements/3/slow")
+
+        entries = self.entries()
+        self.assertEqual(len(entries), 1)
+        entry = entries[0]
+        self.assertEqual(entry["endpoint"], "slow")
+        self.assertEqual(entry["status"], 200)
+        self.assertEqual(entry["params"], {"movement_id": "3"})
+        self.assertIsNone(entry["identity"])
+        self.assertEqual(entry["queries"][0]["statement"], "SELECT 1")
+        self.assertIn("total", entry["phases_ms"])
+        self.assertTrue(
+            any("slow (test_slowlog.py" in stack for stack in entry["stacks"])
+        )
+
+    def test_rate_limited(self):
+        self.client.get("/movements/3/slow")
+        self.client.get("/movements/3/slow")
+
+        self.assertEqual(len(self.entries()), 1)
+
+    def test_rate_limiter(self):
+        limiter = RateLimiter(rate=1000, burst=2)
+        self.assertTrue(limiter.allow())
+        self.assertTrue(limiter.allow())
+        self.assertFalse(limiter.allow())
+        time.sleep(0.01)
+        self.assertTrue(limiter.allow())
@@ -0,0 +1,99 @@
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+
+from flask import Flask
+from sqlalchemy import create_engine, text
+
+from gridt_server.store import MemoryStore, install_store
+from gridt_server.tests.base_test import create_schema
+from gridt_server.throttle import SignalThrottle, install_signal_throttle
+
+
+class SignalThrottleTest(TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        create_schema(
+            self.engine,
+            "INSERT INTO movements (id, interval) VALUES (1, 'hourly'), (2, 'unknown')",
+        )
+        self.throttle = SignalThrottle(MemoryStore(), self.engine, fraction=0.5)
+
+    def test_gap(self):
+        self.assertEqual(self.throttle.gap(1), 1800)
+        self.assertEqual(self.throttle.gap(2), 0)
+        self.assertEqual(self.throttle.gap(3), 0)
+
+    def test_gap_cached(self):
+        self.throttle.gap(1)
+        with patch.object(self.engine, "connect", side_effect=AssertionError):
+            self.assertEqual(self.throttle.gap(1), 1800)
+
+    def test_claim(self):
+        with patch("gridt_server.throttle.time.time", return_value=1000):
+            self.assertEqual(self.throttle.claim(5, 1), 0)
+        with patch("gridt_server.throttle.time.time", return_value=1600):
+            self.assertEqual(self.throttle.claim(5, 1), 1200)
+            self.assertEqual(self.throttle.claim(6, 1), 0)
+
+    def test_claim_after_restart(self):
+        # 2021-01-01 10:00:00 UTC
+        signalled = 1609495200
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    "INSERT INTO leader_signals (movement_id, leader_id, last_signal) "
+                    "VALUES (1, 5, '2021-01-01 10:00:00.000000')"
+                )
+            )
+
+        with patch("gridt_server.throttle.time.time", return_value=signalled + 600):
+            self.assertEqual(self.throttle.claim(5, 1), 1200)
+            with patch.object(self.engine, "connect", side_effect=AssertionError):
+                self.assertEqual(self.throttle.claim(5, 1), 1200)
+        restarted = SignalThrottle(MemoryStore(), self.engine, fraction=0.5)
+        with patch("gridt_server.throttle.time.time", return_value=signalled + 1800):
+            self.assertEqual(restarted.claim(5, 1), 0)
+
+    def test_unknown_interval_not_throttled(self):
+        self.assertEqual(self.throttle.claim(5, 2), 0)
+        self.assertEqual(self.throttle.claim(5, 2), 0)
+
+    def test_release(self):
+        self.throttle.claim(5, 1)
+        self.throttle.release(5, 1)
+        self.assertEqual(self.throttle.claim(5, 1), 0)
+
+    @patch.object(SignalThrottle, "last_signal", return_value=None)
+    def test_concurrent_claims(self, mock_last_signal):
+        self.throttle.gap(1)
+        start = threading.Barrier(10)
+        claimed = []
+
+        def claim():
+            start.wait()
+            if self.throttle.claim(5, 1) == 0:
+                claimed.append(1)
+
+        threads = [threading.Thread(target=claim) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(claimed), 1)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            SignalThrottle(MemoryStore(), self.engine, mode="drop")
+
+
+class InstallSignalThrottleTest(TestCase):
+    def test_memory_store_with_workers(self):
+        app = Flask(__name__)
+        app.config["SIGNAL_THROTTLE"] = "reject"
+        install_store(app)
+
+        with patch.dict("os.environ", {"WEB_CONCURRENCY": "2"}):
+            with self.assertRaises(RuntimeError):
+                install_signal_throttle(app, engine=None)
@@ -0,0 +1,76 @@
+import math
+import random
+from unittest import TestCase
+
+from gridt_server.timingwheel import TimingWheel
+
+
+class TimingWheelTest(TestCase):
+    def test_advance(self):
+        wheel = TimingWheel(now=1000)
+        wheel.schedule("a", 1010)
+        wheel.schedule("b", 1100)
+        wheel.schedule("c", 1000 + 3 * 24 * 60 * 60)
+
+        self.assertEqual(wheel.advance(1009), [])
+        self.assertEqual(wheel.advance(1010), [("a", 1010)])
+        self.assertEqual(wheel.advance(2000), [("b", 1100)])
+        self.assertEqual(len(wheel), 1)
+        self.assertEqual(
+            wheel.advance(1000 + 4 * 24 * 60 * 60), [("c", 1000 + 3 * 24 * 60 * 60)]
+        )
+        self.assertEqual(len(wheel), 0)
+
+    def test_reschedule(self):
+        wheel = TimingWheel(now=0)
+        wheel.schedule("a", 10)
+        wheel.schedule("a", 100)
+
+        self.assertEqual(wheel.due("a"), 100)
+        self.assertEqual(wheel.advance(50), [])
+        self.assertEqual(wheel.advance(100), [("a", 100)])
+
+    def test_cancel(self):
+        wheel = TimingWheel(now=0)
+        wheel.schedule("a", 10)
+        wheel.cancel("a")
+        wheel.cancel("b")
+
+        self.assertNotIn("a", wheel)
+        self.assertEqual(wheel.advance(20), [])
+
+    def test_past(self):
+        wheel = TimingWheel(now=100)
+        wheel.schedule("a", 50)
+
+        self.assertEqual(wheel.advance(100), [("a", 50)])
+
+    def test_matches_brute_force(self):
+        rand = random.Random(0)
+        now = 12345.6
+        # Small wheels, so that timers cascade and overflow often.
+        wheel = TimingWheel(now, bits=3, levels=3)
+        timers = {}
+        for _ in range(5000):
+            action = rand.random()
+            if action < 0.5:
+                key = rand.randrange(200)
+                timers[key] = now + rand.choice(
+                    [rand.uniform(-5, 10), rand.uniform(0, 5000)]
+                )
+                wheel.schedule(key, timers[key])
+            elif action < 0.6:
+                key = rand.randrange(200)
+                wheel.cancel(key)
+                timers.pop(key, None)
+            else:
+                now += rand.choice([0.5, 1, 70, rand.uniform(0, 900)])
+                expected = {
+                    key: due
+                    for key, due in timers.items()
+                    if math.ceil(due) <= math.floor(now)
+                }
+                self.assertEqual(dict(wheel.advance(now)), expected)
+                for key in expected:
+                    del timers[key]
+            self.assertEqual(len(wheel), len(timers))
@@ -0,0 +1,146 @@
+"""
+Signal throttle
+***************
+
+A movement has an interval, like ``"daily"``, but nothing stops a leader from
+signalling many times per interval and every signal is written to the
+database and sent to the followers. With ``SIGNAL_THROTTLE`` set, a leader
+can signal once per ``SIGNAL_THROTTLE_FRACTION`` (default 0.5) of the interval
+of the movement: ::
+
+    SIGNAL_THROTTLE = "reject"
+    SIGNAL_THROTTLE_FRACTION = 0.5
+
+The time of the last accepted signal of every leader in every movement is
+kept in the store (see :mod:`gridt_server.store`, which should be shared)
+with an expiry of the minimal gap, so the index stays small and is shared by
+all workers. A signal is only accepted when it can claim its key, which is
+atomic, so two workers never accept the same signal twice. When the key is
+missing, the last signal of the leader is read from ``leader_signals`` (see
+:mod:`gridt_server.counters`) first, so a restart or a flushed store does
+not open the window again.
+
+Signals that come too early are, depending on ``SIGNAL_THROTTLE``:
+
+- ``"reject"``: answered with a 429 and a ``Retry-After`` header.
+- ``"coalesce"``: answered with a 202 and ``"coalesced": true``, the signal
+  is merged into the previous one and nothing is written.
+
+They are counted in ``signals_throttled_total``. The intervals of movements
+do not change, so every worker caches them after reading them once.
+"""
+import time
+from datetime import timezone
+
+from flask import current_app
+from prometheus_client import Counter
+from sqlalchemy import and_, select
+
+from gridt_server.store import require_shared_store
+from gridt_server.tables import leader_signals, movements
+
+SIGNALS_THROTTLED = Counter(
+    "signals_throttled_total",
+    "Signals rejected or coalesced because they came too soon after the previous one.",
+    ["mode"],
+)
+
+INTERVAL_SECONDS = {
+    "1 minute": 60,
+    "15 minutes": 15 * 60,
+    "30 minutes": 30 * 60,
+    "hourly": 60 * 60,
+    "twice daily": 12 * 60 * 60,
+    "daily": 24 * 60 * 60,
+    "weekly": 7 * 24 * 60 * 60,
+}
+
+MODES = ("reject", "coalesce")
+
+
+class SignalThrottle:
+    def __init__(self, store, engine, mode="reject", fraction=0.5):
+        if mode not in MODES:
+            raise ValueError(f"Unknown SIGNAL_THROTTLE {mode}.")
+        self.store = store
+        self.engine = engine
+        self.mode = mode
+        self.fraction = fraction
+        self._gaps = {}
+
+    def gap(self, movement_id):
+        """Return the minimal number of seconds between two signals."""
+        if movement_id not in self._gaps:
+            with self.engine.connect() as connection:
+                interval = connection.execute(
+                    select(movements.c.interval).where(movements.c.id == movement_id)
+                ).scalar()
+            self._gaps[movement_id] = INTERVAL_SECONDS.get(interval, 0) * self.fraction
+        return self._gaps[movement_id]
+
+    @staticmethod
+    def key(leader_id, movement_id):
+        return f"signal:{movement_id}:{leader_id}"
+
+    def last_signal(self, leader_id, movement_id):
+        """Return the time of the last signal of the leader, as a timestamp."""
+        with self.engine.connect() as connection:
+            last = connection.execute(
+                select(leader_signals.c.last_signal).where(
+                    and_(
+                        leader_signals.c.movement_id == movement_id,
+                        leader_signals.c.leader_id == leader_id,
+                    )
+                )
+            ).scalar()
+        return last.replace(tzinfo=timezone.utc).timestamp() if last else None
+
+    def claim(self, leader_id, movement_id):
+        """
+        Claim the next signal of a leader in a movement. Return 0 when it was
+        claimed, otherwise the number of seconds until it can be claimed.
+        """
+        gap = self.gap(movement_id)
+        if not gap:
+            return 0
+
+        key = self.key(leader_id, movement_id)
+        # Another worker can claim or the claim can expire between the calls,
+        # so try twice.
+        for _ in range(2):
+            now = time.time()
+            last = self.store.get(key)
+            if last is None:
+                last = self.last_signal(leader_id, movement_id)
+                if last is None or last + gap <= now:
+                    if self.store.add(key, now, ttl=gap):
+                        return 0
+                    continue
+                self.store.add(key, last, ttl=last + gap - now)
+            return max(float(last) + gap - now, 0.001)
+        return gap
+
+    def release(self, leader_id, movement_id):
+        """Undo a claim, when the signal could not be written."""
+        self.store.delete(self.key(leader_id, movement_id))
+
+
+def get_signal_throttle():
+    """Return the signal throttle of the current app, or None if it has none."""
+    return current_app.extensions.get("signal_throttle")
+
+
+def install_signal_throttle(app, engine):
+    mode = app.config.get("SIGNAL_THROTTLE")
+    if not mode:
+        return None
+    require_shared_store(app, "SIGNAL_THROTTLE")
+
+    throttle = SignalThrottle(
+        app.extensions["store"],
+        engine,
+        mode,
+        app.config.get("SIGNAL_THROTTLE_FRACTION", 0.5),
+    )
+    app.extensions["signal_throttle"] = throttle
+    return throttle
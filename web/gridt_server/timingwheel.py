@@ -0,0 +1,111 @@
+"""
+Timing wheel
+************
+
+A hierarchical timing wheel, which keeps a large number of timers and finds
+the ones that are due in constant time per timer, as opposed to a heap, where
+every operation is logarithmic, or scanning all timers.
+
+Time is divided into ticks. The first wheel has a slot for each of the next
+``size`` ticks, the second wheel a slot for each of the next ``size`` blocks of
+``size`` ticks and so on. When the first wheel has made a full turn, the next
+slot of the second wheel is emptied into the first one, which is called a
+cascade. With the defaults (a tick of a second, four wheels of 64 slots)
+timers up to 194 days ahead fit in the wheels; later timers are kept apart
+until they do.
+
+Every timer has a key, scheduling a key again moves its timer, which makes
+incremental updates cheap.
+"""
+import math
+
+
+class TimingWheel:
+    def __init__(self, now, tick=1.0, bits=6, levels=4):
+        self.tick = tick
+        self.bits = bits
+        self.mask = (1 << bits) - 1
+        self.levels = levels
+        self.wheels = [[{} for _ in range(1 << bits)] for _ in range(levels)]
+        self.overflow = {}
+        self.ready = {}
+        # Maps every key to the slot that holds it.
+        self.slots = {}
+        self.current = math.floor(now / tick)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, key):
+        return key in self.slots
+
+    def due(self, key):
+        """Return when the timer of ``key`` is due, or None if there is none."""
+        slot = self.slots.get(key)
+        return None if slot is None else slot[key]
+
+    def schedule(self, key, due):
+        """Set the timer of ``key`` to ``due``, replacing the one it had."""
+        self.cancel(key)
+        self._insert(key, due)
+
+    def cancel(self, key):
+        slot = self.slots.pop(key, None)
+        if slot is not None:
+            del slot[key]
+
+    def _insert(self, key, due):
+        when = math.ceil(due / self.tick)
+        slot = self.ready
+        if when > self.current:
+            slot = self.overflow
+            for level in range(self.levels):
+                shift = self.bits * level
+                if (when >> shift) - (self.current >> shift) <= self.mask:
+                    slot = self.wheels[level][(when >> shift) & self.mask]
+                    break
+        slot[key] = due
+        self.slots[key] = slot
+
+    def _cascade(self, level):
+        index = (self.current >> (self.bits * level)) & self.mask
+        slot = self.wheels[level][index]
+        self.wheels[level][index] = {}
+        for key, due in slot.items():
+            self._insert(key, due)
+
+    def advance(self, now):
+        """
+        Move the wheels to ``now`` and return the ``(key, due)`` pairs of the
+        timers that are due, which are removed from the wheels.
+        """
+        target = math.floor(now / self.tick)
+        expired = list(self.ready.items())
+        self.ready.clear()
+
+        while self.current < target:
+            if not self.slots:
+                # Nothing to cascade, skip the ticks in between.
+                self.current = target
+                break
+            self.current += 1
+            if self.current & self.mask == 0:
+                if self.current & ((1 << (self.bits * (self.levels - 1))) - 1) == 0:
+                    overflow = self.overflow
+                    self.overflow = {}
+                    for key, due in overflow.items():
+                        self._insert(key, due)
+                for level in range(self.levels - 1, 0, -1):
+                    if self.current & ((1 << (self.bits * level)) - 1) == 0:
+                        self._cascade(level)
+
+            slot = self.wheels[0][self.current & self.mask]
+            if slot:
+                expired.extend(slot.items())
+                self.wheels[0][self.current & self.mask] = {}
+            expired.extend(self.ready.items())
+            self.ready.clear()
+
+        for key, _ in expired:
+            del self.slots[key]
+        return expired
@@ -1,5 +1,5 @@
 from flask import current_app
-from util.send_email import send_email
+from util.send_email import send_email, send_personalized_emails
 
 
 def send_password_reset_email(email, token):
@@ -33,3 +33,14 @@ def send_email_change_notification(email, username):
     template_data = {"username": username}
 
     send_email(email, template_id, template_data)
+
+
+def send_reminder_emails(reminders):
+    """Send reminders, ``reminders`` are (email, username, movement) tuples."""
+    template_id = current_app.config["REMINDER_TEMPLATE"]
+    recipients = [
+        (email, {"username": username, "movement": movement})
+        for email, username, movement in reminders
+    ]
+    if recipients:
+        send_personalized_emails(recipients, template_id)
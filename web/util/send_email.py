@@ -1,6 +1,6 @@
 from flask import current_app
 from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+from sendgrid.helpers.mail import Mail, To
 
 
 def send_email(to_emails, template_id, template_data):
@@ -12,3 +12,17 @@ def send_email(to_emails, template_id, template_data):
     sg = SendGridAPIClient(current_app.config["EMAIL_API_KEY"])
     resp = sg.send(msg)
     return resp.status_code, resp.body, resp.headers
+
+
+def send_personalized_emails(recipients, template_id):
+    """
+    Send the template to many (email, template data) recipients in one request.
+    """
+    to_emails = [To(email, dynamic_template_data=data) for email, data in recipients]
+    msg = Mail(from_email="info@gridt.org", to_emails=to_emails, is_multiple=True)
+
+    msg.template_id = template_id
+
+    sg = SendGridAPIClient(current_app.config["EMAIL_API_KEY"])
+    resp = sg.send(msg)
+    return resp.status_code, resp.body, resp.headers